@@ -1,12 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from core.admin import ScalableAdminMixin
 from .models import User
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(ScalableAdminMixin, BaseUserAdmin):
     list_display = ['username', 'email', 'role', 'is_approved', 'is_active']
     list_filter = ['role', 'is_approved', 'is_active']
-    search_fields = ['username', 'email']
+    search_fields = ['^username', '^email']
     
     fieldsets = BaseUserAdmin.fieldsets + (
         ('Additional Info', {'fields': ('role', 'phone', 'address', 'is_approved', 'profile_image')}),
@@ -18,7 +18,7 @@ class UserRegistrationForm(UserCreationForm):
 class UserProfileForm(forms.ModelForm):
     class Meta:
         model = User
-        fields = ['first_name', 'last_name', 'email', 'phone', 'address', 'profile_image']
+        fields = ['first_name', 'last_name', 'email', 'phone', 'address', 'latitude', 'longitude', 'profile_image']
         
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
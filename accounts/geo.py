@@ -0,0 +1,82 @@
+"""
+Geohash grid for seller locations.
+
+A geohash names a lat/lng cell with a base-32 string; every extra character
+subdivides the cell, so all points inside a cell share its hash as a prefix.
+A radius search looks up the cell containing the searcher plus its eight
+neighbours with indexed prefix ranges, then computes exact distances for that
+small candidate set in one vectorised haversine pass.
+"""
+import numpy as np
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 9  # ~5 m cells, more than a seller address needs
+EARTH_RADIUS_KM = 6371.0088
+
+KM_PER_DEGREE = 111.195
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            bounds[0] = middle
+        else:
+            bits <<= 1
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) of a cell in degrees"""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def precision_for_radius(radius_km, latitude):
+    """Finest precision whose cells are at least ``radius_km`` across at this latitude"""
+    # Cells narrow towards the poles; size for the most poleward edge of the search
+    poleward = min(abs(latitude) + radius_km / KM_PER_DEGREE, 89.0)
+    shrink = max(np.cos(np.radians(poleward)), 0.01)
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        if min(height * KM_PER_DEGREE, width * KM_PER_DEGREE * shrink) >= radius_km:
+            return precision
+    return None
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    The cell containing the point and its neighbours: every point within
+    radius_km lies in one of them. An empty string (match everything) when the
+    radius is wider than the coarsest cells.
+    """
+    precision = precision_for_radius(radius_km, latitude)
+    if precision is None:
+        return ['']
+    height, width = cell_size(precision)
+    cells = set()
+    for dy in (-1, 0, 1):
+        lat = min(max(latitude + dy * height, -90.0), 90.0)
+        for dx in (-1, 0, 1):
+            lng = (longitude + dx * width + 180.0) % 360.0 - 180.0
+            cells.add(encode(lat, lng, precision))
+    return sorted(cells)
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Distances in km from one point to arrays of points"""
+    lat1, lng1 = np.radians(latitude), np.radians(longitude)
+    lat2, lng2 = np.radians(np.asarray(latitudes, dtype=np.float64)), np.radians(np.asarray(longitudes, dtype=np.float64))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
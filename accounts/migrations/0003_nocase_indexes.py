@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:20
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_location'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.comparison.Collate('username', 'nocase'), name='accounts_username_nocase_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.comparison.Collate('email', 'nocase'), name='accounts_email_nocase_idx'),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models.functions import Collate
+from . import geo
 
 # Custom User Model with role-based access
 class User(AbstractUser):
@@ -15,6 +18,21 @@ class User(AbstractUser):
     is_approved = models.BooleanField(default=False)  # For seller approval
     profile_image = models.ImageField(upload_to='profiles/', blank=True, null=True)
     
+    # Optional seller location for "near me" search; geohash is derived on save
+    latitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
+    
+    class Meta(AbstractUser.Meta):
+        # Case-insensitive indexes let SQLite answer the admin's prefix searches
+        # (LIKE 'abc%') with a range scan
+        indexes = [
+            models.Index(Collate('username', 'nocase'), name='accounts_username_nocase_idx'),
+            models.Index(Collate('email', 'nocase'), name='accounts_email_nocase_idx'),
+            # Sellers awaiting approval on the admin dashboard
+            models.Index(fields=['role', 'is_approved'], name='accounts_role_approved_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
     
@@ -22,4 +40,8 @@ class User(AbstractUser):
         # Auto-approve farmers and admins
         if self.role in ['farmer', 'admin']:
             self.is_approved = True
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
         super().save(*args, **kwargs)
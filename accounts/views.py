@@ -2,6 +2,8 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.utils.http import url_has_allowed_host_and_scheme
+from core.streaming import render_streaming
 from .forms import UserRegistrationForm, UserProfileForm
 from .models import User
 
@@ -28,9 +30,17 @@ def user_login(request):
             if user.role == 'seller' and not user.is_approved:
                 messages.error(request, 'Your seller account is pending approval.')
                 return redirect('accounts:login')
+            from orders import cart
             login(request, user)
+            # Anything put in the cart before logging in joins the saved cart
+            cart.merge_into_user(request, user)
             messages.success(request, f'Welcome back, {user.username}!')
-            return redirect('home')
+            next_url = request.GET.get('next')
+            if not url_has_allowed_host_and_scheme(next_url, {request.get_host()}, request.is_secure()):
+                next_url = 'home'
+            response = redirect(next_url)
+            cart.save(response, {})
+            return response
         else:
             messages.error(request, 'Invalid username or password.')
     
@@ -54,10 +64,16 @@ def dashboard(request):
     
     elif user.role == 'seller':
         from products.models import Product
-        from orders.models import OrderItem
-        context['products'] = Product.objects.filter(seller=user)
-        context['orders'] = OrderItem.objects.filter(product__seller=user)
-        return render(request, 'accounts/seller_dashboard.html', context)
+        from orders.models import OrderItem, SellerSales
+        context['products'] = Product.objects.filter(seller=user).with_available_stock().select_related('category')
+        # Served from the (seller, ordered_at) index on OrderItem, no join through Product
+        sold_items = OrderItem.objects.filter(seller=user)
+        context['recent_orders'] = sold_items.select_related('order').order_by('-ordered_at')[:10]
+        # Lifetime totals are kept by the seller_sales event consumer (orders.rollups)
+        sales = SellerSales.objects.filter(seller=user).first()
+        context['revenue'] = sales.revenue if sales else 0
+        context['sold_count'] = sales.item_count if sales else 0
+        return render_streaming(request, 'accounts/seller_dashboard.html', context)
     
     elif user.role == 'admin' or user.is_superuser:
         from products.models import Product
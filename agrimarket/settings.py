@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +50,10 @@ INSTALLED_APPS = [
     'orders',
     'reviews',
     'blog',
+    'core',
+    'jobs',
+    'events',
+    'api',
 ]
 
 MIDDLEWARE = [
@@ -58,7 +63,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.pagecache.PageCacheMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -75,6 +83,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'orders.context_processors.cart_count',
+                'core.pagecache.page_cache',
             ],
         },
     },
@@ -90,9 +99,142 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests; health checks replace broken ones
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # WAL lets readers run alongside the single writer; NORMAL sync is safe with WAL
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            # Seconds a writer waits for the lock (busy timeout) before "database is locked"
+            'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+            # Take the write lock at BEGIN so concurrent transactions queue instead of deadlocking
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+
+# Cache
+# CACHE_BACKEND selects where cached data lives:
+#   locmem - per-process memory (default, nothing shared between workers; gunicorn.conf.py
+#            switches to shm when it starts more than one worker)
+#   file   - files under CACHE_LOCATION, shared by every worker on the host
+#   shm    - file cache in /dev/shm, i.e. RAM shared by every worker on the host
+# Both backends keep per-key-prefix hit/miss/eviction stats (see core.cache).
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+_CACHE_BACKENDS = {
+    'locmem': ('core.cache.StatsLocMemCache', 'agrimarket'),
+    'file': ('core.cache.StatsFileBasedCache', os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'cache'))),
+    'shm': ('core.cache.StatsFileBasedCache', os.environ.get('CACHE_LOCATION', '/dev/shm/agrimarket-cache')),
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': _CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': _CACHE_BACKENDS[CACHE_BACKEND][1],
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 300)),
+        'KEY_PREFIX': 'agrimarket',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 5000)),
+        },
     }
 }
 
+# Sessions are read from the cache and only fall back to the database on a miss
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+
+# Background jobs (jobs app, processed by `manage.py runworker`)
+JOBS_WORKER_PROCESSES = int(os.environ.get('JOBS_WORKER_PROCESSES', 1))
+JOBS_WORKER_THREADS = int(os.environ.get('JOBS_WORKER_THREADS', 2))
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BACKOFF = 30  # seconds before the first retry, doubled on each attempt
+JOBS_MAX_BACKOFF = 60 * 60
+JOBS_LOCK_TIMEOUT = 30 * 60  # running jobs older than this are assumed dead and re-queued
+
+
+# Category market price index (products.price_index)
+PRICE_INDEX_WEEKS = 26  # weeks of history kept per category
+PRICE_INDEX_MOVING_WINDOW = 4  # weeks averaged for the moving average
+
+
+# Search box typeahead (products.typeahead): keys held in memory per worker,
+# one per word of each name; 50,000 keys is roughly 10 MB.
+TYPEAHEAD_MAX_ENTRIES = int(os.environ.get('TYPEAHEAD_MAX_ENTRIES', 50000))
+# Serialises change-log sequence bumps between the workers on a host
+TYPEAHEAD_LOCK_FILE = os.environ.get('TYPEAHEAD_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'agrimarket-typeahead.lock'))
+
+
+# Rate limits per URL name (core.ratelimit), counted per client IP and per user
+RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'True').lower() in ('true', '1', 'yes')
+RATELIMIT_PROXY_COUNT = int(os.environ.get('RATELIMIT_PROXY_COUNT', 0))  # 1 behind Render's proxy
+# Serialises bucket updates between the workers on a host (core.ratelimit)
+RATELIMIT_LOCK_FILE = os.environ.get('RATELIMIT_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'agrimarket-ratelimit.lock'))
+RATELIMITS = {
+    'accounts:login': {'rate': '10/m', 'burst': 5, 'methods': ['POST']},
+    'products:product_list': {'rate': '30/m', 'params': ['q']},
+    'orders:add_to_cart': {'rate': '30/m'},
+}
+
+
+# Full-page cache (core.pagecache): 'shared' pages are cached for everyone with
+# the per-user navigation filled in client-side, 'anonymous' pages only for
+# visitors without a session
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', 'True').lower() in ('true', '1', 'yes')
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 60))
+PAGE_CACHE_VIEWS = {
+    'home': 'shared',
+    'products:product_list': 'shared',
+    'blog:blog_list': 'shared',
+    'blog:blog_detail': 'shared',
+    'products:product_detail': 'anonymous',
+}
+
+
+# Streamed listing pages (core.streaming): rows fetched and sent per chunk
+STREAMING_RENDER_ENABLED = os.environ.get('STREAMING_RENDER_ENABLED', 'True').lower() in ('true', '1', 'yes')
+STREAM_CHUNK_SIZE = 50
+
+
+# Order retention (orders.retention, `manage.py archive_orders`)
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', 180))
+ORDER_ARCHIVE_BATCH_SIZE = 500
+CART_PURGE_AFTER_DAYS = int(os.environ.get('CART_PURGE_AFTER_DAYS', 30))
+
+
+# Visitors' carts (orders.cart): a signed cookie until they log in
+CART_COOKIE_NAME = 'cart'
+CART_COOKIE_AGE = 60 * 60 * 24 * 30
+CART_COOKIE_MAX_LINES = 50  # keeps the cookie well under the 4 KB browsers allow
+
+
+# Per-request profiling for staff (core.profiling): add ?_profile=1 or send X-Profile: 1
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'True').lower() in ('true', '1', 'yes')
+PROFILER_QUERY_PARAM = '_profile'
+PROFILER_HEADER = 'X-Profile'
+PROFILER_DIR = os.environ.get('PROFILER_DIR', str(BASE_DIR / 'profiles'))
+PROFILER_SAMPLE_INTERVAL = 0.001  # seconds between stack samples
+PROFILER_KEEP = 200  # newest profiles kept on disk
+
+
+# Sitemaps and feeds (core.sitemaps, `manage.py build_sitemaps`)
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
+SITEMAP_ROOT = os.environ.get('SITEMAP_ROOT', str(BASE_DIR / 'sitemaps'))
+SITEMAP_SHARD_SIZE = 50000  # the protocol's limit of URLs per sitemap file
+SITEMAP_MAX_AGE = 60 * 60
+FEED_ITEMS = 50
+ROBOTS_DISALLOW = [
+    '/admin/', '/accounts/', '/orders/', '/api/', '/products/wishlist/', '/products/autocomplete/',
+    # Sorted and searched listings repeat what the sitemaps already list
+    '/*?*sort=', '/*?*q=', '/*?*lat=',
+]
+
+
+# Admin changelists (core.admin): rows counted exactly before switching to an estimate
+ADMIN_COUNT_LIMIT = int(os.environ.get('ADMIN_COUNT_LIMIT', 10000))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -132,19 +274,45 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-# Whitenoise for static files compression and caching
+# Whitenoise for static files compression (gzip, and Brotli via the Brotli package) and caching
 STORAGES = {
+    # Uploads are named by content hash and shared between identical files (core.storage)
     'default': {
-        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'BACKEND': 'core.storage.ContentAddressedStorage',
     },
+    # Whitenoise's manifest storage; source names until collectstatic has run (core.assets)
     'staticfiles': {
-        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+        'BACKEND': 'core.assets.StaticStorage',
     },
 }
 
+# Bundles built into static/dist/ by `manage.py build_assets` (see build.sh).
+# With ASSETS_BUNDLED off (the DEBUG default) templates link the sources instead.
+ASSET_BUNDLES = {
+    'app.min.css': ['css/style.css'],
+    'app.min.js': ['js/main.js'],
+}
+ASSETS_BUNDLED = os.environ.get('ASSETS_BUNDLED', str(not DEBUG)).lower() in ('true', '1', 'yes')
+
+# Rules matching these selectors are inlined into base.html as critical CSS
+CRITICAL_CSS_SELECTORS = [':root', 'body', '.navbar', '.navbar-brand', '.hero-section', '.badge-cart']
+
+RESOURCE_HINT_ORIGINS = ['https://cdn.jsdelivr.net', 'https://cdnjs.cloudflare.com']
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# How core.views.serve_media hands file bodies to the front proxy:
+#   ''                 - stream from Django (development, or no proxy)
+#   'x-accel-redirect' - nginx; MEDIA_ACCEL_PREFIX must be an `internal` location
+#                        aliased to MEDIA_ROOT
+#   'x-sendfile'       - Apache mod_xsendfile, lighttpd
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_MAX_AGE = 60 * 60
+# Content-hashed file names never change, so they can be cached for a year
+MEDIA_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
 # Custom user model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -157,3 +325,12 @@ LOGOUT_REDIRECT_URL = 'home'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Outbox of domain events (events app, processed by `manage.py consume_events`)
+EVENT_CONSUMERS = {
+    'seller_sales': {'handler': 'orders.rollups.seller_sales', 'kinds': ['order_placed', 'order_status_changed']},
+}
+EVENTS_BATCH_SIZE = 500
+EVENTS_SETTLE_SECONDS = 2  # newer events wait a pass, so ids committed out of order are not skipped
+EVENTS_RETENTION_DAYS = int(os.environ.get('EVENTS_RETENTION_DAYS', 7))
@@ -21,9 +21,9 @@ from django.conf.urls.static import static
 from django.shortcuts import render
 
 def home(request):
-    from products.models import Product, Category
-    products = Product.objects.filter(is_active=True)[:8]
-    categories = Category.objects.all()[:6]
+    from products.cache import get_featured_products, get_home_categories
+    products = get_featured_products()
+    categories = get_home_categories()
     return render(request, 'home.html', {'products': products, 'categories': categories})
 
 urlpatterns = [
@@ -34,8 +34,10 @@ urlpatterns = [
     path('orders/', include('orders.urls')),
     path('reviews/', include('reviews.urls')),
     path('blog/', include('blog.urls')),
+    path('api/', include('api.urls')),
+    path('', include('core.urls')),
 ]
 
+# Media is served by core.views.serve_media in every environment
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -0,0 +1,111 @@
+import base64
+import json
+from decimal import Decimal
+from urllib.parse import parse_qsl, urlsplit
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import User
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+from reviews.models import Review
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user('farmer', password='pass', role='farmer')
+        cls.seller = User.objects.create_user('seller', password='pass', role='seller', is_approved=True)
+        cls.category = Category.objects.create(name='Seeds')
+        cls.products = [
+            Product.objects.create(
+                seller=cls.seller, category=cls.category, name=f'Seed {i}', description='Seed',
+                price=Decimal('10.00') + i, stock=100, image='products/seed.jpg',
+            )
+            for i in range(25)
+        ]
+
+    def get(self, url, params=None, **headers):
+        return self.client.get(url, params or {}, **headers)
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_product_list_queries_do_not_grow_with_page_size(self):
+        url = reverse('api:product_list')
+        fields = 'id,name,stock,category,seller,rating,review_count'
+        for product in self.products:
+            Review.objects.create(product=product, user=self.farmer, rating=4, comment='Good')
+        small = self.count_queries(url, {'limit': 1, 'fields': fields})
+        with self.assertNumQueries(small):
+            response = self.get(url, {'limit': 20, 'fields': fields})
+        self.assertEqual(len(response.json()['results']), 20)
+
+    def test_order_list_queries_do_not_grow_with_page_size(self):
+        self.client.force_login(self.farmer)
+        for n in range(15):
+            order = Order.objects.create(
+                user=self.farmer, order_number=f'ORD{n:010d}', shipping_address='Village road',
+                shipping_phone='9999999999', total_amount=Decimal('10.00'),
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, seller=self.seller, product_name=product.name,
+                          quantity=1, price=product.price)
+                for product in self.products[:3]
+            ])
+        url = reverse('api:order_list')
+        small = self.count_queries(url, {'limit': 1, 'fields': 'id,items,item_count'})
+        with self.assertNumQueries(small):
+            response = self.get(url, {'limit': 10, 'fields': 'id,items,item_count'})
+        self.assertEqual([len(order['items']) for order in response.json()['results']], [3] * 10)
+
+    def test_cursor_walks_every_product_once(self):
+        for sort in ('newest', 'price_low', 'price_high'):
+            seen, params = [], {'limit': 7, 'sort': sort, 'fields': 'id'}
+            while True:
+                payload = self.get(reverse('api:product_list'), params).json()
+                seen += [product['id'] for product in payload['results']]
+                if not payload['next']:
+                    break
+                params = dict(parse_qsl(urlsplit(payload['next']).query))
+            self.assertEqual(sorted(seen), sorted(product.pk for product in self.products), sort)
+            self.assertEqual(len(seen), len(set(seen)))
+
+    def test_etag_and_not_modified(self):
+        url = reverse('api:product_detail', args=[self.products[0].pk])
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.products[0].name = 'Renamed'
+        self.products[0].save()
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_malformed_input_is_a_client_error(self):
+        url = reverse('api:product_list')
+        for params in (
+            {'cursor': 'not-base64!'},
+            {'cursor': encode_cursor(['notadate', 1])},
+            {'cursor': encode_cursor([None, 1])},
+            {'cursor': encode_cursor([{'a': 1}, 1])},
+            {'cursor': encode_cursor(['cheap', 'x']), 'sort': 'price_low'},
+            {'category': 'abc'},
+            {'limit': 'ten'},
+            {'fields': 'id,secret'},
+        ):
+            response = self.get(url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('detail', response.json())
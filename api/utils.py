@@ -0,0 +1,151 @@
+import base64
+import hashlib
+import json
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view):
+    """Turn ApiError and Http404 into JSON error responses."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as exc:
+            return JsonResponse({'detail': str(exc)}, status=exc.status)
+        except Http404:
+            return JsonResponse({'detail': 'Not found.'}, status=404)
+    return wrapper
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise ApiError('Authentication required.', status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def json_response(request, payload, public=False):
+    """
+    Serialise ``payload`` compactly with a content ETag; answers 304 when the
+    client already has this representation.
+    """
+    body = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    etag = '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    if public:
+        patch_cache_control(response, public=True, max_age=60)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def select_fields(request, available, default):
+    """Parse ``fields=a,b`` against the ``available`` field names."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(default)
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(available)}.")
+    return fields
+
+
+def serialize(obj, serializers, fields):
+    return {name: serializers[name](obj) for name in fields}
+
+
+def _cursor_value(value):
+    # Full isoformat: DjangoJSONEncoder rounds datetimes to milliseconds, which would skip rows
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (int, float, str)) or value is None:
+        return value
+    return str(value)
+
+
+def _encode_cursor(values):
+    raw = json.dumps([_cursor_value(value) for value in values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError:
+        raise ApiError('Invalid cursor.')
+    if not isinstance(values, list) or len(values) != 2:
+        raise ApiError('Invalid cursor.')
+    return values
+
+
+def paginate(request, queryset, ordering):
+    """
+    Keyset pagination over a two-column ``ordering`` ending in a unique column,
+    e.g. ('-created_at', '-id'). Each page is one indexed range query however
+    deep the client scrolls; returns (objects, next_cursor).
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise ApiError('limit must be an integer.')
+    first, second = ordering
+    first_field, second_field = first.lstrip('-'), second.lstrip('-')
+    queryset = queryset.order_by(first, second)
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        # Coerced here, so a tampered value is a 400 rather than an error inside the query
+        try:
+            first_value, second_value = (
+                queryset.model._meta.get_field(name).to_python(value)
+                for name, value in zip((first_field, second_field), _decode_cursor(cursor))
+            )
+        except (ValidationError, TypeError, ValueError):
+            raise ApiError('Invalid cursor.')
+        if first_value is None or second_value is None:
+            raise ApiError('Invalid cursor.')
+        first_op = 'lt' if first.startswith('-') else 'gt'
+        second_op = 'lt' if second.startswith('-') else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{first_field}__{first_op}': first_value})
+            | Q(**{first_field: first_value, f'{second_field}__{second_op}': second_value})
+        )
+
+    objects = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(objects) > limit:
+        objects = objects[:limit]
+        last = objects[-1]
+        next_cursor = _encode_cursor([getattr(last, first_field), getattr(last, second_field)])
+    return objects, next_cursor
+
+
+def page_payload(request, results, next_cursor):
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    return {'results': results, 'next': next_url}
@@ -0,0 +1,193 @@
+from django.db.models import Avg, Count, Prefetch, Q
+from django.shortcuts import get_object_or_404
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_safe
+
+from orders.models import ArchivedOrder, ArchivedOrderItem, Cart, Order, OrderItem
+from products.models import Product
+from reviews.models import Review
+from .utils import (
+    ApiError, api_login_required, api_view, json_response, page_payload, paginate, select_fields, serialize,
+)
+
+# Every endpoint below runs a fixed number of queries whatever the page size:
+# related rows come from select_related/prefetch_related chosen from the
+# requested fields, never from per-object lookups.
+
+PRODUCT_FIELDS = {
+    'id': lambda p: p.pk,
+    'name': lambda p: p.name,
+    'description': lambda p: p.description,
+    'price': lambda p: str(p.price),
+    'stock': lambda p: p.available_stock,
+    'in_stock': lambda p: p.in_stock,
+    'category': lambda p: {'id': p.category_id, 'name': p.category.name},
+    'seller': lambda p: p.seller.username,
+    'image': lambda p: p.image.url if p.image else None,
+    'rating': lambda p: round(p.rating_avg or 0, 2),
+    'review_count': lambda p: p.review_count,
+    'created_at': lambda p: p.created_at,
+    'updated_at': lambda p: p.updated_at,
+}
+PRODUCT_LIST_DEFAULT = ['id', 'name', 'price', 'in_stock', 'category', 'image']
+
+PRODUCT_SORTS = {
+    'newest': ('-created_at', '-id'),
+    'price_low': ('price', 'id'),
+    'price_high': ('-price', '-id'),
+}
+
+REVIEW_FIELDS = {
+    'id': lambda r: r.pk,
+    'user': lambda r: r.user.username,
+    'rating': lambda r: r.rating,
+    'comment': lambda r: r.comment,
+    'created_at': lambda r: r.created_at,
+}
+
+CART_FIELDS = {
+    'id': lambda c: c.pk,
+    'product': lambda c: {
+        'id': c.product_id,
+        'name': c.product.name,
+        'price': str(c.product.price),
+        'image': c.product.image.url if c.product.image else None,
+    },
+    'quantity': lambda c: c.quantity,
+    'subtotal': lambda c: str(c.subtotal),
+}
+
+ORDER_ITEM_FIELDS = {
+    'product_id': lambda i: i.product_id,
+    'product_name': lambda i: i.product_name,
+    'quantity': lambda i: i.quantity,
+    'price': lambda i: str(i.price),
+    'subtotal': lambda i: str(i.subtotal),
+}
+
+ORDER_FIELDS = {
+    'id': lambda o: o.pk,
+    'order_number': lambda o: o.order_number,
+    'status': lambda o: o.status,
+    'payment_method': lambda o: o.payment_method,
+    'payment_status': lambda o: o.payment_status,
+    'total_amount': lambda o: str(o.total_amount),
+    'shipping_address': lambda o: o.shipping_address,
+    'shipping_phone': lambda o: o.shipping_phone,
+    'item_count': lambda o: o.item_count,
+    'items': lambda o: [serialize(item, ORDER_ITEM_FIELDS, ORDER_ITEM_FIELDS) for item in o.items.all()],
+    'created_at': lambda o: o.created_at,
+}
+ORDER_LIST_DEFAULT = ['id', 'order_number', 'status', 'total_amount', 'item_count', 'created_at']
+
+
+def _product_queryset(fields):
+    products = Product.objects.filter(is_active=True)
+    if 'stock' in fields or 'in_stock' in fields:
+        products = products.with_available_stock()
+    related = [name for name in ('category', 'seller') if name in fields]
+    if related:
+        products = products.select_related(*related)
+    if 'description' not in fields:
+        products = products.defer('description')
+    if 'rating' in fields:
+        products = products.annotate(rating_avg=Avg('reviews__rating'))
+    if 'review_count' in fields:
+        products = products.annotate(review_count=Count('reviews'))
+    return products
+
+
+def _order_queryset(user, fields, archived=False):
+    # Old delivered/cancelled orders live in the archive tables (see orders.retention)
+    model, item_model = (ArchivedOrder, ArchivedOrderItem) if archived else (Order, OrderItem)
+    orders = model.objects.filter(user=user)
+    if 'item_count' in fields:
+        orders = orders.annotate(item_count=Count('items'))
+    if 'items' in fields:
+        orders = orders.prefetch_related(Prefetch('items', queryset=item_model.objects.order_by('pk')))
+    return orders
+
+
+@gzip_page
+@require_safe
+@api_view
+def product_list(request):
+    fields = select_fields(request, PRODUCT_FIELDS, PRODUCT_LIST_DEFAULT)
+    products = _product_queryset(fields)
+
+    query = request.GET.get('q')
+    if query:
+        products = products.filter(Q(name__icontains=query) | Q(description__icontains=query))
+    category_id = request.GET.get('category')
+    if category_id:
+        try:
+            products = products.filter(category_id=int(category_id))
+        except ValueError:
+            raise ApiError('category must be an integer.')
+
+    ordering = PRODUCT_SORTS.get(request.GET.get('sort'), PRODUCT_SORTS['newest'])
+    page, next_cursor = paginate(request, products, ordering)
+    results = [serialize(product, PRODUCT_FIELDS, fields) for product in page]
+    return json_response(request, page_payload(request, results, next_cursor), public=True)
+
+
+@gzip_page
+@require_safe
+@api_view
+def product_detail(request, pk):
+    fields = select_fields(request, PRODUCT_FIELDS, PRODUCT_FIELDS)
+    product = get_object_or_404(_product_queryset(fields), pk=pk)
+    return json_response(request, serialize(product, PRODUCT_FIELDS, fields), public=True)
+
+
+@gzip_page
+@require_safe
+@api_view
+def product_reviews(request, pk):
+    fields = select_fields(request, REVIEW_FIELDS, REVIEW_FIELDS)
+    get_object_or_404(Product.objects.only('pk'), pk=pk, is_active=True)
+    reviews = Review.objects.filter(product_id=pk)
+    if 'user' in fields:
+        reviews = reviews.select_related('user')
+    page, next_cursor = paginate(request, reviews, ('-created_at', '-id'))
+    results = [serialize(review, REVIEW_FIELDS, fields) for review in page]
+    return json_response(request, page_payload(request, results, next_cursor), public=True)
+
+
+@gzip_page
+@require_safe
+@api_view
+@api_login_required
+def cart(request):
+    fields = select_fields(request, CART_FIELDS, CART_FIELDS)
+    cart_items = list(Cart.objects.filter(user=request.user).select_related('product').order_by('added_at', 'pk'))
+    return json_response(request, {
+        'results': [serialize(item, CART_FIELDS, fields) for item in cart_items],
+        'total': str(sum(item.subtotal for item in cart_items)),
+    })
+
+
+@gzip_page
+@require_safe
+@api_view
+@api_login_required
+def order_list(request):
+    fields = select_fields(request, ORDER_FIELDS, ORDER_LIST_DEFAULT)
+    archived = request.GET.get('archived') == '1'
+    orders = _order_queryset(request.user, fields, archived)
+    page, next_cursor = paginate(request, orders, ('-created_at', '-id'))
+    results = [serialize(order, ORDER_FIELDS, fields) for order in page]
+    return json_response(request, page_payload(request, results, next_cursor))
+
+
+@gzip_page
+@require_safe
+@api_view
+@api_login_required
+def order_detail(request, pk):
+    fields = select_fields(request, ORDER_FIELDS, ORDER_FIELDS)
+    order = _order_queryset(request.user, fields).filter(pk=pk).first()
+    if order is None:
+        # Archived orders keep their ids, so old links still work
+        order = get_object_or_404(_order_queryset(request.user, fields, archived=True), pk=pk)
+    return json_response(request, serialize(order, ORDER_FIELDS, fields))
@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.pagecache import invalidate_pages
+from .models import BlogPost
+
+
+@receiver([post_save, post_delete], sender=BlogPost)
+def blog_changed(sender, **kwargs):
+    # After commit, so a request in between cannot cache the old page afresh
+    transaction.on_commit(invalidate_pages)
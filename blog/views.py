@@ -1,9 +1,10 @@
 from django.shortcuts import render, get_object_or_404
+from core.streaming import render_streaming
 from .models import BlogPost
 
 def blog_list(request):
-    posts = BlogPost.objects.filter(is_published=True)
-    return render(request, 'blog/blog_list.html', {'posts': posts})
+    posts = BlogPost.objects.filter(is_published=True).select_related('author')
+    return render_streaming(request, 'blog/blog_list.html', {'posts': posts})
 
 def blog_detail(request, slug):
     post = get_object_or_404(BlogPost, slug=slug, is_published=True)
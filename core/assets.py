@@ -0,0 +1,138 @@
+"""
+Asset build step: bundle and minify static/css and static/js into static/dist/
+and extract the above-the-fold CSS rules that base.html inlines.
+
+Run with ``python manage.py build_assets`` before ``collectstatic``; whitenoise
+then fingerprints the bundles and writes gzip and Brotli variants of them.
+``StaticStorage`` links the unversioned source names until collectstatic has
+written a manifest, so tests and fresh checkouts render without it.
+"""
+import re
+from pathlib import Path
+
+from django.conf import settings
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+DIST_DIR = 'dist'
+CRITICAL_CSS_NAME = 'critical.css'
+
+
+class StaticStorage(CompressedManifestStaticFilesStorage):
+    """Whitenoise's manifest storage, minus the hashed names when there is no manifest at all.
+
+    Once collectstatic has run, a name missing from the manifest is still an error.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+
+def source_dir():
+    return Path(settings.STATICFILES_DIRS[0])
+
+
+def dist_dir():
+    return source_dir() / DIST_DIR
+
+
+def _strip_comments(text, line_comments):
+    """Drop /* */ (and optionally //) comments, leaving string literals untouched."""
+    out = []
+    i, n = 0, len(text)
+    quote = None
+    while i < n:
+        ch = text[i]
+        if quote:
+            out.append(ch)
+            if ch == '\\' and i + 1 < n:
+                out.append(text[i + 1])
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in '"\'`':
+            quote = ch
+            out.append(ch)
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        elif line_comments and text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def minify_css(css):
+    css = _strip_comments(css, line_comments=False)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}')
+    return css.strip()
+
+
+def minify_js(js):
+    # Conservative: keep line breaks so automatic semicolon insertion still works
+    js = _strip_comments(js, line_comments=True)
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def _css_blocks(css):
+    """Yield (prelude, body) pairs for the top level of a comment-free stylesheet."""
+    i, n = 0, len(css)
+    while i < n:
+        start = css.find('{', i)
+        if start == -1:
+            return
+        depth, j = 1, start + 1
+        while j < n and depth:
+            if css[j] == '{':
+                depth += 1
+            elif css[j] == '}':
+                depth -= 1
+            j += 1
+        yield css[i:start].strip(), css[start + 1:j - 1]
+        i = j
+
+
+def extract_critical_css(css, selectors):
+    """Keep the rules whose selector mentions one of ``selectors``, including inside @media."""
+    css = _strip_comments(css, line_comments=False)
+    pattern = re.compile(
+        '|'.join(r'(?<![\w-])' + re.escape(s) + r'(?![\w-])' for s in selectors)
+    )
+    rules = []
+    for prelude, body in _css_blocks(css):
+        if prelude.startswith('@media'):
+            inner = extract_critical_css(body, selectors)
+            if inner:
+                rules.append(f'{prelude}{{{inner}}}')
+        elif pattern.search(prelude):
+            rules.append(f'{prelude}{{{body}}}')
+    return minify_css(''.join(rules))
+
+
+def build():
+    """Write every bundle in ASSET_BUNDLES plus critical.css; return {name: size in bytes}."""
+    src, dist = source_dir(), dist_dir()
+    dist.mkdir(exist_ok=True)
+    built = {}
+    css_sources = []
+    for name, sources in settings.ASSET_BUNDLES.items():
+        text = '\n'.join((src / path).read_text(encoding='utf-8') for path in sources)
+        output = minify_css(text) if name.endswith('.css') else minify_js(text)
+        (dist / name).write_text(output, encoding='utf-8')
+        built[name] = len(output.encode())
+        if name.endswith('.css'):
+            css_sources.append(text)
+    critical = extract_critical_css('\n'.join(css_sources), settings.CRITICAL_CSS_SELECTORS)
+    (dist / CRITICAL_CSS_NAME).write_text(critical, encoding='utf-8')
+    built[CRITICAL_CSS_NAME] = len(critical.encode())
+    return built
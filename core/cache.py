@@ -0,0 +1,99 @@
+"""
+Cache backends that keep per-key-prefix hit/miss/eviction statistics.
+
+Keys are grouped by the text before their first ``:`` (``catalog:featured``
+is counted under ``catalog``, cached sessions under ``sessions``). Counters
+live in the worker process, so each gunicorn worker reports its own numbers.
+"""
+import os
+import threading
+from collections import Counter, defaultdict
+
+from django.contrib.sessions.backends.cached_db import KEY_PREFIX as SESSION_KEY_PREFIX
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_MISSING = object()
+_stats_lock = threading.Lock()
+_stats = defaultdict(Counter)
+
+
+def key_prefix(key):
+    key = str(key)
+    if key.startswith(SESSION_KEY_PREFIX):
+        # Session keys are "<prefix><session key>" with no separator
+        return 'sessions'
+    return key.split(':', 1)[0]
+
+
+def record(prefix, event, count=1):
+    with _stats_lock:
+        _stats[prefix][event] += count
+
+
+def get_stats():
+    """Return {prefix: {'hits', 'misses', 'evictions', 'hit_rate'}} for this process."""
+    with _stats_lock:
+        snapshot = {prefix: dict(counter) for prefix, counter in _stats.items()}
+    for counter in snapshot.values():
+        for event in ('hits', 'misses', 'evictions'):
+            counter.setdefault(event, 0)
+        lookups = counter['hits'] + counter['misses']
+        counter['hit_rate'] = round(counter['hits'] / lookups, 4) if lookups else None
+    return snapshot
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class StatsMixin:
+    """Count hits and misses on every ``get`` (``get_many`` and ``get_or_set`` go through it)."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        if value is _MISSING:
+            record(key_prefix(key), 'misses')
+            return default
+        record(key_prefix(key), 'hits')
+        return value
+
+
+class StatsLocMemCache(StatsMixin, LocMemCache):
+
+    def _cull(self):
+        # Same policy as LocMemCache._cull, but remember which prefixes lost entries.
+        if self._cull_frequency == 0:
+            evicted = list(self._cache)
+            self._cache.clear()
+            self._expire_info.clear()
+        else:
+            evicted = []
+            for i in range(len(self._cache) // self._cull_frequency):
+                key, _ = self._cache.popitem()
+                del self._expire_info[key]
+                evicted.append(key)
+        # Stored keys look like "<KEY_PREFIX>:<version>:<key>".
+        counts = Counter(key_prefix(key.split(':', 2)[-1]) for key in evicted)
+        for prefix, count in counts.items():
+            record(prefix, 'evictions', count)
+
+    def entry_count(self):
+        return len(self._cache)
+
+
+class StatsFileBasedCache(StatsMixin, FileBasedCache):
+
+    def _cull(self):
+        # File names are hashes, so evictions cannot be traced back to a prefix.
+        before = len(self._list_cache_files())
+        super()._cull()
+        evicted = before - len(self._list_cache_files())
+        if evicted > 0:
+            record('*', 'evictions', evicted)
+
+    def entry_count(self):
+        if not os.path.isdir(self._dir):
+            return 0
+        return len(self._list_cache_files())
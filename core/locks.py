@@ -0,0 +1,38 @@
+"""
+Host-wide locks for read-modify-write updates of shared cache entries.
+
+Cache backends have no compare-and-set, and the file and /dev/shm backends
+implement ``incr`` as a get followed by a set, so concurrent updates from the
+workers on a host can overwrite one another. ``host_lock`` serialises them: a
+thread lock within the worker plus an flock on a file between workers.
+"""
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: threads are still serialised
+    fcntl = None
+
+_thread_locks = {}
+_thread_locks_lock = threading.Lock()
+
+
+def _thread_lock(path):
+    with _thread_locks_lock:
+        return _thread_locks.setdefault(path, threading.Lock())
+
+
+@contextmanager
+def host_lock(path):
+    """Hold an exclusive lock on ``path`` against other threads and processes on this host."""
+    with _thread_lock(path):
+        if fcntl is None:
+            yield
+            return
+        with open(path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.assets import build, dist_dir
+
+
+class Command(BaseCommand):
+    help = 'Bundle and minify static assets and extract critical CSS into static/dist/'
+
+    def handle(self, *args, **options):
+        for name, size in build().items():
+            self.stdout.write(f'{dist_dir() / name}: {size} bytes')
+        self.stdout.write(self.style.SUCCESS('Assets built.'))
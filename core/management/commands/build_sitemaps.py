@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.sitemaps import build
+from jobs.models import Job
+from jobs.queue import enqueue
+
+
+class Command(BaseCommand):
+    help = 'Write gzipped sitemaps and product/blog feeds to SITEMAP_ROOT, rewriting only what changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rewrite every sitemap shard')
+        parser.add_argument('--every', type=int, metavar='SECONDS',
+                            help='Also schedule a refresh as a job that re-queues itself every SECONDS')
+
+    def handle(self, *args, **options):
+        rewritten = build(full=options['full'])
+        summary = ', '.join(f'{count} {section}' for section, count in rewritten.items())
+        self.stdout.write(self.style.SUCCESS(f'Sitemaps up to date; shards rewritten: {summary}.'))
+        every = options['every']
+        if not every:
+            return
+        task = f'{build.__module__}.{build.__qualname__}'
+        if Job.objects.filter(task=task, status__in=['queued', 'running']).exists():
+            self.stdout.write('A recurring sitemap job is already scheduled.')
+            return
+        enqueue(build, every=every, delay=timedelta(seconds=every))
+        self.stdout.write(f'Scheduled sitemap refresh every {every} seconds.')
@@ -0,0 +1,22 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from core.storage import ContentAddressedStorage, move_legacy_files, recount
+
+
+class Command(BaseCommand):
+    help = 'Move uploads into content-addressed storage, recount references and remove unreferenced files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Keep unreferenced files written more recently than this')
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError("STORAGES['default'] is not core.storage.ContentAddressedStorage.")
+        moved, missing = move_legacy_files()
+        self.stdout.write(f'Moved {moved} files to content-addressed names.')
+        for name in sorted(missing):
+            self.stderr.write(f'Missing on disk, left as is: {name}')
+        removed = recount(default_storage, grace=options['grace_hours'] * 60 * 60)
+        self.stdout.write(self.style.SUCCESS(f'References recounted; {removed} unreferenced files removed.'))
@@ -0,0 +1,86 @@
+import socket
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Hit a running server with concurrent clients and report throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', help='e.g. http://127.0.0.1:8000')
+        parser.add_argument('paths', nargs='*', default=['/', '/products/', '/blog/'])
+        parser.add_argument('--clients', type=int, default=20, help='Concurrent clients')
+        parser.add_argument('--duration', type=float, default=15.0, help='Seconds to run')
+        parser.add_argument('--think', type=float, default=0.0,
+                            help='Seconds each client waits between requests')
+        parser.add_argument('--slow-clients', type=int, default=0,
+                            help='Extra clients on a slow uplink: each request is sent in two '
+                                 'halves --slow-delay seconds apart (not counted in the results)')
+        parser.add_argument('--slow-delay', type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        base, paths = options['base_url'].rstrip('/'), options['paths']
+        deadline = time.monotonic() + options['duration']
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def client(number):
+            i = number
+            while time.monotonic() < deadline:
+                url = base + paths[i % len(paths)]
+                i += 1
+                start = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(url, timeout=30) as response:
+                        response.read()
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        latencies.append(elapsed)
+                except (urllib.error.URLError, OSError) as exc:
+                    with lock:
+                        errors.append(exc)
+                if options['think']:
+                    time.sleep(options['think'])
+
+        target = urlsplit(base)
+
+        def slow_client(number):
+            # Like a phone on 2G: the connection holds a server worker while the request trickles in
+            while time.monotonic() < deadline:
+                request = (f'GET {target.path or ""}{paths[number % len(paths)]} HTTP/1.1\r\n'
+                           f'Host: {target.hostname}\r\nConnection: close\r\n\r\n').encode()
+                try:
+                    with socket.create_connection((target.hostname, target.port or 80), timeout=30) as sock:
+                        sock.sendall(request[:len(request) // 2])
+                        time.sleep(options['slow_delay'])
+                        sock.sendall(request[len(request) // 2:])
+                        while sock.recv(65536):
+                            pass
+                except OSError:
+                    time.sleep(options['slow_delay'])
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['clients'] + options['slow_clients']) as pool:
+            slow = [pool.submit(slow_client, n) for n in range(options['slow_clients'])]
+            list(pool.map(client, range(options['clients'])))
+            wall = time.monotonic() - started
+            for future in slow:
+                future.result()
+
+        if not latencies:
+            self.stderr.write(f'No successful requests ({len(errors)} errors).')
+            return
+        latencies.sort()
+        pct = lambda p: latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000
+        self.stdout.write(f"{len(latencies)} requests in {wall:.1f}s with {options['clients']} clients")
+        self.stdout.write(f'  throughput  {len(latencies) / wall:8.1f} req/s')
+        self.stdout.write(f'  latency     p50 {pct(0.50):.0f} ms  p95 {pct(0.95):.0f} ms  '
+                          f'p99 {pct(0.99):.0f} ms  mean {statistics.mean(latencies) * 1000:.0f} ms')
+        self.stdout.write(f'  errors      {len(errors)}')
@@ -0,0 +1,102 @@
+import json
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter so imports and first requests are really cold
+CHILD_SCRIPT = """
+import json, os, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agrimarket.settings')
+start = time.perf_counter()
+import django
+django.setup()
+from django.test.utils import setup_test_environment
+setup_test_environment()
+from django.test import Client
+from django.urls import get_resolver
+get_resolver().url_patterns
+setup_ms = (time.perf_counter() - start) * 1000
+client = Client()
+requests = []
+for url in sys.argv[1:]:
+    timings = []
+    for attempt in range(2):
+        t = time.perf_counter()
+        status = client.get(url).status_code
+        timings.append((time.perf_counter() - t) * 1000)
+    requests.append({'url': url, 'status': status, 'first_ms': timings[0], 'warm_ms': timings[1]})
+print(json.dumps({'setup_ms': setup_ms, 'requests': requests}))
+"""
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start cost: import time per module and first vs warm request time per URL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', default=['/', '/products/', '/blog/', '/accounts/login/'])
+        parser.add_argument('--top', type=int, default=15, help='Number of slowest modules to list')
+        parser.add_argument('--json', action='store_true', help='Print the raw report as JSON')
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, *options['urls']],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            self.stderr.write(result.stderr[-2000:])
+            return
+        child = json.loads(result.stdout.strip().splitlines()[-1])
+        modules, packages = self.parse_importtime(result.stderr)
+        report = {
+            'setup_ms': round(child['setup_ms'], 1),
+            'import_ms': round(sum(packages.values()) / 1000, 1),
+            'packages': {name: round(us / 1000, 1) for name, us in sorted(packages.items(), key=lambda kv: -kv[1])},
+            'slowest_modules': [
+                {'module': name, 'cumulative_ms': round(us / 1000, 1)}
+                for name, us in sorted(modules.items(), key=lambda kv: -kv[1])[:options['top']]
+            ],
+            'requests': [
+                {**r, 'first_ms': round(r['first_ms'], 1), 'warm_ms': round(r['warm_ms'], 1)}
+                for r in child['requests']
+            ],
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.print_report(report, options['top'])
+
+    def parse_importtime(self, stderr):
+        """Return ({top-level module: cumulative us}, {package: self us})"""
+        modules, packages = {}, defaultdict(int)
+        for line in stderr.splitlines():
+            match = IMPORT_LINE.match(line)
+            if not match:
+                continue
+            self_us, cumulative_us, indent, name = match.groups()
+            packages[name.split('.')[0]] += int(self_us)
+            # Only outermost imports: nested ones are already in their parent's cumulative time
+            if len(indent) <= 1:
+                modules[name] = int(cumulative_us)
+        return modules, packages
+
+    def print_report(self, report, top):
+        self.stdout.write(f"Django setup + URLconf: {report['setup_ms']} ms "
+                          f"(of which imports: {report['import_ms']} ms)")
+        self.stdout.write('\nImport time by package (self time):')
+        for name, ms in list(report['packages'].items())[:top]:
+            self.stdout.write(f'  {name:<30} {ms:>8.1f} ms')
+        self.stdout.write('\nSlowest top-level imports (cumulative):')
+        for row in report['slowest_modules']:
+            self.stdout.write(f"  {row['module']:<30} {row['cumulative_ms']:>8.1f} ms")
+        self.stdout.write('\nFirst request vs warm request:')
+        for row in report['requests']:
+            self.stdout.write(
+                f"  {row['url']:<30} {row['status']}  first {row['first_ms']:>7.1f} ms"
+                f"  warm {row['warm_ms']:>7.1f} ms  cold cost {row['first_ms'] - row['warm_ms']:>7.1f} ms"
+            )
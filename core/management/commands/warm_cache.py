@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.cache import warm
+
+
+class Command(BaseCommand):
+    help = 'Pre-load hot cache keys (categories, featured products, home page data)'
+
+    def handle(self, *args, **options):
+        if settings.CACHE_BACKEND == 'locmem':
+            self.stdout.write(self.style.WARNING(
+                'CACHE_BACKEND is locmem: keys warmed here are not visible to the web workers.'
+            ))
+        for key, count in warm().items():
+            self.stdout.write(f'{key}: {count} items')
+        self.stdout.write(self.style.SUCCESS('Cache warmed.'))
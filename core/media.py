@@ -0,0 +1,48 @@
+import re
+
+from django.conf import settings
+
+# Names that change whenever their content changes: a 12+ hex digit hash right
+# before the extension ("photo.3c20cb04b94e.jpg") or as the whole file name.
+HASHED_NAME_RE = re.compile(r'(?:^|[./])[0-9a-f]{12,}\.\w+$')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def is_hashed_name(path):
+    return bool(HASHED_NAME_RE.search(path))
+
+
+def cache_control_for(path):
+    if is_hashed_name(path):
+        return f'public, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={settings.MEDIA_MAX_AGE}'
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range ``Range`` header into an inclusive (start, end) pair.
+
+    Returns None when the header is absent, malformed (``bytes=5-2``) or asks
+    for several ranges, so the whole file is sent instead, and raises
+    ValueError when it cannot be satisfied (416): a start past the end of the
+    file or an empty suffix.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(last), size - 1) if last else size - 1
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+# Stored File Model
+# One row per file kept by core.storage.ContentAddressedStorage, counting the
+# model fields that point at it; the file is removed when the count reaches 0.
+class StoredFile(models.Model):
+    name = models.CharField(max_length=100, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.references} refs)"
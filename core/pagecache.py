@@ -0,0 +1,126 @@
+"""
+Full-page cache for the public catalogue and blog pages.
+
+settings.PAGE_CACHE_VIEWS maps URL names to a mode:
+
+``shared``
+    One cached copy serves everybody. base.html renders a placeholder where
+    the per-user navigation and flash messages go, and main.js fills it from
+    the small ``core:user_fragment`` endpoint. For pages whose body is the
+    same for every visitor.
+``anonymous``
+    Cached copies are only served to, and only stored from, requests with no
+    session, messages or cart cookie. For pages whose body changes for
+    signed-in users (e.g. product detail: cart and review buttons).
+
+Keys are built from the path and the sorted, non-empty query parameters plus a
+generation number; product, category, review and blog changes bump the
+generation, which retires every cached page at once. Stock levels shown on
+cached pages may lag by up to PAGE_CACHE_TIMEOUT seconds.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+GENERATION_KEY = 'page:generation'
+IGNORED_PARAMS = ('utm_', 'fbclid', 'gclid')
+
+
+def normalize_url(request):
+    """Path plus sorted query parameters, without empty values and tracking parameters."""
+    params = sorted(
+        (name, value)
+        for name, values in request.GET.lists()
+        if not name.startswith(IGNORED_PARAMS)
+        for value in values
+        if value
+    )
+    return f'{request.path}?{urlencode(params)}' if params else request.path
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Start from the clock so an evicted counter never revives old pages
+        cache.add(GENERATION_KEY, time.time_ns() // 1000, None)
+        generation = cache.get(GENERATION_KEY, 0)
+    return generation
+
+
+def invalidate_pages():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        pass
+
+
+def page_key(request):
+    digest = hashlib.md5(normalize_url(request).encode(), usedforsecurity=False).hexdigest()
+    return f'page:{get_generation()}:{request.method}:{digest}'
+
+
+def has_user_state(request):
+    cookies = (settings.SESSION_COOKIE_NAME, 'messages', settings.CART_COOKIE_NAME)
+    return any(name in request.COOKIES for name in cookies)
+
+
+class PageCacheMiddleware:
+    """Serve and store whole responses for the views in PAGE_CACHE_VIEWS."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, 'page_cache_key', None)
+        if key and self.cacheable(response):
+            response['X-Page-Cache'] = 'MISS'
+            if response.streaming:
+                response.streaming_content = self.store_when_sent(key, response, response.streaming_content)
+            else:
+                cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.PAGE_CACHE_ENABLED or request.method not in ('GET', 'HEAD'):
+            return None
+        if getattr(request, 'profiling', False):
+            # core.profiling: measure the view, not a cache hit
+            return None
+        mode = settings.PAGE_CACHE_VIEWS.get(request.resolver_match.view_name)
+        if mode is None or (mode == 'anonymous' and has_user_state(request)):
+            return None
+        # Tells base.html to leave the per-user parts to the fragment endpoint
+        request.page_cache_shared = mode == 'shared'
+        request.page_cache_key = page_key(request)
+        response = cache.get(request.page_cache_key)
+        if response is None:
+            return None
+        request.page_cache_key = None
+        response['X-Page-Cache'] = 'HIT'
+        return response
+
+    def cacheable(self, response):
+        # A response that sets cookies (CSRF token, session) is specific to one visitor
+        return (
+            response.status_code == 200
+            and not response.cookies
+            and 'private' not in response.get('Cache-Control', '')
+        )
+
+    def store_when_sent(self, key, response, content):
+        # Streamed pages (core.streaming) are passed through and cached once complete
+        chunks = []
+        for chunk in content:
+            chunks.append(chunk)
+            yield chunk
+        cache.set(key, HttpResponse(b''.join(chunks), headers=dict(response.items())), settings.PAGE_CACHE_TIMEOUT)
+
+
+def page_cache(request):
+    """Context processor: whether this page is being rendered for the shared cache."""
+    return {'page_cache_shared': getattr(request, 'page_cache_shared', False)}
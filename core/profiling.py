@@ -0,0 +1,179 @@
+"""
+On-demand profiling of single requests, for staff.
+
+A staff user adds ``?_profile=1`` to a URL, or sends an ``X-Profile: 1``
+header, and ProfilerMiddleware runs the rest of the request under cProfile and
+a stack sampler. SQL statements are timed as they run. Three files per request
+go to PROFILER_DIR:
+
+    <id>.prof        cProfile stats (``python -m pstats``, snakeviz)
+    <id>.collapsed   sampled stacks, one "frame;frame;... count" line each
+                     (flamegraph.pl, speedscope)
+    <id>.json        method, path, status, wall time and every SQL statement with its time
+
+Staff can list and download them at /profiles/. A streamed response is
+consumed while the profiler is running, so its rows are included. The page
+cache is bypassed for profiled requests. Requests without the flag only pay
+for the check itself; with PROFILER_ENABLED off the middleware is not loaded
+at all.
+"""
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils import timezone
+
+PROFILE_NAME_RE = re.compile(r'^[\w-]+\.(?:prof|collapsed|json)$')
+
+
+def is_requested(request):
+    return settings.PROFILER_QUERY_PARAM in request.GET or settings.PROFILER_HEADER in request.headers
+
+
+class StackSampler:
+    """Samples one thread's Python stack every ``interval`` seconds from a helper thread."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.counts = Counter()
+        self.thread_id = threading.get_ident()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='profiler-sampler', daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({self.short_path(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    @staticmethod
+    def short_path(filename):
+        for prefix in (str(settings.BASE_DIR), *sys.path):
+            if prefix and filename.startswith(prefix):
+                return filename[len(prefix):].lstrip(os.sep)
+        return filename
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.counts.most_common())
+
+
+class QueryTimer:
+    """connection.execute_wrapper hook recording each statement's duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({'sql': sql, 'ms': round((time.perf_counter() - start) * 1000, 3), 'many': many})
+
+
+def profile_dir():
+    os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+    return settings.PROFILER_DIR
+
+
+def save(request, response, profile, sampler, timer, elapsed):
+    """Write the three files for one request; returns the id they share."""
+    slug = re.sub(r'[^\w]+', '-', request.path).strip('-')[:60] or 'root'
+    profile_id = f"{timezone.now():%Y%m%d-%H%M%S}-{request.method.lower()}-{slug}-{uuid.uuid4().hex[:6]}"
+    path = os.path.join(profile_dir(), profile_id)
+    profile.dump_stats(f'{path}.prof')
+    with open(f'{path}.collapsed', 'w') as f:
+        f.write(sampler.collapsed())
+    with open(f'{path}.json', 'w') as f:
+        json.dump({
+            'method': request.method,
+            'path': request.get_full_path(),
+            'user': request.user.get_username(),
+            'status': response.status_code,
+            'wall_ms': round(elapsed * 1000, 1),
+            'sql_ms': round(sum(query['ms'] for query in timer.queries), 1),
+            'samples': sum(sampler.counts.values()),
+            'queries': timer.queries,
+        }, f, indent=1)
+    prune()
+    return profile_id
+
+
+def prune():
+    """Keep the newest PROFILER_KEEP profiles."""
+    profiles = sorted(name for name in os.listdir(profile_dir()) if name.endswith('.json'))
+    for name in profiles[:-settings.PROFILER_KEEP]:
+        stem = name[:-len('.json')]
+        for extension in ('.prof', '.collapsed', '.json'):
+            try:
+                os.remove(os.path.join(profile_dir(), stem + extension))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    """Summaries of the stored profiles, newest first."""
+    profiles = []
+    for name in sorted(os.listdir(profile_dir()), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(profile_dir(), name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        data['id'] = name[:-len('.json')]
+        data['query_count'] = len(data.pop('queries', []))
+        profiles.append(data)
+    return profiles
+
+
+class ProfilerMiddleware:
+    """Profile the rest of the request when a staff user asks for it."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_requested(request) or not request.user.is_staff:
+            return self.get_response(request)
+
+        request.profiling = True
+        profile, timer = cProfile.Profile(), QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer), StackSampler(settings.PROFILER_SAMPLE_INTERVAL) as sampler:
+            profile.enable()
+            try:
+                response = self.get_response(request)
+                if response.streaming:
+                    # Streamed rows are rendered and queried as they are read
+                    response.streaming_content = [b''.join(response.streaming_content)]
+            finally:
+                profile.disable()
+        elapsed = time.perf_counter() - start
+        response['X-Profile-Id'] = save(request, response, profile, sampler, timer, elapsed)
+        return response
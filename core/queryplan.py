@@ -0,0 +1,66 @@
+"""
+EXPLAIN QUERY PLAN checks for captured SQL (SQLite).
+
+``plan_problems(queries)`` runs each captured statement through EXPLAIN QUERY
+PLAN and reports every SCAN of the tables in LARGE_TABLES and every temporary
+B-tree (ORDER BY, including its right part, GROUP BY and DISTINCT). A SCAN
+that walks an index is still a scan: ``SCAN t USING COVERING INDEX i`` reads
+all of i, which is what a LIKE '%...%' search or a bare COUNT(*) does. Scans
+that are bounded some other way, such as an index read in order under a LIMIT,
+must be named in ``allowed`` by the caller. core/tests.py uses it to hold the
+hot views to index-backed plans.
+"""
+import re
+
+from django.db import connection
+
+# Tables that grow with users, listings and orders. Categories, blog posts and
+# Django's own bookkeeping tables stay small enough to scan.
+LARGE_TABLES = {
+    'accounts_user',
+    'products_product',
+    'products_stockmovement',
+    'products_wishlist',
+    'orders_cart',
+    'orders_order',
+    'orders_orderitem',
+    'orders_archivedorder',
+    'orders_archivedorderitem',
+    'reviews_review',
+    'jobs_job',
+}
+
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+ALIAS_RE = re.compile(r'"(\w+)" (?:AS )?"?([A-Z]\d+)"?\b')
+SCAN_RE = re.compile(r'^SCAN (\S+)(?: USING (?:COVERING )?INDEX (\S+))?')
+
+
+def explain(sql):
+    """The plan's detail lines for one statement."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(queries, large_tables=LARGE_TABLES, allowed=()):
+    """
+    [(sql, plan line)] for every scan of a large table and every temporary
+    B-tree. Scans of a table or index named in ``allowed`` are accepted.
+    """
+    problems = []
+    for query in queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith(EXPLAINABLE):
+            continue
+        # Subqueries refer to tables by alias (U0, T3 ...)
+        aliases = dict((alias, table) for table, alias in ALIAS_RE.findall(sql))
+        for line in explain(sql):
+            match = SCAN_RE.match(line)
+            if match:
+                table = aliases.get(match.group(1), match.group(1))
+                index = match.group(2)
+                if table in large_tables and table not in allowed and index not in allowed:
+                    problems.append((sql, line))
+            elif line.startswith('USE TEMP B-TREE'):
+                problems.append((sql, line))
+    return problems
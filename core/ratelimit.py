@@ -0,0 +1,153 @@
+"""
+Token-bucket rate limiting per URL name, keyed by client IP and by user.
+
+Configured in settings.RATELIMITS, e.g.::
+
+    RATELIMITS = {
+        'accounts:login': {'rate': '5/m', 'methods': ['POST']},
+        'products:product_list': {'rate': '30/m', 'params': ['q']},
+    }
+
+``rate`` is "<requests>/<s|m|h>", ``burst`` the bucket size (defaults to the
+request count), ``methods`` and ``params`` narrow which requests are counted.
+Buckets live in the default cache so all workers share them; if the cache
+fails, each process falls back to its own in-memory buckets. A bucket update
+(read, refill, take, write) runs under core.locks.host_lock on
+RATELIMIT_LOCK_FILE, so the workers on a host cannot overdraw a bucket.
+"""
+import logging
+import math
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .locks import host_lock
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60}
+
+_local_buckets = {}
+_local_lock = threading.Lock()
+_throttled = Counter()
+_throttled_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """'30/m' -> (30, 60)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def client_ip(request):
+    """The client address, skipping RATELIMIT_PROXY_COUNT trusted proxies in X-Forwarded-For."""
+    proxies = settings.RATELIMIT_PROXY_COUNT
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',')]
+        return hops[-min(proxies, len(hops))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _take(state, now, capacity, per_second):
+    """Refill ``state`` (tokens, timestamp) and take one token; returns (new state, wait seconds)."""
+    tokens, stamp = state if state else (capacity, now)
+    tokens = min(capacity, tokens + (now - stamp) * per_second)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / per_second
+
+
+def _take_all(states, keys, now, capacity, per_second):
+    """Take a token from every bucket in ``keys``; returns (new states, longest wait)."""
+    taken, waits = {}, [0]
+    for key in keys:
+        taken[key], wait = _take(states.get(key), now, capacity, per_second)
+        waits.append(wait)
+    return taken, max(waits)
+
+
+def consume(keys, capacity, per_second, timeout):
+    """
+    Take a token from each bucket in ``keys``, or from none of them if any is
+    empty; returns 0 when allowed, else seconds until every bucket has a token.
+    """
+    now = time.time()
+    try:
+        with host_lock(settings.RATELIMIT_LOCK_FILE):
+            taken, wait = _take_all(cache.get_many(keys), keys, now, capacity, per_second)
+            if not wait:
+                cache.set_many(taken, timeout)
+    except Exception:
+        logger.warning('Rate limit cache unavailable, using local buckets', exc_info=True)
+        with _local_lock:
+            taken, wait = _take_all(_local_buckets, keys, now, capacity, per_second)
+            if not wait:
+                _local_buckets.update(taken)
+    return wait
+
+
+def record_throttled(name):
+    with _throttled_lock:
+        _throttled[name] += 1
+
+
+def get_throttled():
+    """{URL name: requests refused} for this process."""
+    with _throttled_lock:
+        return dict(_throttled)
+
+
+def _applies(rule, request):
+    methods = rule.get('methods')
+    if methods and request.method not in methods:
+        return False
+    params = rule.get('params')
+    if params and not any(request.GET.get(param) for param in params):
+        return False
+    return True
+
+
+def check(name, rule, request):
+    """Seconds to wait if ``request`` is over ``rule``'s limit, else 0."""
+    count, period = parse_rate(rule['rate'])
+    capacity = rule.get('burst', count)
+    per_second = count / period
+    identities = [f'ip:{client_ip(request)}']
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        identities.append(f'user:{user.pk}')
+    # Every identity pays a token, so a user cannot dodge the limit by switching networks;
+    # a refused request pays none
+    return consume([f'ratelimit:{name}:{identity}' for identity in identities], capacity, per_second, period * 2)
+
+
+class RateLimitMiddleware:
+    """Refuse requests over the RATELIMITS rule for their URL name with 429 Too Many Requests."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.RATELIMIT_ENABLED:
+            return None
+        name = request.resolver_match.view_name
+        rule = settings.RATELIMITS.get(name)
+        if rule is None or not _applies(rule, request):
+            return None
+        wait = check(name, rule, request)
+        if not wait:
+            return None
+        record_throttled(name)
+        logger.info('Rate limited %s for %s', name, client_ip(request))
+        response = HttpResponse('Too many requests. Please wait a moment and try again.',
+                                status=429, content_type='text/plain')
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
@@ -0,0 +1,204 @@
+"""
+Precomputed sitemaps and feeds for crawlers.
+
+``build()`` (``manage.py build_sitemaps``) writes gzipped files to SITEMAP_ROOT,
+which core.views.crawl_file serves with validators and cache headers:
+
+    sitemap.xml.gz                   index of the sitemaps below
+    sitemap-pages.xml.gz             home, listings and one page per category
+    sitemap-products-<n>.xml.gz      active products, SITEMAP_SHARD_SIZE pks per shard
+    sitemap-blog-<n>.xml.gz          published blog posts, likewise
+    products.rss.gz, products.atom.gz, blog.rss.gz, blog.atom.gz
+                                     the latest FEED_ITEMS of each
+
+Shards cover fixed pk ranges, so an object always lands in the same shard.
+manifest.json keeps each shard's row count and newest ``updated_at``. A build
+compares them with one grouped query and rewrites only the shards whose numbers
+moved, which covers edits, deactivations and deletions. The small files are
+regenerated on every build but only written when their bytes change, so their
+ETag and Last-Modified stay put.
+"""
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max
+from django.urls import reverse
+from django.utils import feedgenerator
+
+from blog.models import BlogPost
+from products.cache import get_categories
+from products.models import Product
+
+MANIFEST_NAME = 'manifest.json'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+# section: (objects listed, field their URL is built from, URL name)
+SECTIONS = {
+    'products': (lambda: Product.objects.filter(is_active=True), 'pk', 'products:product_detail'),
+    'blog': (lambda: BlogPost.objects.filter(is_published=True), 'slug', 'blog:blog_detail'),
+}
+
+
+def absolute(path):
+    return settings.SITE_URL.rstrip('/') + path
+
+
+def sitemap_root():
+    root = settings.SITEMAP_ROOT
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def write_gzip(name, text):
+    """Write ``name``.gz atomically; returns False when the file already held exactly this."""
+    # mtime=0 makes the bytes depend on the text only, so unchanged files compare equal
+    data = gzip.compress(text.encode('utf-8'), mtime=0)
+    path = os.path.join(sitemap_root(), f'{name}.gz')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    fd, tmp = tempfile.mkstemp(dir=sitemap_root(), prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+    return True
+
+
+def urlset(entries):
+    """<urlset> for (path, lastmod or None) pairs."""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<urlset xmlns="{SITEMAP_NS}">']
+    for path, lastmod in entries:
+        lastmod = f'<lastmod>{lastmod.isoformat(timespec="seconds")}</lastmod>' if lastmod else ''
+        lines.append(f'<url><loc>{escape(absolute(path))}</loc>{lastmod}</url>')
+    lines.append('</urlset>')
+    return '\n'.join(lines)
+
+
+def shard_stats(section, size):
+    """{shard: [row count, newest updated_at]} from a single grouped query."""
+    queryset, _, _ = SECTIONS[section]
+    rows = (
+        queryset().order_by().annotate(shard=(F('pk') - 1) / size)
+        .values('shard').annotate(count=Count('pk'), latest=Max('updated_at'))
+        .values_list('shard', 'count', 'latest')
+    )
+    return {str(shard): [count, latest.isoformat()] for shard, count, latest in rows}
+
+
+def write_shard(section, shard, size):
+    queryset, key, url_name = SECTIONS[section]
+    shard = int(shard)
+    rows = (
+        queryset().filter(pk__gt=shard * size, pk__lte=(shard + 1) * size)
+        .order_by('pk').values_list(key, 'updated_at').iterator()
+    )
+    entries = ((reverse(url_name, args=[value]), updated) for value, updated in rows)
+    write_gzip(f'sitemap-{section}-{shard}.xml', urlset(entries))
+
+
+def pages_sitemap():
+    # Listing pages once each; sorted and searched variants are kept out by robots.txt
+    paths = [reverse('home'), reverse('products:product_list'), reverse('blog:blog_list')]
+    paths += [f"{reverse('products:product_list')}?category={category.pk}" for category in get_categories()]
+    return urlset((path, None) for path in paths)
+
+
+def sitemap_index(manifest):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<sitemapindex xmlns="{SITEMAP_NS}">']
+    lines.append(f'<sitemap><loc>{escape(absolute("/sitemap-pages.xml"))}</loc></sitemap>')
+    for section in SECTIONS:
+        for shard, (_, latest) in sorted(manifest.get(section, {}).items(), key=lambda item: int(item[0])):
+            lines.append(
+                f'<sitemap><loc>{escape(absolute(f"/sitemap-{section}-{shard}.xml"))}</loc>'
+                f'<lastmod>{datetime.fromisoformat(latest).isoformat(timespec="seconds")}</lastmod></sitemap>'
+            )
+    lines.append('</sitemapindex>')
+    return '\n'.join(lines)
+
+
+def write_feeds():
+    feeds = {
+        'products': (
+            'AgriMarket - New products', reverse('products:product_list'), 'Newly listed seeds and tools',
+            [
+                (product.name, reverse('products:product_detail', args=[product.pk]), product.description,
+                 product.created_at, product.updated_at)
+                for product in Product.objects.filter(is_active=True).order_by('-created_at')[:settings.FEED_ITEMS]
+            ],
+        ),
+        'blog': (
+            'AgriMarket - Farming guides', reverse('blog:blog_list'), 'Farming guides and tips',
+            [
+                (post.title, reverse('blog:blog_detail', args=[post.slug]), post.content,
+                 post.created_at, post.updated_at)
+                for post in BlogPost.objects.filter(is_published=True).order_by('-created_at')[:settings.FEED_ITEMS]
+            ],
+        ),
+    }
+    for name, (title, link, description, items) in feeds.items():
+        for extension, feed_class in (('rss', feedgenerator.Rss201rev2Feed), ('atom', feedgenerator.Atom1Feed)):
+            feed = feed_class(
+                title=title, link=absolute(link), description=description,
+                feed_url=absolute(f'/feeds/{name}.{extension}'), language=settings.LANGUAGE_CODE,
+            )
+            for item_title, item_link, item_description, created, updated in items:
+                feed.add_item(
+                    title=item_title, link=absolute(item_link), unique_id=absolute(item_link),
+                    description=item_description[:500], pubdate=created, updateddate=updated,
+                )
+            write_gzip(f'{name}.{extension}', feed.writeString('utf-8'))
+
+
+def load_manifest():
+    try:
+        with open(os.path.join(sitemap_root(), MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def build(full=False, every=None):
+    """
+    Bring SITEMAP_ROOT up to date; returns {section: shards rewritten}. With
+    ``every`` (seconds), schedules the next refresh as a job.
+    """
+    size = settings.SITEMAP_SHARD_SIZE
+    old = load_manifest()
+    # Shard numbers mean other pk ranges after a size change, so start over
+    reuse = not full and old.get('shard_size') == size
+    manifest = {'shard_size': size}
+    rewritten = {}
+    for section in SECTIONS:
+        stats = shard_stats(section, size)
+        previous = old.get(section, {})
+        changed = [shard for shard, numbers in stats.items() if not reuse or previous.get(shard) != numbers]
+        for shard in changed:
+            write_shard(section, shard, size)
+        # Shards whose last object went away
+        for shard in previous.keys() - stats.keys():
+            try:
+                os.remove(os.path.join(sitemap_root(), f'sitemap-{section}-{shard}.xml.gz'))
+            except FileNotFoundError:
+                pass
+        manifest[section] = stats
+        rewritten[section] = len(changed)
+
+    write_gzip('sitemap-pages.xml', pages_sitemap())
+    write_gzip('sitemap.xml', sitemap_index(manifest))
+    write_feeds()
+    # Written last: an interrupted build is simply redone next time
+    with open(os.path.join(sitemap_root(), MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f)
+    if every:
+        from jobs.queue import enqueue
+        enqueue(build, every=every, delay=timedelta(seconds=every))
+    return rewritten
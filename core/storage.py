@@ -0,0 +1,213 @@
+"""
+Content-addressed storage for uploaded media.
+
+ContentAddressedStorage names each file after the SHA-256 of its bytes,
+fanned out over two levels of directories so none grows too large:
+
+    products/photo.JPG  ->  3c/20/3c20cb04b94e...e1f2.jpg
+
+The same photo uploaded for many products is written once and shared. The
+name changes whenever the content does, so core.views.serve_media sends these
+files with MEDIA_IMMUTABLE_MAX_AGE and ``immutable`` (see core.media).
+
+StoredFile counts the fields that point at each file. ``save`` adds one and
+``delete`` takes one away, removing the file with the last reference. The
+handlers connected by ``connect_signals`` call ``delete`` after commit when a
+row is deleted or its file is replaced. A save whose transaction rolls back
+leaves its file without a count; ``manage.py dedupe_media`` recounts from the
+model fields and removes such orphans, and moves files saved under their
+upload names before this storage was enabled.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import time
+import uuid
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F, FileField
+from django.db.models.signals import post_delete, pre_save
+
+# "3c/20/3c20cb04...e1f2.jpg"
+CONTENT_NAME_RE = re.compile(r'^([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}(?:\.[a-z0-9]+)?$')
+
+
+def is_content_name(name):
+    return bool(CONTENT_NAME_RE.match(name or ''))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that stores each distinct content once, under its hash."""
+
+    def get_available_name(self, name, max_length=None):
+        # The real name depends on the content and is chosen in _save
+        return name
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = posixpath.splitext(name)[1].lower()
+        if not re.fullmatch(r'\.[a-z0-9]{1,8}', extension):
+            extension = ''
+        return f'{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Marks the file as in use for the grace period of ``recount``
+            os.utime(self.path(name))
+        else:
+            # Written under a private name and renamed into place, so concurrent
+            # uploads of the same bytes never see a half-written file
+            partial = super()._save(f'{posixpath.dirname(name)}/.{uuid.uuid4().hex}.part', content)
+            os.replace(self.path(partial), self.path(name))
+        self.add_reference(name)
+        return name
+
+    def add_reference(self, name):
+        from .models import StoredFile
+
+        with transaction.atomic():
+            if StoredFile.objects.filter(name=name).update(references=F('references') + 1):
+                return
+            try:
+                with transaction.atomic():
+                    StoredFile.objects.create(name=name, size=self.size(name), references=1)
+            except IntegrityError:
+                # Another upload of the same file created the row first
+                StoredFile.objects.filter(name=name).update(references=F('references') + 1)
+
+    def delete(self, name):
+        """Drop one reference to ``name``; the file goes with the last one."""
+        from .models import StoredFile
+
+        if not is_content_name(name):
+            return super().delete(name)
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is not None and stored.references > 1:
+                stored.references -= 1
+                stored.save(update_fields=['references'])
+                return
+            if stored is not None:
+                stored.delete()
+            super().delete(name)
+
+
+def file_fields(model):
+    """The model's FileFields kept in a ContentAddressedStorage."""
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def release_replaced_files(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or instance.pk is None or instance._state.adding:
+        return
+    fields = [
+        field for field in file_fields(sender)
+        if update_fields is None or field.name in update_fields
+    ]
+    if not fields:
+        return
+    old = sender._base_manager.filter(pk=instance.pk).values(*[field.attname for field in fields]).first() or {}
+    for field in fields:
+        file = getattr(instance, field.attname)
+        old_name = old.get(field.attname)
+        # A new upload is not saved yet; its own reference is added when it is,
+        # even if it turns out to hold the same bytes as the old file
+        if old_name and (old_name != file.name or not file._committed):
+            transaction.on_commit(lambda storage=field.storage, name=old_name: storage.delete(name))
+
+
+def release_deleted_files(sender, instance, **kwargs):
+    for field in file_fields(sender):
+        name = getattr(instance, field.attname).name
+        if name:
+            transaction.on_commit(lambda storage=field.storage, name=name: storage.delete(name))
+
+
+def connect_signals(models):
+    """
+    Release files when rows of ``models`` are deleted or their files replaced.
+    Connected per model: a listener for every sender would stop Django from
+    fast-deleting rows of models that have no files.
+    """
+    for model in models:
+        if file_fields(model):
+            pre_save.connect(release_replaced_files, sender=model, dispatch_uid=f'cas-replace-{model._meta.label}')
+            post_delete.connect(release_deleted_files, sender=model, dispatch_uid=f'cas-delete-{model._meta.label}')
+
+
+def stored_rows():
+    """(model, field, (pk, name) rows) for every field kept in a ContentAddressedStorage."""
+    for model in apps.get_models():
+        for field in file_fields(model):
+            rows = model._base_manager.exclude(**{field.attname: ''}).exclude(**{f'{field.attname}__isnull': True})
+            yield model, field, rows.values_list('pk', field.attname)
+
+
+def move_legacy_files():
+    """
+    Re-save files stored under their upload names and point the rows at the
+    new names; returns (files moved, names missing on disk).
+    """
+    moved, missing = {}, set()
+    for model, field, rows in list(stored_rows()):
+        for pk, name in rows.iterator():
+            if is_content_name(name) or name in missing:
+                continue
+            if name not in moved:
+                if not field.storage.exists(name):
+                    missing.add(name)
+                    continue
+                with field.storage.open(name) as f:
+                    moved[name] = (field.storage, field.storage.save(name, f))
+            model._base_manager.filter(pk=pk).update(**{field.attname: moved[name][1]})
+    for name, (storage, _) in moved.items():
+        FileSystemStorage.delete(storage, name)
+    return len(moved), missing
+
+
+def recount(storage, grace=24 * 60 * 60):
+    """
+    Set every StoredFile count from the rows that point at it and remove
+    content files in ``storage`` that nothing points at and that have not been
+    written for ``grace`` seconds; returns how many files were removed.
+    """
+    from .models import StoredFile
+
+    counts = Counter()
+    for _, _, rows in stored_rows():
+        counts.update(name for _, name in rows.iterator() if is_content_name(name))
+    removed, cutoff = 0, time.time() - grace
+    for directory, subdirectories, files in os.walk(storage.location):
+        if directory == os.fspath(storage.location):
+            subdirectories[:] = [name for name in subdirectories if re.fullmatch(r'[0-9a-f]{2}', name)]
+        for filename in files:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+            if name in counts or not (is_content_name(name) or filename.endswith('.part')):
+                continue
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().in_bulk()
+        StoredFile.objects.filter(pk__in=stored.keys() - counts.keys()).delete()
+        for name, references in counts.items():
+            if name in stored:
+                stored[name].references = references
+            elif storage.exists(name):
+                StoredFile.objects.create(name=name, size=storage.size(name), references=references)
+        StoredFile.objects.bulk_update([row for name, row in stored.items() if name in counts], ['references'])
+    return removed
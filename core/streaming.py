@@ -0,0 +1,87 @@
+"""
+Streaming render for long listing pages.
+
+``render_streaming`` renders the page around the listing straight away and
+sends it as a StreamingHttpResponse, so the head, navigation and messages reach
+the browser before the listing is read. The rows come from the template's
+``{% stream item in items %} ... {% empty %} ... {% endstream %}`` block
+(core.templatetags.streaming). The block reads querysets with
+``.iterator(chunk_size=STREAM_CHUNK_SIZE)`` and sends each chunk of rendered rows
+as soon as it is ready.
+
+Messages are consumed and the CSRF token is issued while the surrounding page
+is rendered, before the middleware finishes with the response. So
+``{% csrf_token %}`` and the messages include work in streamed pages just as
+they do in rendered ones. Rows must not read messages.
+
+With STREAMING_RENDER_ENABLED off, the same templates render normally and
+``{% stream %}`` behaves like ``{% for %}``.
+"""
+import secrets
+from copy import copy
+from itertools import islice
+
+from django.conf import settings
+from django.db.models.query import QuerySet
+from django.http import StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.template.loader import render_to_string
+
+# Context key holding the PageStream while a streamed page is rendered
+STREAM_CONTEXT_KEY = 'page_stream'
+
+
+def chunked(iterable, size):
+    """Lists of up to ``size`` items from ``iterable``, read lazily."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class PageStream:
+    """Collects the {% stream %} blocks of one page and yields the page in chunks."""
+
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size or settings.STREAM_CHUNK_SIZE
+        self.token = secrets.token_hex(8)
+        self.deferred = []
+
+    def defer(self, node, context, items):
+        """Hold a block back until its turn in the stream; returns the placeholder to render."""
+        marker = f'<!--stream:{self.token}:{len(self.deferred)}-->'
+        # The page's context is unwound once rendering finishes, so keep a copy
+        self.deferred.append((marker, node, copy(context), items))
+        return marker
+
+    def iter_items(self, items):
+        if isinstance(items, QuerySet):
+            return items.iterator(chunk_size=self.chunk_size)
+        return iter(items)
+
+    def chunks(self, page):
+        for marker, node, context, items in self.deferred:
+            before, _, page = page.partition(marker)
+            yield before
+            rows, rendered = [], False
+            for row in node.render_items(context, self.iter_items(items)):
+                rows.append(row)
+                if len(rows) == self.chunk_size:
+                    yield ''.join(rows)
+                    rows, rendered = [], True
+            if rows or rendered:
+                yield ''.join(rows)
+            else:
+                yield node.nodelist_empty.render(context)
+        yield page
+
+
+def render_streaming(request, template_name, context=None):
+    """Like ``render``, but send the page as soon as the part around the listing is ready."""
+    if not settings.STREAMING_RENDER_ENABLED:
+        return render(request, template_name, context)
+    stream = PageStream()
+    page = render_to_string(template_name, {**(context or {}), STREAM_CONTEXT_KEY: stream}, request)
+    # Rows rendered after the middleware has run may still use {% csrf_token %}
+    get_token(request)
+    return StreamingHttpResponse(stream.chunks(page), content_type='text/html; charset=utf-8')
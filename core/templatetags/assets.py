@@ -0,0 +1,67 @@
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join, mark_safe
+
+from core.assets import CRITICAL_CSS_NAME, DIST_DIR, dist_dir
+
+register = template.Library()
+
+
+def _bundle_url(name):
+    return static(f'{DIST_DIR}/{name}')
+
+
+@lru_cache(maxsize=None)
+def _read_critical_css():
+    path = dist_dir() / CRITICAL_CSS_NAME
+    return path.read_text(encoding='utf-8') if path.exists() else ''
+
+
+@register.simple_tag
+def resource_hints():
+    """preconnect to the CDNs and preload our own bundles"""
+    hints = format_html_join(
+        '\n', '<link rel="preconnect" href="{}">', ((origin,) for origin in settings.RESOURCE_HINT_ORIGINS)
+    )
+    if not settings.ASSETS_BUNDLED:
+        return hints
+    preloads = format_html_join(
+        '\n', '<link rel="preload" href="{}" as="{}">',
+        ((_bundle_url(name), 'style' if name.endswith('.css') else 'script') for name in settings.ASSET_BUNDLES),
+    )
+    return hints + mark_safe('\n') + preloads
+
+
+@register.simple_tag
+def critical_css():
+    if not settings.ASSETS_BUNDLED:
+        return ''
+    css = _read_critical_css()
+    return format_html('<style>{}</style>', mark_safe(css)) if css else ''
+
+
+@register.simple_tag
+def bundle_css(name):
+    if not settings.ASSETS_BUNDLED:
+        return format_html_join(
+            '\n', '<link rel="stylesheet" href="{}">', ((static(path),) for path in settings.ASSET_BUNDLES[name])
+        )
+    # Above-the-fold rules are inlined, so the full stylesheet can load without blocking paint
+    url = _bundle_url(name)
+    return format_html(
+        '<link rel="stylesheet" href="{}" media="print" onload="this.media=\'all\'">'
+        '<noscript><link rel="stylesheet" href="{}"></noscript>',
+        url, url,
+    )
+
+
+@register.simple_tag
+def bundle_js(name):
+    if not settings.ASSETS_BUNDLED:
+        return format_html_join(
+            '\n', '<script src="{}" defer></script>', ((static(path),) for path in settings.ASSET_BUNDLES[name])
+        )
+    return format_html('<script src="{}" defer></script>', _bundle_url(name))
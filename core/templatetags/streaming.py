@@ -0,0 +1,55 @@
+from django import template
+from django.template.base import Node, NodeList
+
+from core.streaming import STREAM_CONTEXT_KEY
+
+register = template.Library()
+
+
+class StreamNode(Node):
+    child_nodelists = ('nodelist', 'nodelist_empty')
+
+    def __init__(self, loopvar, sequence, nodelist, nodelist_empty):
+        self.loopvar = loopvar
+        self.sequence = sequence
+        self.nodelist = nodelist
+        self.nodelist_empty = nodelist_empty
+
+    def render_items(self, context, items):
+        for item in items:
+            with context.push(**{self.loopvar: item}):
+                yield self.nodelist.render(context)
+
+    def render(self, context):
+        items = self.sequence.resolve(context, ignore_failures=True)
+        if items is None:
+            items = []
+        stream = context.get(STREAM_CONTEXT_KEY)
+        if stream is not None:
+            return stream.defer(self, context, items)
+        return ''.join(self.render_items(context, items)) or self.nodelist_empty.render(context)
+
+
+@register.tag
+def stream(parser, token):
+    """
+    Loop over a listing that core.streaming.render_streaming may send in chunks::
+
+        {% stream product in products %}
+            ...
+        {% empty %}
+            No products found.
+        {% endstream %}
+
+    Outside a streamed render this is a plain ``{% for %}`` (without ``forloop``).
+    """
+    bits = token.split_contents()
+    if len(bits) != 4 or bits[2] != 'in':
+        raise template.TemplateSyntaxError(f"'{bits[0]}' statements should look like 'stream x in y'")
+    nodelist = parser.parse(('empty', 'endstream'))
+    if parser.next_token().contents == 'empty':
+        nodelist_empty = parser.parse(('endstream',))
+        parser.delete_first_token()
+    else:
+        nodelist_empty = NodeList()
+    return StreamNode(bits[1], parser.compile_filter(bits[3]), nodelist, nodelist_empty)
@@ -0,0 +1,453 @@
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+
+from accounts.models import User
+from orders.models import Cart, Order, OrderItem
+from products.models import Category, Product, Wishlist
+from products.views import PRODUCTS_PER_PAGE
+from reviews.models import Review
+from . import pagecache, ratelimit, storage
+from .models import StoredFile
+from .queryplan import plan_problems
+
+
+@override_settings(
+    # Every request must reach the database to be checked
+    PAGE_CACHE_ENABLED=False,
+    RATELIMIT_ENABLED=False,
+)
+class HotViewQueryPlanTests(TestCase):
+    """Every statement issued by the hot views must be answered from an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user('farmer', password='pass', role='farmer')
+        cls.seller = User.objects.create_user(
+            'seller', password='pass', role='seller', is_approved=True, latitude=28.61, longitude=77.21,
+        )
+        cls.admin = User.objects.create_user('admin', password='pass', role='admin', is_staff=True, is_superuser=True)
+        categories = [Category.objects.create(name=name) for name in ('Seeds', 'Tools', 'Fertilizers')]
+        cls.products = [
+            Product.objects.create(
+                seller=cls.seller, category=categories[i % 3], name=f'Product {i}', description='Good',
+                price=Decimal(10 + i), stock=100, image='products/product.jpg',
+            )
+            for i in range(12)
+        ]
+        for i in range(3):
+            order = Order.objects.create(
+                user=cls.farmer, order_number=f'ORD{i:010d}', status='delivered',
+                shipping_address='Village road', shipping_phone='9999999999', total_amount=Decimal('30.00'),
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, seller=cls.seller, product_name=product.name,
+                          quantity=1, price=product.price)
+                for product in cls.products[i:i + 3]
+            ])
+        Review.objects.create(user=cls.farmer, product=cls.products[0], rating=5, comment='Great')
+        Wishlist.objects.create(user=cls.farmer, product=cls.products[1])
+
+    def setUp(self):
+        cache.clear()
+
+    def assertIndexedPlans(self, user, method, url, data=None, allowed=()):
+        client = self.client_class()
+        if user:
+            client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(url, data or {})
+            if response.streaming:
+                # Streamed listings query as their rows are sent
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, url)
+        problems = plan_problems(queries.captured_queries, allowed=allowed)
+        self.assertFalse(problems, '\n\n'.join(f'{line}\n    {sql}' for sql, line in problems))
+
+    def test_checker_flags_index_scans_and_temp_sorts(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(Product.objects.filter(is_active=True, name__icontains='duct').order_by('-created_at')[:5])
+        # Walks the whole listing index looking for matches
+        self.assertEqual([line for _, line in plan_problems(queries.captured_queries)],
+                         ['SCAN products_product USING INDEX products_active_created_idx'])
+        self.assertFalse(plan_problems(queries.captured_queries, allowed={'products_active_created_idx'}))
+
+        with CaptureQueriesContext(connection) as queries:
+            list(Order.objects.filter(user=self.farmer).order_by('-created_at', 'id'))
+            list(OrderItem.objects.filter(seller=self.seller).values('product_name').distinct())
+            list(OrderItem.objects.filter(seller=self.seller).values('product_name').annotate(n=Count('pk')))
+        lines = [line for _, line in plan_problems(queries.captured_queries)]
+        self.assertIn('USE TEMP B-TREE FOR RIGHT PART OF ORDER BY', lines)
+        self.assertIn('USE TEMP B-TREE FOR DISTINCT', lines)
+        self.assertIn('USE TEMP B-TREE FOR GROUP BY', lines)
+
+    def test_product_list(self):
+        url = reverse('products:product_list')
+        category = self.products[0].category_id
+        # Listings read the active-products indexes in order and stop after a page (LIMIT)
+        newest, cheapest = 'products_active_created_idx', 'products_active_price_idx'
+        for params, allowed in [
+            ({}, {newest}),
+            ({'sort': 'price_low'}, {cheapest}),
+            ({'sort': 'price_high'}, {cheapest}),
+            ({'sort': 'newest'}, {newest}),
+            # Known: no index serves a substring match, so search walks the whole listing
+            ({'q': 'product'}, {newest}),
+            ({'category': category}, ()),
+            ({'category': category, 'sort': 'price_low'}, ()),
+            ({'lat': 28.6, 'lng': 77.2, 'radius': 25}, ()),
+        ]:
+            with self.subTest(params=params):
+                self.assertIndexedPlans(None, 'get', url, params, allowed)
+        # The allowance above only holds while the listing is read a page at a time
+        with CaptureQueriesContext(connection) as queries:
+            b''.join(self.client.get(url).streaming_content)
+        listing = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT "products_product"."id"')]
+        self.assertTrue(listing)
+        for sql in listing:
+            self.assertIn(f'LIMIT {PRODUCTS_PER_PAGE + 1}', sql)
+
+    def test_product_detail(self):
+        url = reverse('products:product_detail', args=[self.products[0].pk])
+        for user in (None, self.farmer):
+            with self.subTest(user=user):
+                cache.clear()
+                self.assertIndexedPlans(user, 'get', url)
+
+    def test_cart_and_checkout(self):
+        Cart.objects.create(user=self.farmer, product=self.products[5], quantity=2)
+        self.assertIndexedPlans(self.farmer, 'get', reverse('orders:cart'))
+        self.assertIndexedPlans(self.farmer, 'get', reverse('orders:checkout'))
+        self.assertIndexedPlans(self.farmer, 'post', reverse('orders:checkout'), {
+            'shipping_address': 'Village road', 'shipping_phone': '9999999999', 'payment_method': 'cod',
+        })
+
+    def test_order_pages(self):
+        order = Order.objects.filter(user=self.farmer).first()
+        self.assertIndexedPlans(self.farmer, 'get', reverse('orders:order_list'))
+        self.assertIndexedPlans(self.farmer, 'get', reverse('orders:order_detail', args=[order.pk]))
+
+    def test_dashboards(self):
+        for user in (self.farmer, self.seller):
+            with self.subTest(role=user.role):
+                self.assertIndexedPlans(user, 'get', reverse('accounts:dashboard'))
+        # The admin dashboard counts every user, product and order
+        self.assertIndexedPlans(self.admin, 'get', reverse('accounts:dashboard'),
+                                allowed={'accounts_user', 'products_product', 'orders_order'})
+
+
+@override_settings(RATELIMIT_ENABLED=True, RATELIMIT_PROXY_COUNT=1)
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_client_ip_skips_trusted_proxies(self):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='6.6.6.6, 1.2.3.4', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(ratelimit.client_ip(request), '1.2.3.4')
+        with self.settings(RATELIMIT_PROXY_COUNT=0):
+            self.assertEqual(ratelimit.client_ip(request), '10.0.0.1')
+
+    def test_concurrent_requests_cannot_overdraw(self):
+        allowed, barrier = [], threading.Barrier(20)
+
+        def hit():
+            barrier.wait()
+            if not ratelimit.consume(['ratelimit:test:ip:1'], 5, 1 / 60, 120):
+                allowed.append(1)
+
+        threads = [threading.Thread(target=hit) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(allowed), 5)
+
+    def test_refused_request_takes_no_tokens(self):
+        ip, user = 'ratelimit:test:ip:1', 'ratelimit:test:user:1'
+        for _ in range(2):
+            self.assertEqual(ratelimit.consume([ip, user], 2, 1 / 60, 120), 0)
+        # The user's bucket is empty; the shared IP's must not be drained by refusals
+        for _ in range(5):
+            self.assertGreater(ratelimit.consume(['ratelimit:test:ip:2', user], 2, 1 / 60, 120), 0)
+        self.assertEqual(ratelimit.consume(['ratelimit:test:ip:2'], 2, 1 / 60, 120), 0)
+        self.assertEqual(ratelimit.consume(['ratelimit:test:ip:2'], 2, 1 / 60, 120), 0)
+
+    def test_login_burst_then_429(self):
+        statuses = [
+            self.client.post(reverse('accounts:login'), {'username': 'x', 'password': 'y'},
+                             HTTP_X_FORWARDED_FOR='1.2.3.4').status_code
+            for _ in range(6)
+        ]
+        self.assertNotIn(429, statuses[:5])
+        self.assertEqual(statuses[5], 429)
+        # Another client behind the same proxy is unaffected
+        response = self.client.post(reverse('accounts:login'), {'username': 'x', 'password': 'y'},
+                                    HTTP_X_FORWARDED_FOR='5.6.7.8')
+        self.assertNotEqual(response.status_code, 429)
+
+
+@override_settings(PAGE_CACHE_ENABLED=True, RATELIMIT_ENABLED=False)
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user('farmer', password='pass', role='farmer')
+        cls.seller = User.objects.create_user('seller', password='pass', role='seller', is_approved=True)
+        cls.category = Category.objects.create(name='Seeds')
+        cls.product = Product.objects.create(
+            seller=cls.seller, category=cls.category, name='Tomato Seeds', description='Seed',
+            price=Decimal('10.00'), stock=100, image='products/seed.jpg',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params or {})
+        # Streamed pages are only stored once their content has been sent
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.get('X-Page-Cache'), content
+
+    def test_key_ignores_order_empty_and_tracking_params(self):
+        factory = RequestFactory()
+        request = factory.get('/products/', {'q': 'seed', 'category': '1', 'page': '', 'utm_source': 'x', 'fbclid': 'y'})
+        self.assertEqual(pagecache.normalize_url(request), '/products/?category=1&q=seed')
+        same = factory.get('/products/?category=1&gclid=z&q=seed')
+        self.assertEqual(pagecache.page_key(request), pagecache.page_key(same))
+        self.assertNotEqual(pagecache.page_key(request), pagecache.page_key(factory.get('/products/?q=seed')))
+
+    def test_streamed_page_is_stored_once_sent(self):
+        url = reverse('products:product_list')
+        status, content = self.get(url, {'q': 'tomato'})
+        self.assertEqual(status, 'MISS')
+        status, cached = self.get(url, {'q': 'tomato', 'utm_campaign': 'mail'})
+        self.assertEqual(status, 'HIT')
+        self.assertEqual(cached, content)
+        self.assertIn(b'Tomato Seeds', cached)
+
+    def test_changes_retire_cached_pages(self):
+        url = reverse('products:product_list')
+        self.get(url)
+        self.assertEqual(self.get(url)[0], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Okra Seeds'
+            self.product.save()
+            # Not committed yet: the generation is only bumped afterwards
+            self.assertEqual(self.get(url)[0], 'HIT')
+        status, content = self.get(url)
+        self.assertEqual(status, 'MISS')
+        self.assertIn(b'Okra Seeds', content)
+
+    def test_visitor_state_bypasses_anonymous_pages(self):
+        url = reverse('products:product_detail', args=[self.product.pk])
+        self.get(url)
+        self.assertEqual(self.get(url)[0], 'HIT')
+        self.client.cookies[settings.CART_COOKIE_NAME] = 'x'
+        self.assertIsNone(self.get(url)[0])
+        del self.client.cookies[settings.CART_COOKIE_NAME]
+        self.client.force_login(self.farmer)
+        self.assertIsNone(self.get(url)[0])
+        # Shared pages are still served from the cache
+        self.get(reverse('home'))
+        self.assertEqual(self.get(reverse('home'))[0], 'HIT')
+
+    def test_private_and_cookie_responses_are_not_stored(self):
+        middleware = pagecache.PageCacheMiddleware(lambda request: None)
+        self.assertTrue(middleware.cacheable(HttpResponse('page')))
+        private = HttpResponse('page')
+        patch_cache_control(private, private=True)
+        self.assertFalse(middleware.cacheable(private))
+        with_cookie = HttpResponse('page')
+        with_cookie.set_cookie('csrftoken', 'x')
+        self.assertFalse(middleware.cacheable(with_cookie))
+        self.assertFalse(middleware.cacheable(HttpResponse('missing', status=404)))
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', password='pass', role='seller', is_approved=True)
+        cls.category = Category.objects.create(name='Seeds')
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media.name))
+        self.media = Path(media.name)
+
+    def create(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                seller=self.seller, category=self.category, name='Seed', description='Seed',
+                price=Decimal('10.00'), stock=100, image=image,
+            )
+
+    def upload(self, data, name='photo.JPG'):
+        return SimpleUploadedFile(name, data)
+
+    def files(self):
+        return sorted(path.relative_to(self.media).as_posix() for path in self.media.rglob('*') if path.is_file())
+
+    def references(self):
+        return dict(StoredFile.objects.values_list('name', 'references'))
+
+    def test_same_bytes_are_stored_once(self):
+        first = self.create(self.upload(b'tomato'))
+        second = self.create(self.upload(b'tomato', 'copy.jpg'))
+        name = first.image.name
+        self.assertTrue(storage.is_content_name(name))
+        self.assertTrue(name.endswith('.jpg'))
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(self.files(), [name])
+        self.assertEqual(self.references(), {name: 2})
+
+        # The file goes with the last reference
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual((self.files(), self.references()), ([name], {name: 1}))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual((self.files(), self.references()), ([], {}))
+
+    def test_replacing_a_file_releases_the_old_one(self):
+        product = self.create(self.upload(b'tomato'))
+        old = product.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Renamed'
+            product.save()
+        self.assertEqual(self.references(), {old: 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = self.upload(b'okra')
+            product.save()
+        self.assertEqual(self.files(), [product.image.name])
+        self.assertEqual(self.references(), {product.image.name: 1})
+        # Re-uploading the same bytes keeps the file
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = self.upload(b'okra')
+            product.save()
+        self.assertEqual(self.references(), {product.image.name: 1})
+
+    def test_legacy_files_move_and_orphans_go(self):
+        legacy_dir = self.media / 'products'
+        legacy_dir.mkdir()
+        (legacy_dir / 'old.jpg').write_bytes(b'legacy')
+        legacy = self.create('products/old.jpg')
+        missing = self.create('products/gone.jpg')
+        kept = self.create(self.upload(b'tomato'))
+        orphan = self.create(self.upload(b'okra'))
+        Product.objects.filter(pk=orphan.pk).delete()  # bypasses the signals, like a lost transaction
+        StoredFile.objects.filter(name=kept.image.name).update(references=7)
+        old = time.time() - 2 * 60 * 60
+        os.utime(self.media / orphan.image.name, (old, old))
+
+        self.assertEqual(storage.move_legacy_files(), (1, {'products/gone.jpg'}))
+        legacy.refresh_from_db()
+        self.assertTrue(storage.is_content_name(legacy.image.name))
+        self.assertFalse((legacy_dir / 'old.jpg').exists())
+        self.assertEqual(Product.objects.get(pk=missing.pk).image.name, 'products/gone.jpg')
+
+        self.assertEqual(storage.recount(default_storage, grace=60 * 60), 1)
+        self.assertEqual(self.files(), sorted([legacy.image.name, kept.image.name]))
+        self.assertEqual(self.references(), {legacy.image.name: 1, kept.image.name: 1})
+
+
+class ServeMediaTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media.name, MEDIA_SENDFILE=''))
+        (Path(media.name) / 'products').mkdir()
+        (Path(media.name) / 'products' / 'photo.jpg').write_bytes(b'0123456789')
+        self.url = reverse('core:media', args=['products/photo.jpg'])
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        self.body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response
+
+    def test_whole_file_with_validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body, b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.get()['ETag']
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.body, b'')
+
+    def test_range_is_partial_content(self):
+        response = self.get(range='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+        self.assertEqual(self.body, b'2345')
+
+        # An end past the file is cut to its last byte
+        response = self.get(range='bytes=7-100')
+        self.assertEqual((response['Content-Range'], self.body), ('bytes 7-9/10', b'789'))
+
+    def test_suffix_range(self):
+        response = self.get(range='bytes=-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual((response['Content-Range'], self.body), ('bytes 7-9/10', b'789'))
+
+        response = self.get(range='bytes=-50')
+        self.assertEqual((response['Content-Range'], self.body), ('bytes 0-9/10', b'0123456789'))
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        etag = self.get()['ETag']
+        response = self.get(range='bytes=2-5', if_range=etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.get(range='bytes=2-5', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body, b'0123456789')
+
+    def test_unsatisfiable_range(self):
+        for header in ('bytes=10-', 'bytes=20-30', 'bytes=-0'):
+            with self.subTest(header):
+                response = self.get(range=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_malformed_range_sends_whole_file(self):
+        for header in ('bytes=5-2', 'bytes=0-1,4-5', 'items=0-1', 'bytes=-'):
+            with self.subTest(header):
+                response = self.get(range=header)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.body, b'0123456789')
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_accel_redirect_leaves_the_bytes_to_the_proxy(self):
+        response = self.get(range='bytes=2-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/products/photo.jpg')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.body, b'')
+
+    def test_missing_file_and_traversal_are_not_found(self):
+        self.assertEqual(self.client.get(reverse('core:media', args=['products/none.jpg'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('core:media', args=['../settings.py'])).status_code, 404)
@@ -0,0 +1,20 @@
+import re
+
+from django.conf import settings
+from django.urls import path, re_path
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
+    path('ratelimit-stats/', views.ratelimit_stats, name='ratelimit_stats'),
+    path('fragments/user/', views.user_fragment, name='user_fragment'),
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<str:name>', views.profile_download, name='profile_download'),
+    path('robots.txt', views.robots_txt, name='robots_txt'),
+    # Precomputed by `manage.py build_sitemaps` (core.sitemaps)
+    re_path(r'^(?P<name>sitemap(?:-[a-z]+(?:-\d+)?)?\.xml)$', views.crawl_file, name='sitemap'),
+    re_path(r'^feeds/(?P<name>(?:products|blog)\.(?:rss|atom))$', views.crawl_file, name='feed'),
+    re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.+)$', views.serve_media, name='media'),
+]
@@ -0,0 +1,206 @@
+import gzip
+import mimetypes
+import os
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.http import require_safe
+
+from .cache import get_stats
+from .media import cache_control_for, parse_range
+from .profiling import PROFILE_NAME_RE, list_profiles, profile_dir
+from .ratelimit import get_throttled
+
+
+@staff_member_required
+def cache_stats(request):
+    """Hit/miss/eviction counters of the worker that served this request"""
+    cache = caches['default']
+    entries = cache.entry_count() if hasattr(cache, 'entry_count') else None
+    return JsonResponse({
+        'pid': os.getpid(),
+        'backend': f'{cache.__class__.__module__}.{cache.__class__.__name__}',
+        'entries': entries,
+        'max_entries': getattr(cache, '_max_entries', None),
+        'prefixes': get_stats(),
+    })
+
+
+@never_cache
+@require_safe
+def user_fragment(request):
+    """Per-user navigation and flash messages for pages served from the shared page cache"""
+    return JsonResponse({
+        'nav': render_to_string('includes/user_nav.html', request=request),
+        'messages': render_to_string('includes/messages.html', request=request),
+    })
+
+
+@staff_member_required
+def ratelimit_stats(request):
+    """Requests refused with 429 per URL name, by the worker that served this request"""
+    return JsonResponse({
+        'pid': os.getpid(),
+        'enabled': settings.RATELIMIT_ENABLED,
+        'rules': settings.RATELIMITS,
+        'throttled': get_throttled(),
+    })
+
+
+def _read_range(path, start, end, block_size=64 * 1024):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(block_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve an uploaded file from MEDIA_ROOT with validators, cache headers and
+    Range support. With MEDIA_SENDFILE set, only headers are produced and the
+    front proxy streams the bytes.
+    """
+    try:
+        fullpath = Path(safe_join(settings.MEDIA_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not fullpath.is_file():
+        raise Http404
+
+    stat = fullpath.stat()
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control_for(path),
+        'Accept-Ranges': 'bytes',
+    }
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(str(fullpath))
+    content_type = content_type or 'application/octet-stream'
+
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+    elif settings.MEDIA_SENDFILE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = str(fullpath)
+    else:
+        if_range = request.headers.get('If-Range')
+        byte_range = None
+        if not if_range or if_range in (etag, headers['Last-Modified']):
+            try:
+                byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+                return response
+        if byte_range is None:
+            response = FileResponse(fullpath.open('rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(_read_range(fullpath, start, end), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = end - start + 1
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+CRAWL_CONTENT_TYPES = {
+    '.xml': 'application/xml',
+    '.rss': 'application/rss+xml',
+    '.atom': 'application/atom+xml',
+}
+
+
+@require_safe
+def crawl_file(request, name):
+    """
+    A sitemap or feed precomputed by core.sitemaps: the stored gzip as is for
+    clients that accept it, decompressed on the fly for the rest.
+    """
+    try:
+        fullpath = Path(safe_join(settings.SITEMAP_ROOT, f'{name}.gz'))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not fullpath.is_file():
+        raise Http404
+
+    gzipped = 'gzip' in request.headers.get('Accept-Encoding', '')
+    stat = fullpath.stat()
+    # The two encodings are different representations, so they get different tags
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-gz" if gzipped else ""}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        content_type = CRAWL_CONTENT_TYPES[os.path.splitext(name)[1]]
+        if gzipped:
+            response = FileResponse(fullpath.open('rb'), content_type=content_type)
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = FileResponse(gzip.open(fullpath, 'rb'), content_type=content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = f'public, max-age={settings.SITEMAP_MAX_AGE}'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+@require_safe
+@cache_control(public=True, max_age=24 * 60 * 60)
+def robots_txt(request):
+    """Point crawlers at the sitemaps and away from sorted, searched and private pages"""
+    lines = [
+        'User-agent: *',
+        *(f'Disallow: {path}' for path in settings.ROBOTS_DISALLOW),
+        f'Sitemap: {settings.SITE_URL.rstrip("/")}/sitemap.xml',
+    ]
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain')
+
+
+@staff_member_required
+def profile_list(request):
+    """Request profiles recorded by core.profiling, newest first"""
+    return render(request, 'core/profiles.html', {
+        **admin.site.each_context(request),
+        'profiles': list_profiles(),
+        'query_param': settings.PROFILER_QUERY_PARAM,
+        'header': settings.PROFILER_HEADER,
+        'title': 'Request profiles',
+    })
+
+
+@staff_member_required
+def profile_download(request, name):
+    if not PROFILE_NAME_RE.match(name):
+        raise Http404
+    path = Path(profile_dir()) / name
+    if not path.is_file():
+        raise Http404
+    return FileResponse(path.open('rb'), as_attachment=True, filename=name, content_type='application/octet-stream')
@@ -0,0 +1,104 @@
+"""
+Warm a fresh worker before it takes traffic: populate the URL resolvers,
+compile every project template into the cached loader, fill the hot cache keys,
+build the search typeahead index and open database connections. Called from
+the hooks in gunicorn.conf.py.
+"""
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import NoReverseMatch, URLPattern, URLResolver, get_resolver, reverse
+
+# Dummy values for path converters so parametrised URL names can be reversed too
+CONVERTER_SAMPLES = {
+    'IntConverter': 1,
+    'SlugConverter': 'a',
+    'StringConverter': 'a',
+    'PathConverter': 'a',
+    'UUIDConverter': '00000000-0000-0000-0000-000000000000',
+}
+
+
+def _named_patterns(patterns, namespace=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            yield from _named_patterns(pattern.url_patterns, prefix)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f'{namespace}{pattern.name}', pattern
+
+
+def resolve_urls():
+    """Reverse every named URL; returns how many reversed."""
+    count = 0
+    for name, pattern in _named_patterns(get_resolver().url_patterns):
+        converters = getattr(pattern.pattern, 'converters', {})
+        kwargs = {arg: CONVERTER_SAMPLES.get(type(conv).__name__, 'a') for arg, conv in converters.items()}
+        try:
+            reverse(name, kwargs=kwargs or None)
+            count += 1
+        except NoReverseMatch:
+            pass
+    return count
+
+
+def compile_templates():
+    """Load every template under the TEMPLATES DIRS so the cached loader holds them compiled."""
+    count = 0
+    for config in settings.TEMPLATES:
+        for directory in config.get('DIRS', []):
+            directory = Path(directory)
+            for path in sorted(directory.rglob('*.html')):
+                get_template(path.relative_to(directory).as_posix())
+                count += 1
+    return count
+
+
+def warm_cache():
+    from products.cache import warm
+    return sum(warm().values())
+
+
+def build_typeahead():
+    from products.typeahead import get_index
+    return len(get_index())
+
+
+def open_connections():
+    for connection in connections.all():
+        connection.ensure_connection()
+    return len(connections.all())
+
+
+def close_connections():
+    connections.close_all()
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+
+def warm_code():
+    """Work that can be shared copy-on-write when done in the gunicorn master."""
+    urls, urls_ms = _timed(resolve_urls)
+    templates, templates_ms = _timed(compile_templates)
+    cached, cache_ms = _timed(warm_cache)
+    typeahead_keys, typeahead_ms = _timed(build_typeahead)
+    return {
+        'urls': urls, 'urls_ms': urls_ms,
+        'templates': templates, 'templates_ms': templates_ms,
+        'cached_items': cached, 'cache_ms': cache_ms,
+        'typeahead_keys': typeahead_keys, 'typeahead_ms': typeahead_ms,
+    }
+
+
+def warm_worker(include_code=True):
+    timings = warm_code() if include_code else {}
+    connections_opened, db_ms = _timed(open_connections)
+    timings.update(connections=connections_opened, db_ms=db_ms)
+    return timings
@@ -0,0 +1,20 @@
+from django.contrib import admin
+from core.admin import ScalableAdminMixin
+from .models import Checkpoint, Event
+
+@admin.register(Event)
+class EventAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['id', 'kind', 'object_id', 'created_at']
+    list_filter = ['kind', 'created_at']
+    readonly_fields = ['kind', 'object_id', 'payload', 'created_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(Checkpoint)
+class CheckpointAdmin(admin.ModelAdmin):
+    list_display = ['consumer', 'position', 'updated_at']
+    readonly_fields = ['updated_at']
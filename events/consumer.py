@@ -0,0 +1,82 @@
+"""
+Process outbox events for the consumers in settings.EVENT_CONSUMERS.
+
+Each consumer is a function taking a list of events, oldest first, and
+handling them in bulk. It only sees the kinds it subscribes to::
+
+    EVENT_CONSUMERS = {
+        'seller_sales': {'handler': 'orders.rollups.seller_sales', 'kinds': ['order_placed', 'order_status_changed']},
+    }
+
+``consume`` reads a batch past the consumer's checkpoint and calls the handler.
+It moves the checkpoint in the same transaction, so database writes made by the
+handler happen exactly once. A handler that raises leaves the checkpoint where
+it was, and the batch is retried on the next pass. Side effects outside the
+database (cache deletes) may repeat, so they must be idempotent.
+
+Events younger than EVENTS_SETTLE_SECONDS are left for the next pass. On
+databases with concurrent writers, an id can commit after a higher one; the
+delay stops such an event from being skipped.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Checkpoint, Event
+
+logger = logging.getLogger(__name__)
+
+
+def consume(name, batch_size=None):
+    """Hand the next batch of events to consumer ``name``; returns how many it got."""
+    config = settings.EVENT_CONSUMERS[name]
+    handler = import_string(config['handler'])
+    batch_size = batch_size or settings.EVENTS_BATCH_SIZE
+    settled = timezone.now() - timedelta(seconds=settings.EVENTS_SETTLE_SECONDS)
+    with transaction.atomic():
+        checkpoint, _ = Checkpoint.objects.select_for_update().get_or_create(consumer=name)
+        pending = Event.objects.filter(pk__gt=checkpoint.position)
+        upto = pending.filter(created_at__lte=settled).aggregate(upto=Max('pk'))['upto']
+        if upto is None:
+            return 0
+        events = pending.filter(pk__lte=upto)
+        if config.get('kinds'):
+            events = events.filter(kind__in=config['kinds'])
+        events = list(events.order_by('pk')[:batch_size])
+        if events:
+            handler(events)
+        # A short batch means every event up to ``upto`` was seen, including
+        # other kinds, so the checkpoint can skip past them
+        checkpoint.position = events[-1].pk if len(events) == batch_size else upto
+        checkpoint.save(update_fields=['position', 'updated_at'])
+    return len(events)
+
+
+def consume_all(names=None, batch_size=None):
+    """One pass over every consumer; returns {name: events handled}. Failures are logged and retried later."""
+    handled = {}
+    for name in names or settings.EVENT_CONSUMERS:
+        try:
+            handled[name] = consume(name, batch_size)
+        except Exception:
+            logger.exception('Event consumer %s failed', name)
+            handled[name] = 0
+    return handled
+
+
+def purge(days=None):
+    """Delete events older than ``days`` that every consumer has moved past; returns how many."""
+    days = settings.EVENTS_RETENTION_DAYS if days is None else days
+    # A consumer that has never run holds everything back
+    positions = [
+        Checkpoint.objects.filter(consumer=name).values_list('position', flat=True).first() or 0
+        for name in settings.EVENT_CONSUMERS
+    ]
+    done = min(positions, default=Event.objects.aggregate(last=Max('pk'))['last'] or 0)
+    deleted, _ = Event.objects.filter(pk__lte=done, created_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from events.consumer import consume_all, purge
+
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Feed outbox events to the consumers in EVENT_CONSUMERS in ordered, checkpointed batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', action='append', dest='consumers', metavar='NAME',
+                            help='Only run this consumer (repeatable); default all')
+        parser.add_argument('--batch-size', type=int, default=settings.EVENTS_BATCH_SIZE,
+                            help='Events handed to a consumer at once')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when no consumer had anything to do')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once every consumer has caught up instead of polling')
+
+    def handle(self, *args, **options):
+        names = options['consumers'] or list(settings.EVENT_CONSUMERS)
+        unknown = set(names) - set(settings.EVENT_CONSUMERS)
+        if unknown:
+            raise CommandError(f"Unknown consumer(s): {', '.join(sorted(unknown))}")
+        self.stdout.write(f"Consuming events for: {', '.join(names)}")
+        last_purge = 0
+        try:
+            while True:
+                close_old_connections()
+                handled = consume_all(names, options['batch_size'])
+                for name, count in handled.items():
+                    if count:
+                        self.stdout.write(f'{name}: {count} events')
+                if time.monotonic() - last_purge > PURGE_INTERVAL:
+                    purge()
+                    last_purge = time.monotonic()
+                if not any(handled.values()):
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,35 @@
+from django.db import models
+
+# Domain event, written in the same transaction as the change it describes
+class Event(models.Model):
+    KIND_CHOICES = (
+        ('product_changed', 'Product changed'),
+        ('stock_changed', 'Stock changed'),
+        ('order_placed', 'Order placed'),
+        ('order_status_changed', 'Order status changed'),
+        ('review_added', 'Review added'),
+    )
+    
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()  # pk of the product, order or review
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['pk']
+        indexes = [
+            # A consumer reads the kinds it handles past its checkpoint
+            models.Index(fields=['kind', 'id'], name='events_event_kind_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
+
+# How far a consumer has got through the event log
+class Checkpoint(models.Model):
+    consumer = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)  # id of the last event handled
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.consumer} @ {self.position}"
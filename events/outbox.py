@@ -0,0 +1,25 @@
+"""
+Record domain events in the outbox table.
+
+Call these inside the ``transaction.atomic`` block that makes the change, so
+the event is committed or rolled back with it::
+
+    with transaction.atomic():
+        review.save()
+        outbox.record('review_added', review.pk, product=review.product_id, rating=review.rating)
+
+Payloads are JSON; keep them to ids and the few values consumers need.
+"""
+from .models import Event
+
+
+def record(kind, object_id, **payload):
+    return Event.objects.create(kind=kind, object_id=object_id, payload=payload)
+
+
+def record_many(kind, rows):
+    """One event per (object_id, payload) in ``rows``, in a single INSERT."""
+    return Event.objects.bulk_create([
+        Event(kind=kind, object_id=object_id, payload=payload)
+        for object_id, payload in rows
+    ])
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import outbox
+from .consumer import consume, consume_all, purge
+from .models import Checkpoint, Event
+
+batches = []
+
+
+def record_batch(events):
+    batches.append([event.object_id for event in events])
+
+
+def fail(events):
+    raise RuntimeError('boom')
+
+
+@override_settings(
+    EVENT_CONSUMERS={
+        'reviews': {'handler': 'events.tests.record_batch', 'kinds': ['review_added']},
+        'broken': {'handler': 'events.tests.fail'},
+    },
+    EVENTS_SETTLE_SECONDS=0,
+)
+class ConsumerTests(TestCase):
+
+    def setUp(self):
+        batches.clear()
+
+    def position(self, name):
+        return Checkpoint.objects.get(consumer=name).position
+
+    def test_batches_are_ordered_and_checkpointed(self):
+        for n in range(1, 4):
+            outbox.record('review_added', n)
+        last = outbox.record('product_changed', 99)
+        self.assertEqual(consume('reviews', batch_size=2), 2)
+        self.assertEqual(batches, [[1, 2]])
+        self.assertEqual(consume('reviews', batch_size=2), 1)
+        # A short batch moves the checkpoint past the other kinds too
+        self.assertEqual(self.position('reviews'), last.pk)
+        self.assertEqual(consume('reviews', batch_size=2), 0)
+        self.assertEqual(batches, [[1, 2], [3]])
+
+    def test_failed_batch_is_retried(self):
+        outbox.record('review_added', 1)
+        with self.assertLogs('events.consumer', 'ERROR'):
+            self.assertEqual(consume_all(['broken']), {'broken': 0})
+        self.assertFalse(Checkpoint.objects.filter(consumer='broken', position__gt=0).exists())
+
+    def test_recent_events_wait_to_settle(self):
+        outbox.record('review_added', 1)
+        with self.settings(EVENTS_SETTLE_SECONDS=60):
+            self.assertEqual(consume('reviews'), 0)
+        self.assertEqual(consume('reviews'), 1)
+
+    def test_purge_keeps_unconsumed_and_recent_events(self):
+        old = [outbox.record('review_added', n) for n in range(3)]
+        Event.objects.update(created_at=timezone.now() - timedelta(days=30))
+        outbox.record('review_added', 3)
+        consume('reviews')
+        # 'broken' has never got anywhere, so nothing can go yet
+        self.assertEqual(purge(days=7), 0)
+        Checkpoint.objects.create(consumer='broken', position=old[1].pk)
+        self.assertEqual(purge(days=7), 2)
+        self.assertEqual(list(Event.objects.values_list('object_id', flat=True)), [2, 3])
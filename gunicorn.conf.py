@@ -0,0 +1,102 @@
+# Gunicorn configuration, picked up automatically from the working directory
+# (see Procfile and render.yaml). Settings can be overridden with GUNICORN_* env vars.
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _memory_limit_mb():
+    """Memory available to this container: the cgroup limit if set, else MemAvailable."""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 50:
+            return int(value) // (1024 * 1024)
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+# Worker class
+#   gthread - default: threads keep serving while others wait on slow mobile clients or the DB
+#   sync    - one request per process
+#   uvicorn - agrimarket/asgi.py under uvicorn workers (requires `pip install uvicorn`)
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+_kind = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+worker_class = WORKER_CLASSES[_kind]
+
+if _kind == 'uvicorn':
+    wsgi_app = 'agrimarket.asgi:application'
+else:
+    wsgi_app = 'agrimarket.wsgi:application'
+
+# Workers: (2 x CPUs) + 1 for sync, CPUs + 1 when each worker has threads,
+# then capped by how many workers fit in memory.
+CPUS = _cpu_count()
+WORKER_MEMORY_MB = _env_int('GUNICORN_WORKER_MEMORY_MB', 150)
+_by_cpu = 2 * CPUS + 1 if _kind == 'sync' else CPUS + 1
+_memory = _memory_limit_mb()
+_by_memory = max(_memory // WORKER_MEMORY_MB, 1) if _memory else _by_cpu
+workers = _env_int('GUNICORN_WORKERS', max(min(_by_cpu, _by_memory), 1))
+threads = _env_int('GUNICORN_THREADS', 4 if _kind == 'gthread' else 1)
+
+# Cache invalidations (object versions, page generations, typeahead deltas, rate
+# limit buckets) only reach other workers through a shared cache, so several
+# workers default to the host-wide one instead of per-process locmem.
+# Set before the app loads so settings.py sees it.
+if workers > 1:
+    os.environ.setdefault('CACHE_BACKEND', 'shm' if os.path.isdir('/dev/shm') else 'file')
+
+# Recycle workers now and then to cap slow memory growth; jitter stops them all restarting at once
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+# Load Django once in the master so workers fork with imports, URL resolvers
+# and compiled templates already in (copy-on-write) memory.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() in ('true', '1', 'yes')
+
+# Warm-up is fast, but a cold free-tier instance can still need a moment
+timeout = _env_int('GUNICORN_TIMEOUT', 60)
+
+
+def when_ready(server):
+    server.log.info(
+        'Concurrency: %s worker(s) x %s thread(s), class %s (%s CPU(s), %s MB memory)',
+        server.cfg.workers, server.cfg.threads, server.cfg.worker_class_str, CPUS, _memory,
+    )
+    if not server.cfg.preload_app:
+        return
+    from core.warmup import close_connections, warm_code
+    server.log.info('Warmed master: %s', warm_code())
+    # Database connections must never be shared across fork()
+    close_connections()
+
+
+def post_worker_init(worker):
+    # Runs in each worker right after fork and app load, before the first request
+    from core.warmup import warm_worker
+    timings = warm_worker(include_code=not worker.cfg.preload_app)
+    worker.log.info('Warmed worker %s: %s', worker.pid, timings)
@@ -0,0 +1,17 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Job
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'queue', 'priority', 'status', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'queue']
+    search_fields = ['task']
+    readonly_fields = ['created_at', 'finished_at', 'locked_by', 'locked_at', 'last_error']
+    
+    actions = ['retry_jobs']
+    
+    def retry_jobs(self, request, queryset):
+        queryset.exclude(status='running').update(status='queued', run_at=timezone.now(), attempts=0)
+        self.message_user(request, 'Selected jobs have been queued again.')
+    retry_jobs.short_description = 'Retry selected jobs'
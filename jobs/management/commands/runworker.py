@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.worker import run_pool
+
+
+class Command(BaseCommand):
+    help = 'Process background jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', default='default', help='Queue to process')
+        parser.add_argument('--threads', type=int, default=settings.JOBS_WORKER_THREADS,
+                            help='Jobs run concurrently per process')
+        parser.add_argument('--processes', type=int, default=settings.JOBS_WORKER_PROCESSES,
+                            help='Worker processes to start')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit as soon as no job is due instead of polling')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"Worker on queue '{options['queue']}': "
+            f"{options['processes']} process(es) x {options['threads']} thread(s)"
+        )
+        run_pool(
+            options['processes'],
+            queue=options['queue'],
+            threads=options['threads'],
+            poll_interval=options['poll_interval'],
+            once=options['once'],
+        )
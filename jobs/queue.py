@@ -0,0 +1,120 @@
+"""
+Enqueue and claim background jobs.
+
+Usage from a view::
+
+    from jobs.queue import enqueue
+    enqueue('products.tasks.rebuild_price_index', category_id, priority=5)
+    enqueue(send_receipt, order.pk, delay=timedelta(minutes=5))
+
+Jobs are rows in the main database, so an enqueue inside ``transaction.atomic``
+only becomes visible to workers if the surrounding write commits.
+"""
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+
+def _task_path(task):
+    if isinstance(task, str):
+        return task
+    return f'{task.__module__}.{task.__qualname__}'
+
+
+def enqueue(task, *args, queue='default', priority=0, run_at=None, delay=None, max_attempts=None, **kwargs):
+    """Store a call to ``task`` (a function or its dotted path); args must be JSON serialisable."""
+    if run_at is None:
+        run_at = timezone.now() + (delay or timedelta())
+    return Job.objects.create(
+        task=_task_path(task),
+        args=list(args),
+        kwargs=kwargs,
+        queue=queue,
+        priority=priority,
+        run_at=run_at,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def claim(queue, worker_id, limit=1):
+    """Atomically mark up to ``limit`` due jobs as running for ``worker_id`` and return them."""
+    now = timezone.now()
+    due = (
+        Job.objects.filter(queue=queue, status='queued', run_at__lte=now)
+        .order_by('-priority', 'run_at', 'pk')
+    )
+    claim_fields = {'status': 'running', 'locked_by': worker_id, 'locked_at': now, 'attempts': F('attempts') + 1}
+
+    if connection.features.has_select_for_update_skip_locked:
+        # PostgreSQL/MySQL: rows locked by other workers are skipped, not waited on
+        with transaction.atomic():
+            pks = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            Job.objects.filter(pk__in=pks).update(**claim_fields)
+    else:
+        # SQLite has no row locks; a conditional UPDATE acts as compare-and-swap
+        # and only one worker sees its update affect the row.
+        pks = []
+        for pk in due.values_list('pk', flat=True)[:limit * 4]:
+            if Job.objects.filter(pk=pk, status='queued').update(**claim_fields):
+                pks.append(pk)
+                if len(pks) == limit:
+                    break
+    return list(Job.objects.filter(pk__in=pks).order_by('-priority', 'run_at', 'pk'))
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2*base, 4*base ... capped at JOBS_MAX_BACKOFF seconds."""
+    seconds = settings.JOBS_RETRY_BACKOFF * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, settings.JOBS_MAX_BACKOFF))
+
+
+def run_job(job):
+    """Call the job's task and record the outcome; returns True on success."""
+    try:
+        func = import_string(job.task)
+        func(*job.args, **job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+        else:
+            job.status = 'queued'
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+        job.locked_by = ''
+        job.locked_at = None
+        job.save(update_fields=['status', 'run_at', 'last_error', 'finished_at', 'locked_by', 'locked_at'])
+        return False
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+    return True
+
+
+def release_stale(timeout=None):
+    """
+    Deal with jobs whose worker died mid-run (locked longer than ``timeout``
+    seconds): requeue them with the usual backoff, or fail them once they have
+    used up their attempts, so a job that kills its worker is not retried
+    forever. Returns how many jobs were released.
+    """
+    timeout = timeout or settings.JOBS_LOCK_TIMEOUT
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=timeout))
+    released = 0
+    for job in stale:
+        fields = {'locked_by': '', 'locked_at': None, 'last_error': f'Worker {job.locked_by} lost the job'}
+        if job.attempts >= job.max_attempts:
+            fields.update(status='failed', finished_at=now)
+        else:
+            fields.update(status='queued', run_at=now + retry_delay(job.attempts))
+        # Conditional, in case the job finished or was released by another worker meanwhile
+        released += Job.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by).update(**fields)
+    return released
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim, enqueue, release_stale, run_job
+
+calls = []
+
+
+def record_call(*args, **kwargs):
+    calls.append((args, kwargs))
+
+
+def fail():
+    raise RuntimeError('boom')
+
+
+class QueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_claim_runs_by_priority_and_skips_future_jobs(self):
+        low = enqueue(record_call, 1)
+        high = enqueue(record_call, 2, priority=5)
+        enqueue(record_call, 3, delay=timedelta(hours=1))
+        claimed = claim('default', 'test', limit=5)
+        self.assertEqual([job.pk for job in claimed], [high.pk, low.pk])
+        self.assertEqual(claim('default', 'other', limit=5), [])
+        for job in claimed:
+            self.assertTrue(run_job(job))
+        self.assertEqual(calls, [((2,), {}), ((1,), {})])
+        self.assertEqual(Job.objects.filter(status='done').count(), 2)
+
+    def test_failure_backs_off_then_fails(self):
+        job = enqueue(fail, max_attempts=2)
+        [job] = claim('default', 'test')
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        [job] = claim('default', 'test')
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_release_stale_requeues_then_fails(self):
+        job = enqueue(record_call, max_attempts=2)
+        for attempt in (1, 2):
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            [job] = claim('default', 'dead-worker')
+            self.assertEqual(job.attempts, attempt)
+            # Still within the lock timeout: left alone
+            self.assertEqual(release_stale(timeout=60), 0)
+            Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(minutes=5))
+            self.assertEqual(release_stale(timeout=60), 1)
+            job.refresh_from_db()
+            self.assertEqual(job.locked_by, '')
+        # The second crash used up the job's attempts
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(claim('default', 'test'), [])
@@ -0,0 +1,96 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, connections
+
+from .queue import claim, release_stale, run_job
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for jobs left running by a dead worker
+RELEASE_INTERVAL = 60
+
+
+class Worker:
+    """Poll one queue and run its jobs on a pool of ``threads`` threads."""
+
+    def __init__(self, queue='default', threads=1, poll_interval=1.0, once=False):
+        self.queue = queue
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.once = once
+        self.stopping = threading.Event()
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def _run(self, job):
+        try:
+            ok = run_job(job)
+            logger.info('%s job %s (%s)', 'Finished' if ok else 'Failed', job.pk, job.task)
+        finally:
+            # Each pool thread has its own DB connection; drop broken or expired ones
+            close_old_connections()
+
+    def release_stale(self):
+        released = release_stale()
+        if released:
+            logger.warning('Released %s stale job(s)', released)
+        self.released_at = time.monotonic()
+
+    def run(self):
+        self.release_stale()
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            while not self.stopping.is_set():
+                if time.monotonic() - self.released_at > RELEASE_INTERVAL:
+                    self.release_stale()
+                jobs = claim(self.queue, self.worker_id, limit=self.threads)
+                close_old_connections()
+                if jobs:
+                    # Wait for the whole batch so no more than `threads` jobs are claimed at once
+                    list(pool.map(self._run, jobs))
+                    continue
+                if self.once:
+                    break
+                self.stopping.wait(self.poll_interval)
+
+
+def _process_main(options):
+    import django
+    django.setup()
+    worker = Worker(**options)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+def run_pool(processes, **options):
+    """Run ``processes`` worker processes, each with its own thread pool, until they exit."""
+    if processes <= 1:
+        _process_main(options)
+        return
+    # Connections must not be shared with the children
+    connections.close_all()
+    children = [
+        multiprocessing.Process(target=_process_main, args=(options,), daemon=False)
+        for _ in range(processes)
+    ]
+    for child in children:
+        child.start()
+
+    def forward(signum, frame):
+        for child in children:
+            if child.is_alive():
+                os.kill(child.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for child in children:
+        child.join()
@@ -1,19 +1,65 @@
 from django.contrib import admin
-from .models import Cart, Order, OrderItem
+from core.admin import ScalableAdminMixin
+from events import outbox
+from products import inventory
+from . import rollups
+from .models import ArchivedOrder, ArchivedOrderItem, Cart, Order, OrderItem
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
-    list_display = ['user', 'product', 'quantity', 'added_at']
+class CartAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['user', 'product', 'quantity', 'added_at', 'updated_at']
     list_filter = ['added_at']
+    list_select_related = ['user', 'product']
+    autocomplete_fields = ['user', 'product']
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    autocomplete_fields = ['product', 'seller']
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ['order_number', 'user', 'status', 'payment_method', 'total_amount', 'created_at']
     list_filter = ['status', 'payment_method', 'created_at']
-    search_fields = ['order_number', 'user__username']
+    list_select_related = ['user']
+    search_fields = ['^order_number', '^user__username']
+    autocomplete_fields = ['user']
     list_editable = ['status']
+    readonly_fields = ['stock_returned']  # kept by products.inventory as the status changes
     inlines = [OrderItemInline]
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data:
+            old = form.initial.get('status')
+            payload = {'old': old, 'new': obj.status}
+            if 'cancelled' in (old, obj.status):
+                # seller_sales takes cancelled orders out of the totals (orders.rollups)
+                payload['sellers'] = rollups.sellers_payload(obj.items.all())
+            outbox.record('order_status_changed', obj.pk, **payload)
+            # Cancelling returns the items to stock through the ledger; reopening takes them again
+            if obj.status == 'cancelled':
+                inventory.record_cancellation(obj)
+            elif old == 'cancelled':
+                inventory.record_reinstatement(obj)
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    readonly_fields = ['product', 'seller', 'product_name', 'quantity', 'price', 'ordered_at']
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['order_number', 'user', 'status', 'total_amount', 'created_at', 'archived_at']
+    list_filter = ['status', 'archived_at']
+    list_select_related = ['user']
+    search_fields = ['^order_number', '^user__username']
+    inlines = [ArchivedOrderItemInline]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,86 @@
+"""
+Carts for visitors who have not signed in.
+
+Their lines live in a signed cookie (CART_COOKIE_NAME) as {product id: quantity},
+so browsing and filling a cart never writes to the database. The login view
+calls ``merge_into_user`` to move the lines into Cart rows with one upsert and
+then drops the cookie.
+"""
+from django.conf import settings
+from django.core import signing
+
+from products.models import Product
+from .models import Cart
+
+SALT = 'orders.cart'
+
+
+class CookieCartLine:
+    """Stands in for a Cart row on the cart pages; ``pk`` is the product's id."""
+
+    def __init__(self, product, quantity):
+        self.pk = product.pk
+        self.product = product
+        self.quantity = quantity
+
+    @property
+    def subtotal(self):
+        return self.product.price * self.quantity
+
+
+def load(request):
+    """{product id: quantity} from the cookie; empty if it is missing, expired or tampered with."""
+    value = request.COOKIES.get(settings.CART_COOKIE_NAME)
+    if not value:
+        return {}
+    try:
+        data = signing.loads(value, salt=SALT, max_age=settings.CART_COOKIE_AGE)
+        return {int(pk): int(quantity) for pk, quantity in data.items() if int(quantity) > 0}
+    except (signing.BadSignature, AttributeError, TypeError, ValueError):
+        return {}
+
+
+def save(response, lines):
+    """Write ``lines`` back to the cookie, or delete it once the cart is empty."""
+    if not lines:
+        response.delete_cookie(settings.CART_COOKIE_NAME)
+        return
+    response.set_cookie(
+        settings.CART_COOKIE_NAME,
+        signing.dumps({str(pk): quantity for pk, quantity in lines.items()}, salt=SALT, compress=True),
+        max_age=settings.CART_COOKIE_AGE,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite='Lax',
+    )
+
+
+def cart_lines(lines):
+    """CookieCartLine objects for the cookie's lines, in the order they were added."""
+    products = Product.objects.with_available_stock().select_related('category').filter(is_active=True).in_bulk(lines)
+    return [CookieCartLine(products[pk], quantity) for pk, quantity in lines.items() if pk in products]
+
+
+def merge_into_user(request, user):
+    """Add the cookie's lines to ``user``'s cart in a single upsert; returns the lines written.
+
+    Quantities for products already in the cart are added together and capped
+    at the available stock.
+    """
+    lines = load(request)
+    if not lines:
+        return 0
+    products = Product.objects.with_available_stock().filter(is_active=True).in_bulk(lines)
+    existing = dict(Cart.objects.filter(user=user, product_id__in=products).values_list('product_id', 'quantity'))
+    merged = []
+    for pk, quantity in lines.items():
+        product = products.get(pk)
+        if product is None:
+            continue
+        quantity = min(existing.get(pk, 0) + quantity, product.available_stock)
+        if quantity > 0:
+            merged.append(Cart(user=user, product=product, quantity=quantity))
+    Cart.objects.bulk_create(
+        merged, update_conflicts=True, unique_fields=['user', 'product'], update_fields=['quantity', 'updated_at'],
+    )
+    return len(merged)
@@ -1,3 +1,4 @@
+from . import cart
 from .models import Cart
 
 def cart_count(request):
@@ -5,4 +6,4 @@ def cart_count(request):
     if request.user.is_authenticated:
         count = Cart.objects.filter(user=request.user).count()
         return {'cart_count': count}
-    return {'cart_count': 0}
+    return {'cart_count': len(cart.load(request))}
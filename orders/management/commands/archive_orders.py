@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.retention import archivable_orders, archive_orders, purge_carts, table_sizes
+
+
+class Command(BaseCommand):
+    help = 'Move old delivered/cancelled orders to the archive tables and purge abandoned carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+                            help='Archive orders last updated more than this many days ago')
+        parser.add_argument('--cart-days', type=int, default=settings.CART_PURGE_AFTER_DAYS,
+                            help='Purge cart lines untouched for this many days')
+        parser.add_argument('--batch-size', type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE,
+                            help='Orders moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many orders qualify')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_orders(options['days']).count()
+            self.stdout.write(f"{count} orders older than {options['days']} days would be archived.")
+            return
+
+        before = table_sizes()
+        orders, items = archive_orders(options['days'], options['batch_size'])
+        carts = purge_carts(options['cart_days'])
+        after = table_sizes()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {orders} orders ({items} items); purged {carts} cart lines.'
+        ))
+        for table, size in before.items():
+            line = f"  {table:<20} rows {size['rows']:>8} -> {after[table]['rows']:<8}"
+            if size['bytes'] is not None:
+                line += f"  size {size['bytes'] / 1024:>9.1f} KB -> {after[table]['bytes'] / 1024:.1f} KB"
+            self.stdout.write(line)
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def snapshot_existing_items(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    items = OrderItem.objects.select_related('order', 'product')
+    batch = []
+    for item in items.iterator(chunk_size=1000):
+        if item.product_id:
+            item.seller_id = item.product.seller_id
+            item.product_name = item.product.name
+        item.ordered_at = item.order.created_at
+        batch.append(item)
+        if len(batch) == 1000:
+            OrderItem.objects.bulk_update(batch, ['seller', 'product_name', 'ordered_at'])
+            batch = []
+    OrderItem.objects.bulk_update(batch, ['seller', 'product_name', 'ordered_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        ('products', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='seller',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sold_items', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(default='', max_length=200),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='ordered_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='product',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='products.product'),
+        ),
+        migrations.RunPython(snapshot_existing_items, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['seller', '-ordered_at'], name='orders_item_seller_date_idx'),
+        ),
+    ]
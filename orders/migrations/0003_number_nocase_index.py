@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:20
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_orderitem_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(django.db.models.functions.comparison.Collate('order_number', 'nocase'), name='orders_number_nocase_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Max, Sum
+
+
+def backfill_seller_sales(apps, schema_editor):
+    SellerSales = apps.get_model('orders', 'SellerSales')
+    Checkpoint = apps.get_model('events', 'Checkpoint')
+    Event = apps.get_model('events', 'Event')
+    totals = {}
+    for model in ('OrderItem', 'ArchivedOrderItem'):
+        rows = (
+            apps.get_model('orders', model).objects.filter(seller__isnull=False).order_by()
+            .values('seller').annotate(count=Count('pk'), total=Sum(F('price') * F('quantity'), output_field=DecimalField()))
+        )
+        for row in rows:
+            count, revenue = totals.get(row['seller'], (0, 0))
+            totals[row['seller']] = (count + row['count'], revenue + (row['total'] or 0))
+    SellerSales.objects.bulk_create([
+        SellerSales(seller_id=seller_id, item_count=count, revenue=revenue)
+        for seller_id, (count, revenue) in totals.items()
+    ], batch_size=1000)
+    # Orders already counted above must not be added again by the consumer
+    position = Event.objects.filter(kind='order_placed').aggregate(last=Max('pk'))['last'] or 0
+    Checkpoint.objects.update_or_create(consumer='seller_sales', defaults={'position': position})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_role_approved_index'),
+        ('events', '0001_initial'),
+        ('orders', '0005_user_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerSales',
+            fields=[
+                ('seller', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'seller sales',
+            },
+        ),
+        migrations.RunPython(backfill_seller_sales, migrations.RunPython.noop),
+    ]
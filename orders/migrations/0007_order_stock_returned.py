@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:33
+
+from django.db import migrations, models
+
+
+def mark_cancelled_orders(apps, schema_editor):
+    # Orders cancelled so far already had their stock put back
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.filter(status='cancelled').update(stock_returned=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_seller_sales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_returned',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_cancelled_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:55
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, F, Max, Sum
+
+
+def recount_seller_sales(apps, schema_editor):
+    """Rebuild SellerSales without cancelled orders, which seller_sales now leaves out."""
+    SellerSales = apps.get_model('orders', 'SellerSales')
+    Checkpoint = apps.get_model('events', 'Checkpoint')
+    Event = apps.get_model('events', 'Event')
+    totals = {}
+    for model in ('OrderItem', 'ArchivedOrderItem'):
+        rows = (
+            apps.get_model('orders', model).objects.filter(seller__isnull=False)
+            .exclude(order__status='cancelled').order_by()
+            .values('seller').annotate(count=Count('pk'), total=Sum(F('price') * F('quantity'), output_field=DecimalField()))
+        )
+        for row in rows:
+            count, revenue = totals.get(row['seller'], (0, 0))
+            totals[row['seller']] = (count + row['count'], revenue + (row['total'] or 0))
+    SellerSales.objects.all().delete()
+    SellerSales.objects.bulk_create([
+        SellerSales(seller_id=seller_id, item_count=count, revenue=revenue)
+        for seller_id, (count, revenue) in totals.items()
+    ], batch_size=1000)
+    # Every order event so far is reflected above; earlier status changes carry no totals
+    position = Event.objects.aggregate(last=Max('pk'))['last'] or 0
+    Checkpoint.objects.update_or_create(consumer='seller_sales', defaults={'position': position})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+        ('orders', '0008_order_user_created_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_seller_sales, migrations.RunPython.noop),
+    ]
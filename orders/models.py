@@ -1,5 +1,7 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Collate
+from django.utils import timezone
 from products.models import Product
 
 # Cart Model
@@ -8,6 +10,7 @@ class Cart(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # abandoned carts are purged by age
     
     class Meta:
         unique_together = ('user', 'product')
@@ -47,26 +50,108 @@ class Order(models.Model):
     # Pricing
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     
+    # Set when a cancellation has put the items back in stock, so it happens once
+    stock_returned = models.BooleanField(default=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Case-insensitive prefix search on order number in the admin
+            models.Index(Collate('order_number', 'nocase'), name='orders_number_nocase_idx'),
+            # A farmer's orders, newest first (order_list, dashboard); the id breaks
+            # ties in the same order so the pages need no sort step
+            models.Index(fields=['user', '-created_at', '-id'], name='orders_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"Order {self.order_number} - {self.user.username}"
 
 # Order Items
+# Seller, product name, unit price and order date are copied from the product and
+# order at checkout so seller listings and payouts read this table alone, and
+# order history survives the product being deleted.
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='sold_items')
+    product_name = models.CharField(max_length=200)
+    quantity = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    ordered_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['seller', '-ordered_at'], name='orders_item_seller_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_name} x {self.quantity}"
+    
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
+
+# Archived Orders
+# Delivered and cancelled orders past ORDER_ARCHIVE_AFTER_DAYS are moved here by
+# orders.retention, keeping their original ids, so the hot Order and OrderItem
+# tables only hold recent and in-progress orders.
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_orders')
+    order_number = models.CharField(max_length=20, unique=True)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_CHOICES)
+    payment_status = models.BooleanField(default=False)
+    shipping_address = models.TextField()
+    shipping_phone = models.CharField(max_length=15)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='orders_archived_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Archived order {self.order_number} - {self.user.username}"
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='+')
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    product_name = models.CharField(max_length=200)
     quantity = models.IntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    ordered_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['seller', '-ordered_at'], name='orders_archived_seller_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.product.name} x {self.quantity}"
+        return f"{self.product_name} x {self.quantity}"
     
     @property
     def subtotal(self):
         return self.price * self.quantity
+
+# Lifetime sales per seller, rolled up from order_placed events (orders.rollups)
+class SellerSales(models.Model):
+    seller = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='sales')
+    item_count = models.PositiveIntegerField(default=0)  # order lines, archived ones included
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'seller sales'
+    
+    def __str__(self):
+        return f"{self.seller_id}: {self.item_count} items, {self.revenue}"
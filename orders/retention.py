@@ -0,0 +1,102 @@
+"""
+Retention for the hot order tables.
+
+``archive_orders`` moves delivered and cancelled orders older than
+ORDER_ARCHIVE_AFTER_DAYS, with their items, into ArchivedOrder and
+ArchivedOrderItem in batches of ORDER_ARCHIVE_BATCH_SIZE; each batch is its own
+short transaction so checkouts are never blocked for long. ``purge_carts``
+deletes cart lines untouched for CART_PURGE_AFTER_DAYS. Anything asking about a
+user's past orders must look in both places; ``has_delivered`` does for reviews.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Cart, Order, OrderItem
+
+ARCHIVABLE_STATUSES = ['delivered', 'cancelled']
+
+ORDER_FIELDS = [
+    'id', 'user_id', 'order_number', 'status', 'payment_method', 'payment_status',
+    'shipping_address', 'shipping_phone', 'total_amount', 'created_at', 'updated_at',
+]
+ITEM_FIELDS = ['order_id', 'product_id', 'seller_id', 'product_name', 'quantity', 'price', 'ordered_at']
+
+HOT_MODELS = [Order, OrderItem, Cart]
+
+
+def archivable_orders(days=None):
+    days = settings.ORDER_ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, updated_at__lt=cutoff)
+
+
+def has_delivered(user, product):
+    """Whether ``user`` has received ``product`` in any order, archived ones included."""
+    return (
+        OrderItem.objects.filter(order__user=user, product=product, order__status='delivered').exists()
+        or ArchivedOrderItem.objects.filter(order__user=user, product=product, order__status='delivered').exists()
+    )
+
+
+def archive_batch(pks, days=None):
+    """
+    Copy these orders and their items to the archive and delete the originals.
+    The filter is applied again inside the transaction: an order reopened or
+    edited since it was selected stays where it is.
+    """
+    with transaction.atomic():
+        orders = list(archivable_orders(days).select_for_update().filter(pk__in=pks).values(*ORDER_FIELDS))
+        pks = [row['id'] for row in orders]
+        items = list(OrderItem.objects.filter(order_id__in=pks).order_by('pk').values(*ITEM_FIELDS))
+        ArchivedOrder.objects.bulk_create([ArchivedOrder(**row) for row in orders])
+        ArchivedOrderItem.objects.bulk_create([ArchivedOrderItem(**row) for row in items])
+        OrderItem.objects.filter(order_id__in=pks).delete()
+        Order.objects.filter(pk__in=pks).delete()
+    return len(orders), len(items)
+
+
+def archive_orders(days=None, batch_size=None):
+    """Archive eligible orders batch by batch; returns (orders moved, items moved)."""
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    eligible = archivable_orders(days).order_by('pk').values_list('pk', flat=True)
+    moved_orders = moved_items = 0
+    while True:
+        pks = list(eligible[:batch_size])
+        if not pks:
+            break
+        orders, items = archive_batch(pks, days)
+        moved_orders += orders
+        moved_items += items
+    return moved_orders, moved_items
+
+
+def purge_carts(days=None):
+    """Delete cart lines untouched for ``days``; returns how many were removed."""
+    days = settings.CART_PURGE_AFTER_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Cart.objects.filter(updated_at__lt=cutoff).delete()
+    return deleted
+
+
+def table_sizes(models=HOT_MODELS):
+    """{table: {'rows', 'bytes'}}; bytes come from SQLite's dbstat table when it is available."""
+    sizes = {}
+    with connection.cursor() as cursor:
+        for model in models:
+            table = model._meta.db_table
+            size = {'rows': model.objects.count(), 'bytes': None}
+            if connection.vendor == 'sqlite':
+                try:
+                    # The table plus its indexes
+                    cursor.execute(
+                        'SELECT SUM(pgsize) FROM dbstat '
+                        'WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name = %s)', [table]
+                    )
+                    size['bytes'] = cursor.fetchone()[0]
+                except DatabaseError:
+                    pass
+            sizes[table] = size
+    return sizes
@@ -0,0 +1,74 @@
+"""
+Derived order data maintained by event consumers (see events.consumer).
+
+``seller_sales`` adds each batch of order_placed events to SellerSales, so
+the seller dashboard reads one row instead of summing every item the seller
+ever sold. Cancelled orders do not count: an order_status_changed event into
+or out of 'cancelled' carries the same per-seller totals, which are taken off
+or added back. The totals trail checkouts by about one consume_events pass.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from .models import SellerSales
+
+
+def seller_totals(items):
+    """{seller id: [item count, revenue]} for OrderItem-like objects."""
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for item in items:
+        if item.seller_id:
+            totals[item.seller_id][0] += 1
+            totals[item.seller_id][1] += item.price * item.quantity
+    return totals
+
+
+def sellers_payload(items):
+    """seller_totals as the JSON event payloads carry them: {"seller id": [count, "revenue"]}."""
+    return {
+        str(seller_id): [count, str(revenue)]
+        for seller_id, (count, revenue) in seller_totals(items).items()
+    }
+
+
+def _direction(event):
+    """+1 if the event's order now counts towards sales, -1 if it no longer does, else 0."""
+    if event.kind == 'order_placed':
+        return 1
+    old, new = event.payload.get('old'), event.payload.get('new')
+    if new == 'cancelled' and old != 'cancelled':
+        return -1
+    if old == 'cancelled' and new != 'cancelled':
+        return 1
+    return 0
+
+
+def seller_sales(events):
+    """Consumer: fold a batch of order_placed and order_status_changed events into SellerSales."""
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for event in events:
+        direction = _direction(event)
+        if not direction:
+            continue
+        for seller_id, (count, revenue) in event.payload.get('sellers', {}).items():
+            totals[int(seller_id)][0] += direction * count
+            totals[int(seller_id)][1] += direction * Decimal(revenue)
+    existing = SellerSales.objects.in_bulk(list(totals))
+    # Sellers deleted since they sold have nothing left to show the totals on
+    sellers = set(get_user_model().objects.filter(pk__in=list(totals)).values_list('pk', flat=True))
+    created, updated, now = [], [], timezone.now()
+    for seller_id, (count, revenue) in totals.items():
+        row = existing.get(seller_id)
+        if row is None:
+            if seller_id in sellers and count > 0:
+                created.append(SellerSales(seller_id=seller_id, item_count=count, revenue=revenue))
+        else:
+            row.item_count += count
+            row.revenue += revenue
+            row.updated_at = now
+            updated.append(row)
+    SellerSales.objects.bulk_create(created)
+    SellerSales.objects.bulk_update(updated, ['item_count', 'revenue', 'updated_at'])
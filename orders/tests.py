@@ -1,3 +1,307 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from events.consumer import consume
+from products.models import Category, Product
+from reviews.models import Review
+from . import cart, retention
+from .admin import OrderAdmin
+from .models import ArchivedOrder, ArchivedOrderItem, Cart, Order, OrderItem, SellerSales
+
+
+class OrderPageQueryCountTests(TestCase):
+    """Order pages run the same number of queries however many orders and lines there are."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user('farmer', password='pass', role='farmer')
+        cls.seller = User.objects.create_user('seller', password='pass', role='seller', is_approved=True)
+        category = Category.objects.create(name='Seeds')
+        cls.products = [
+            Product.objects.create(
+                seller=cls.seller, category=category, name=f'Seed {i}', description='Seed',
+                price=Decimal('10.00'), stock=100, image='products/seed.jpg',
+            )
+            for i in range(5)
+        ]
+
+    def create_order(self, lines):
+        order = Order.objects.create(
+            user=self.farmer, order_number=f'ORD{Order.objects.count():010d}',
+            shipping_address='Village road', shipping_phone='9999999999', total_amount=Decimal('10.00') * lines,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, seller=self.seller, product_name=product.name,
+                      quantity=1, price=product.price)
+            for product in self.products[:lines]
+        ])
+        return order
+
+    def setUp(self):
+        self.client.force_login(self.farmer)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_order_list(self):
+        self.create_order(lines=1)
+        url = reverse('orders:order_list')
+        queries = self.count_queries(url)
+        for _ in range(15):
+            self.create_order(lines=5)
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        page = response.context['orders']
+        self.assertEqual(len(page), 10)
+        for order in page:
+            self.assertEqual(order.item_count, OrderItem.objects.filter(order=order).count())
+
+    def test_order_detail(self):
+        small = self.create_order(lines=1)
+        large = self.create_order(lines=5)
+        queries = self.count_queries(reverse('orders:order_detail', args=[small.pk]))
+        with self.assertNumQueries(queries):
+            response = self.client.get(reverse('orders:order_detail', args=[large.pk]))
+        self.assertEqual(response.context['order'].item_count, 5)
+        self.assertContains(response, reverse('products:product_detail', args=[self.products[4].pk]))
+
+
+class RetentionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user('farmer', password='pass', role='farmer')
+        cls.seller = User.objects.create_user('seller', password='pass', role='seller', is_approved=True)
+        category = Category.objects.create(name='Seeds')
+        cls.product = Product.objects.create(
+            seller=cls.seller, category=category, name='Seed', description='Seed',
+            price=Decimal('10.00'), stock=100, image='products/seed.jpg',
+        )
+
+    def create_order(self, status, days_ago):
+        order = Order.objects.create(
+            user=self.farmer, order_number=f'ORD{Order.objects.count():010d}', status=status,
+            shipping_address='Village road', shipping_phone='9999999999', total_amount=Decimal('20.00'),
+        )
+        OrderItem.objects.create(
+            order=order, product=self.product, seller=self.seller, product_name='Seed',
+            quantity=2, price=Decimal('10.00'),
+        )
+        Order.objects.filter(pk=order.pk).update(updated_at=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def test_archive_moves_only_old_finished_orders(self):
+        old = [self.create_order('delivered', 400), self.create_order('cancelled', 400)]
+        recent = self.create_order('delivered', 1)
+        pending = self.create_order('pending', 400)
+        self.assertEqual(retention.archive_orders(days=180, batch_size=1), (2, 2))
+        self.assertEqual(set(Order.objects.values_list('pk', flat=True)), {recent.pk, pending.pk})
+        self.assertEqual(set(ArchivedOrder.objects.values_list('pk', flat=True)), {order.pk for order in old})
+        item = ArchivedOrderItem.objects.get(order=old[0].pk)
+        self.assertEqual((item.product_id, item.quantity, item.price), (self.product.pk, 2, Decimal('10.00')))
+        self.assertEqual(retention.archive_orders(days=180), (0, 0))
+
+    def test_archive_batch_skips_orders_changed_since_selection(self):
+        reopened = self.create_order('delivered', 400)
+        touched = self.create_order('cancelled', 400)
+        kept = self.create_order('delivered', 400)
+        pks = list(retention.archivable_orders(180).values_list('pk', flat=True))
+        Order.objects.filter(pk=reopened.pk).update(status='shipped')
+        Order.objects.filter(pk=touched.pk).update(updated_at=timezone.now())
+        self.assertEqual(retention.archive_batch(pks, days=180), (1, 1))
+        self.assertEqual(list(ArchivedOrder.objects.values_list('pk', flat=True)), [kept.pk])
+        self.assertEqual(set(Order.objects.values_list('pk', flat=True)), {reopened.pk, touched.pk})
+        self.assertEqual(OrderItem.objects.filter(order__in=[reopened, touched]).count(), 2)
+
+    def test_purge_carts(self):
+        Cart.objects.create(user=self.farmer, product=self.product)
+        self.assertEqual(retention.purge_carts(days=30), 0)
+        Cart.objects.update(updated_at=timezone.now() - timedelta(days=31))
+        self.assertEqual(retention.purge_carts(days=30), 1)
+
+    def test_archived_orders_stay_reachable(self):
+        order = self.create_order('delivered', 400)
+        retention.archive_orders(days=180)
+        self.client.force_login(self.farmer)
+
+        response = self.client.get(reverse('orders:order_detail', args=[order.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['order'].item_count, 1)
+        response = self.client.get(reverse('orders:order_list'), {'archived': '1'})
+        self.assertEqual([o.pk for o in response.context['orders']], [order.pk])
+
+        response = self.client.get(reverse('api:order_detail', args=[order.pk]))
+        self.assertEqual(response.json()['items'][0]['quantity'], 2)
+        self.assertEqual(self.client.get(reverse('api:order_list')).json()['results'], [])
+        results = self.client.get(reverse('api:order_list'), {'archived': '1'}).json()['results']
+        self.assertEqual([o['id'] for o in results], [order.pk])
+
+        # Another user still gets a 404
+        self.client.force_login(self.seller)
+        self.assertEqual(self.client.get(reverse('orders:order_detail', args=[order.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api:order_detail', args=[order.pk])).status_code, 404)
+
+    def test_archived_purchase_can_still_be_reviewed(self):
+        self.create_order('delivered', 400)
+        retention.archive_orders(days=180)
+        self.assertTrue(retention.has_delivered(self.farmer, self.product))
+        self.client.force_login(self.farmer)
+        response = self.client.get(reverse('products:product_detail', args=[self.product.pk]))
+        self.assertTrue(response.context['can_review'])
+        self.client.post(reverse('reviews:add_review', args=[self.product.pk]), {'rating': 5, 'comment': 'Good'})
+        self.assertTrue(Review.objects.filter(user=self.farmer, product=self.product).exists())
+
+
+@override_settings(RATELIMIT_ENABLED=False)
+class VisitorCartTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user('farmer', password='pass', role='farmer')
+        cls.seller = User.objects.create_user('seller', password='pass', role='seller', is_approved=True)
+        category = Category.objects.create(name='Seeds')
+        cls.products = [
+            Product.objects.create(
+                seller=cls.seller, category=category, name=f'Seed {i}', description='Seed',
+                price=Decimal('10.00'), stock=3, image='products/seed.jpg',
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def add(self, product):
+        return self.client.get(reverse('orders:add_to_cart', args=[product.pk]))
+
+    def lines(self):
+        request = RequestFactory().get('/')
+        request.COOKIES = {name: morsel.value for name, morsel in self.client.cookies.items()}
+        return cart.load(request)
+
+    def test_visitors_can_reach_the_cart(self):
+        response = self.client.get(reverse('products:product_detail', args=[self.products[0].pk]))
+        self.assertContains(response, reverse('orders:add_to_cart', args=[self.products[0].pk]))
+        self.assertContains(response, f'href="{reverse("orders:cart")}"')
+        self.assertNotContains(response, reverse('products:wishlist_toggle', args=[self.products[0].pk]))
+
+    def test_cookie_cart_add_and_stock_cap(self):
+        for _ in range(4):
+            self.add(self.products[0])
+        self.add(self.products[1])
+        self.assertEqual(self.lines(), {self.products[0].pk: 3, self.products[1].pk: 1})
+        self.assertFalse(Cart.objects.exists())
+        response = self.client.get(reverse('orders:cart'))
+        self.assertEqual(response.context['cart_count'], 2)
+        self.assertEqual(response.context['total'], Decimal('40.00'))
+
+    @override_settings(CART_COOKIE_MAX_LINES=2)
+    def test_cookie_cart_line_cap(self):
+        for product in self.products:
+            self.add(product)
+        self.assertEqual(set(self.lines()), {self.products[0].pk, self.products[1].pk})
+        # More of a product already in the cart is still fine
+        self.add(self.products[0])
+        self.assertEqual(self.lines()[self.products[0].pk], 2)
+
+    def test_batch_update(self):
+        for product in self.products:
+            self.add(product)
+        url = reverse('orders:batch_update_cart')
+        first, second, third = (product.pk for product in self.products)
+        self.client.post(url, {f'quantity-{first}': '2', f'quantity-{second}': '0'})
+        self.assertEqual(self.lines(), {first: 2, third: 1})
+        # One line over the stock: nothing changes
+        self.client.post(url, {f'quantity-{first}': '1', f'quantity-{third}': '9'})
+        self.assertEqual(self.lines(), {first: 2, third: 1})
+
+        self.client.force_login(self.farmer)
+        rows = Cart.objects.bulk_create([Cart(user=self.farmer, product=product) for product in self.products[:2]])
+        self.client.post(url, {f'quantity-{rows[0].pk}': '3', f'quantity-{rows[1].pk}': '0'})
+        self.assertEqual(list(Cart.objects.values_list('product', 'quantity')), [(first, 3)])
+
+    def test_login_merges_the_cookie_cart(self):
+        Cart.objects.create(user=self.farmer, product=self.products[0], quantity=2)
+        self.add(self.products[0])
+        self.add(self.products[0])
+        self.add(self.products[1])
+        response = self.client.post(
+            f"{reverse('accounts:login')}?next={reverse('orders:checkout')}", {'username': 'farmer', 'password': 'pass'},
+        )
+        self.assertRedirects(response, reverse('orders:checkout'))
+        # 2 saved + 2 from the cookie, capped at the 3 in stock
+        self.assertEqual(
+            dict(Cart.objects.filter(user=self.farmer).values_list('product', 'quantity')),
+            {self.products[0].pk: 3, self.products[1].pk: 1},
+        )
+        self.assertEqual(self.lines(), {})
+
+
+@override_settings(EVENTS_SETTLE_SECONDS=0)
+class SellerSalesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user('farmer', password='pass', role='farmer')
+        cls.sellers = [
+            User.objects.create_user(f'seller{i}', password='pass', role='seller', is_approved=True) for i in range(2)
+        ]
+        category = Category.objects.create(name='Seeds')
+        cls.products = [
+            Product.objects.create(
+                seller=seller, category=category, name=f'Seed {i}', description='Seed',
+                price=Decimal('10.00') * (i + 1), stock=100, image='products/seed.jpg',
+            )
+            for i, seller in enumerate(cls.sellers)
+        ]
+
+    def totals(self):
+        consume('seller_sales')
+        return {
+            sales.seller_id: (sales.item_count, sales.revenue)
+            for sales in SellerSales.objects.filter(seller__in=self.sellers)
+        }
+
+    def set_status(self, order, status):
+        old, order.status = order.status, status
+        form = SimpleNamespace(changed_data=['status'], initial={'status': old})
+        OrderAdmin(Order, admin.site).save_model(None, order, form, change=True)
+
+    def test_rollup_follows_checkouts_and_cancellations(self):
+        Cart.objects.create(user=self.farmer, product=self.products[0], quantity=3)
+        Cart.objects.create(user=self.farmer, product=self.products[1], quantity=1)
+        self.client.force_login(self.farmer)
+        self.client.post(reverse('orders:checkout'), {
+            'shipping_address': 'Village road', 'shipping_phone': '9999999999', 'payment_method': 'cod',
+        })
+        order = Order.objects.get(user=self.farmer)
+        placed = {self.sellers[0].pk: (1, Decimal('30.00')), self.sellers[1].pk: (1, Decimal('20.00'))}
+        self.assertEqual(self.totals(), placed)
+
+        self.set_status(order, 'cancelled')
+        cancelled = {seller.pk: (0, Decimal('0.00')) for seller in self.sellers}
+        self.assertEqual(self.totals(), cancelled)
+        self.assertEqual(Product.objects.with_available_stock().get(pk=self.products[0].pk).available_stock, 100)
+        self.set_status(order, 'pending')
+        self.assertEqual(self.totals(), placed)
+        # Reopened: the items are taken from stock again
+        self.assertEqual(Product.objects.with_available_stock().get(pk=self.products[0].pk).available_stock, 97)
+        self.set_status(order, 'shipped')
+        self.assertEqual(self.totals(), placed)
+
+        self.client.force_login(self.sellers[0])
+        response = self.client.get(reverse('accounts:dashboard'))
+        self.assertContains(response, '30.00')
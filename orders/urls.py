@@ -6,6 +6,7 @@ app_name = 'orders'
 urlpatterns = [
     path('cart/', views.cart_view, name='cart'),
     path('cart/add/<int:pk>/', views.add_to_cart, name='add_to_cart'),
+    path('cart/update/', views.batch_update_cart, name='batch_update_cart'),
     path('cart/update/<int:pk>/', views.update_cart, name='update_cart'),
     path('cart/remove/<int:pk>/', views.remove_from_cart, name='remove_from_cart'),
     path('checkout/', views.checkout, name='checkout'),
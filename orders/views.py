@@ -1,34 +1,71 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Cart, Order, OrderItem
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+from django.core.paginator import Paginator
+from django.db.models import Count, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .models import ArchivedOrder, ArchivedOrderItem, Cart, Order, OrderItem
 from .forms import CheckoutForm
+from . import cart
 from products.models import Product
+from products import inventory
+from events import outbox
+from . import rollups
 import uuid
 
-@login_required
+def _with_available_stock(cart_items):
+    return cart_items.prefetch_related(Prefetch('product', queryset=Product.objects.with_available_stock()))
+
 def cart_view(request):
-    cart_items = Cart.objects.filter(user=request.user)
+    lines = None
+    if request.user.is_authenticated:
+        cart_items = _with_available_stock(Cart.objects.filter(user=request.user))
+    else:
+        lines = cart.load(request)
+        cart_items = cart.cart_lines(lines)
     total = sum([item.subtotal for item in cart_items])
     
     context = {
         'cart_items': cart_items,
         'total': total,
     }
-    return render(request, 'orders/cart.html', context)
+    response = render(request, 'orders/cart.html', context)
+    if lines is not None and len(cart_items) < len(lines):
+        # Drop products that were deleted or deactivated since they were added
+        cart.save(response, {item.pk: item.quantity for item in cart_items})
+    return response
 
-@login_required
 def add_to_cart(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+    product = get_object_or_404(Product.objects.with_available_stock(), pk=pk)
     
-    if product.stock <= 0:
+    if product.available_stock <= 0:
         messages.error(request, 'Product is out of stock.')
         return redirect('products:product_detail', pk=pk)
     
+    if not request.user.is_authenticated:
+        # Visitors' carts stay in a signed cookie until they log in (see orders.cart)
+        lines = cart.load(request)
+        if product.pk not in lines and len(lines) >= settings.CART_COOKIE_MAX_LINES:
+            messages.error(request, 'Your cart is full. Please log in to add more products.')
+            return redirect('orders:cart')
+        quantity = lines.get(product.pk, 0)
+        if quantity >= product.available_stock:
+            messages.error(request, 'Cannot add more than available stock.')
+            return redirect('orders:cart')
+        lines[product.pk] = quantity + 1
+        messages.success(request, 'Cart updated!' if quantity else 'Added to cart!')
+        response = redirect('orders:cart')
+        cart.save(response, lines)
+        return response
+    
     cart_item, created = Cart.objects.get_or_create(user=request.user, product=product)
     
     if not created:
-        if cart_item.quantity < product.stock:
+        if cart_item.quantity < product.available_stock:
             cart_item.quantity += 1
             cart_item.save()
             messages.success(request, 'Cart updated!')
@@ -39,31 +76,77 @@ def add_to_cart(request, pk):
     
     return redirect('orders:cart')
 
-@login_required
-def update_cart(request, pk):
-    cart_item = get_object_or_404(Cart, pk=pk, user=request.user)
+def _cart_lines(request, pks):
+    """The visitor's cart lines with these pks (product ids for cookie carts), by pk."""
+    if request.user.is_authenticated:
+        lines = _with_available_stock(Cart.objects.filter(user=request.user, pk__in=list(pks)))
+    else:
+        lines = cart.cart_lines({pk: quantity for pk, quantity in cart.load(request).items() if pk in pks})
+    return {line.pk: line for line in lines}
+
+def _apply_quantities(request, quantities):
+    """Set every line in ``quantities`` ({pk: quantity}; 0 removes the line) all at once.
     
-    if request.method == 'POST':
-        quantity = int(request.POST.get('quantity', 1))
-        
-        if quantity <= 0:
-            cart_item.delete()
-            messages.success(request, 'Item removed from cart.')
-        elif quantity <= cart_item.product.stock:
-            cart_item.quantity = quantity
-            cart_item.save()
-            messages.success(request, 'Cart updated!')
-        else:
-            messages.error(request, 'Quantity exceeds available stock.')
+    Nothing changes if any quantity exceeds the available stock. Returns the
+    response to send, which carries the new cookie for visitors' carts.
+    """
+    lines = _cart_lines(request, quantities)
+    too_many = [line.product.name for pk, line in lines.items() if quantities[pk] > line.product.available_stock]
+    response = redirect('orders:cart')
+    if too_many:
+        messages.error(request, f"Quantity exceeds available stock for {', '.join(too_many)}.")
+        return response
     
-    return redirect('orders:cart')
+    removed = [pk for pk in lines if quantities[pk] <= 0]
+    changed = [line for pk, line in lines.items() if 0 < quantities[pk] != line.quantity]
+    if request.user.is_authenticated:
+        now = timezone.now()
+        for line in changed:
+            line.quantity = quantities[line.pk]
+            line.updated_at = now
+        with transaction.atomic():
+            Cart.objects.filter(pk__in=removed).delete()
+            Cart.objects.bulk_update(changed, ['quantity', 'updated_at'])
+    else:
+        cookie_lines = cart.load(request)
+        for pk in removed:
+            cookie_lines.pop(pk, None)
+        for line in changed:
+            cookie_lines[line.pk] = quantities[line.pk]
+        cart.save(response, cookie_lines)
+    
+    if removed and not changed:
+        messages.success(request, 'Item removed from cart.' if len(removed) == 1 else 'Items removed from cart.')
+    elif removed or changed:
+        messages.success(request, 'Cart updated!')
+    return response
+
+def update_cart(request, pk):
+    if request.method != 'POST':
+        return redirect('orders:cart')
+    try:
+        quantity = int(request.POST.get('quantity', 1))
+    except ValueError:
+        return redirect('orders:cart')
+    if pk not in _cart_lines(request, [pk]):
+        raise Http404
+    return _apply_quantities(request, {pk: quantity})
+
+def batch_update_cart(request):
+    """Apply every quantity on the cart page (``quantity-<pk>`` fields) in one transaction."""
+    if request.method != 'POST':
+        return redirect('orders:cart')
+    quantities = {}
+    for name, value in request.POST.items():
+        pk = name.removeprefix('quantity-')
+        if pk != name and pk.isdigit() and value.strip().isdigit():
+            quantities[int(pk)] = int(value)
+    return _apply_quantities(request, quantities)
 
-@login_required
 def remove_from_cart(request, pk):
-    cart_item = get_object_or_404(Cart, pk=pk, user=request.user)
-    cart_item.delete()
-    messages.success(request, 'Item removed from cart.')
-    return redirect('orders:cart')
+    if pk not in _cart_lines(request, [pk]):
+        raise Http404
+    return _apply_quantities(request, {pk: 0})
 
 @login_required
 def checkout(request):
@@ -78,29 +161,34 @@ def checkout(request):
     if request.method == 'POST':
         form = CheckoutForm(request.POST)
         if form.is_valid():
-            # Create order
-            order = form.save(commit=False)
-            order.user = request.user
-            order.order_number = f"ORD{uuid.uuid4().hex[:10].upper()}"
-            order.total_amount = total
-            order.save()
-            
-            # Create order items and update stock
-            for cart_item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    quantity=cart_item.quantity,
-                    price=cart_item.product.price
-                )
+            with transaction.atomic():
+                # Create order
+                order = form.save(commit=False)
+                order.user = request.user
+                order.order_number = f"ORD{uuid.uuid4().hex[:10].upper()}"
+                order.total_amount = total
+                order.save()
                 
-                # Update product stock
-                product = cart_item.product
-                product.stock -= cart_item.quantity
-                product.save()
-            
-            # Clear cart
-            cart_items.delete()
+                # Create order items, snapshotting seller, name and price
+                items = OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order,
+                        product=cart_item.product,
+                        seller_id=cart_item.product.seller_id,
+                        product_name=cart_item.product.name,
+                        quantity=cart_item.quantity,
+                        price=cart_item.product.price,
+                        ordered_at=order.created_at,
+                    )
+                    for cart_item in cart_items
+                ])
+                # Take the stock through the ledger: inserts only, no contended Product row writes
+                inventory.record_sales(order, items)
+                outbox.record('order_placed', order.pk, user=request.user.pk, total=str(total),
+                              sellers=rollups.sellers_payload(items))
+                
+                # Clear cart
+                cart_items.delete()
             
             messages.success(request, f'Order placed successfully! Order number: {order.order_number}')
             return redirect('orders:order_detail', pk=order.pk)
@@ -117,12 +205,45 @@ def checkout(request):
     }
     return render(request, 'orders/checkout.html', context)
 
+ORDERS_PER_PAGE = 10
+
+def _with_item_totals(orders, item_model=OrderItem):
+    # Correlated subqueries rather than JOIN + GROUP BY, so the (user, created_at)
+    # index still delivers the orders already sorted
+    items = item_model.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    return orders.annotate(
+        item_count=Coalesce(Subquery(items.annotate(count=Count('pk')).values('count')), 0),
+        total_quantity=Subquery(items.annotate(total=Sum('quantity')).values('total')),
+    ).order_by('-created_at', '-pk')
+
 @login_required
 def order_list(request):
-    orders = Order.objects.filter(user=request.user)
-    return render(request, 'orders/order_list.html', {'orders': orders})
+    # Old delivered/cancelled orders live in the archive tables (see orders.retention)
+    archived = request.GET.get('archived') == '1'
+    model, item_model = (ArchivedOrder, ArchivedOrderItem) if archived else (Order, OrderItem)
+    orders = _with_item_totals(model.objects.filter(user=request.user), item_model)
+    page = Paginator(orders, ORDERS_PER_PAGE).get_page(request.GET.get('page'))
+    context = {
+        'orders': page,
+        'page_obj': page,
+        'archived': archived,
+    }
+    return render(request, 'orders/order_list.html', context)
 
 @login_required
 def order_detail(request, pk):
-    order = get_object_or_404(Order, pk=pk, user=request.user)
+    # Items and their products in one extra query, however many lines the order has
+    order = (
+        _with_item_totals(Order.objects.filter(user=request.user))
+        .prefetch_related(Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('pk')))
+        .filter(pk=pk).first()
+    )
+    if order is None:
+        # Archived orders keep their ids, so old links still work
+        order = get_object_or_404(
+            _with_item_totals(ArchivedOrder.objects.filter(user=request.user), ArchivedOrderItem).prefetch_related(
+                Prefetch('items', queryset=ArchivedOrderItem.objects.select_related('product').order_by('pk'))
+            ),
+            pk=pk,
+        )
     return render(request, 'orders/order_detail.html', {'order': order})
@@ -1,19 +1,86 @@
+from django import forms
 from django.contrib import admin
-from .models import Category, Product, Wishlist
+from core.admin import ScalableAdminMixin
+from events import outbox
+from . import inventory
+from .models import Category, Product, Wishlist, CategoryPriceIndex, StockMovement
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'created_at']
     search_fields = ['name']
 
+class ProductAdminForm(forms.ModelForm):
+    available_stock = forms.IntegerField(
+        min_value=0, required=False,
+        help_text='Units on sale now. A change is recorded in the stock ledger as a restock or adjustment.',
+    )
+    
+    class Meta:
+        model = Product
+        fields = '__all__'
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['available_stock'].initial = self.instance.available_stock
+
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'seller', 'price', 'stock', 'is_active', 'created_at']
+class ProductAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    form = ProductAdminForm
+    list_display = ['name', 'category', 'seller', 'price', 'available', 'is_active', 'created_at']
     list_filter = ['category', 'is_active', 'created_at']
-    search_fields = ['name', 'description']
+    list_select_related = ['category', 'seller']
+    # Prefix search on the indexed name instead of a scan of every description
+    search_fields = ['^name']
+    autocomplete_fields = ['category', 'seller']
     list_editable = ['is_active']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_available_stock()
+    
+    @admin.display(description='Available', ordering='available')
+    def available(self, obj):
+        return obj.available_stock
+    
+    def get_readonly_fields(self, request, obj=None):
+        # Base stock only moves through the ledger once the product exists
+        return ['stock'] if obj else []
+    
+    def get_fields(self, request, obj=None):
+        fields = super().get_fields(request, obj)
+        return fields if obj else [name for name in fields if name != 'available_stock']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        outbox.record('product_changed', obj.pk, created=not change, fields=form.changed_data)
+        if change and 'available_stock' in form.changed_data and form.cleaned_data['available_stock'] is not None:
+            inventory.record_stock_change(obj, form.cleaned_data['available_stock'])
+    
+    def delete_model(self, request, obj):
+        outbox.record('product_changed', obj.pk, deleted=True)
+        super().delete_model(request, obj)
+    
+    def delete_queryset(self, request, queryset):
+        outbox.record_many('product_changed', [(pk, {'deleted': True}) for pk in queryset.values_list('pk', flat=True)])
+        super().delete_queryset(request, queryset)
 
 @admin.register(Wishlist)
-class WishlistAdmin(admin.ModelAdmin):
+class WishlistAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ['user', 'product', 'added_at']
     list_filter = ['added_at']
+    list_select_related = ['user', 'product']
+    autocomplete_fields = ['user', 'product']
+
+@admin.register(CategoryPriceIndex)
+class CategoryPriceIndexAdmin(admin.ModelAdmin):
+    list_display = ['category', 'updated_at']
+    readonly_fields = ['category', 'series', 'updated_at']
+
+@admin.register(StockMovement)
+class StockMovementAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['product', 'kind', 'quantity', 'order', 'created_at']
+    list_filter = ['kind', 'created_at']
+    list_select_related = ['product', 'order']
+    search_fields = ['^product__name']
+    raw_id_fields = ['product', 'order']
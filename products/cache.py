@@ -0,0 +1,190 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+
+from .models import Product, Category
+
+# Cache keys for catalogue data shown on most pages. The "catalog" prefix groups
+# them together in the cache hit-rate statistics.
+CATEGORIES_KEY = 'catalog:categories'
+FEATURED_KEY = 'catalog:featured'
+HOME_CATEGORIES_KEY = 'catalog:home_categories'
+
+FEATURED_LIMIT = 8
+HOME_CATEGORY_LIMIT = 6
+
+
+def _load_categories():
+    return list(Category.objects.all())
+
+
+def _load_home_categories():
+    return list(Category.objects.all()[:HOME_CATEGORY_LIMIT])
+
+
+def _load_featured_products():
+    # Prefetch what home.html touches so cached instances need no further queries
+    return list(
+        Product.objects.filter(is_active=True)
+        .select_related('category')
+        .prefetch_related('reviews')[:FEATURED_LIMIT]
+    )
+
+
+HOT_KEYS = {
+    CATEGORIES_KEY: _load_categories,
+    HOME_CATEGORIES_KEY: _load_home_categories,
+    FEATURED_KEY: _load_featured_products,
+}
+
+
+def get_categories():
+    return cache.get_or_set(CATEGORIES_KEY, _load_categories)
+
+
+def get_home_categories():
+    return cache.get_or_set(HOME_CATEGORIES_KEY, _load_home_categories)
+
+
+def get_featured_products():
+    return cache.get_or_set(FEATURED_KEY, _load_featured_products)
+
+
+def warm():
+    """Load every hot key into the cache and return {key: number of items}."""
+    warmed = {}
+    for key, loader in HOT_KEYS.items():
+        value = loader()
+        cache.set(key, value)
+        warmed[key] = len(value)
+    return warmed
+
+
+def invalidate_catalog():
+    cache.delete_many(list(HOT_KEYS))
+
+
+# Per-object read-through cache for Product and Category.
+#
+# Each object has a version number in the cache, and its cached copy is stored
+# under a key that includes that version. Saving, deleting or moving stock
+# bumps the version once the transaction commits: bumping earlier would let a
+# reader cache the not-yet-committed old row under the new version. After the
+# bump, workers sharing the cache (see CACHE_BACKEND) stop reading the old copy,
+# and a reader that loaded stale data just before it writes it under a key
+# nobody reads any more. OBJECT_SCHEMA is part of the key too: bump it when cached
+# model fields change so a deploy never unpickles old-shaped instances.
+#
+# Cached products carry their available stock for display; anything that
+# decides on stock (add to cart, checkout, seller edits) queries the database.
+OBJECT_SCHEMA = 1
+OBJECT_TIMEOUT = 60 * 60
+
+
+def _version_key(model, pk):
+    return f'catalog:{model._meta.model_name}:{pk}:version'
+
+
+def _object_key(model, pk, version):
+    return f'catalog:{model._meta.model_name}:{pk}:{OBJECT_SCHEMA}:{version}'
+
+
+def _versions(model, pks):
+    """{pk: current version}, starting missing versions from the clock so they
+    never fall back to a number an evicted counter already used."""
+    keys = {_version_key(model, pk): pk for pk in pks}
+    found = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        initial = time.time_ns() // 1000
+        for key in missing:
+            cache.add(key, initial, None)
+        found.update(cache.get_many(missing))
+    return {pk: found.get(key, 0) for key, pk in keys.items()}
+
+
+def _load_products(pks):
+    return (
+        Product.objects.with_available_stock()
+        .select_related('seller')
+        .defer('seller__password')
+        .in_bulk(pks)
+    )
+
+
+def _load_categories_by_id(pks):
+    return Category.objects.in_bulk(pks)
+
+
+LOADERS = {
+    Product: _load_products,
+    Category: _load_categories_by_id,
+}
+
+
+def get_many(model, pks):
+    """{pk: instance} for the pks that exist, loading cache misses in one query."""
+    pks = set(pks)
+    if not pks:
+        return {}
+    versions = _versions(model, pks)
+    keys = {_object_key(model, pk, version): pk for pk, version in versions.items()}
+    cached = cache.get_many(list(keys))
+    objects = {keys[key]: obj for key, obj in cached.items()}
+    missing = pks - objects.keys()
+    if missing:
+        loaded = LOADERS[model](missing)
+        cache.set_many(
+            {_object_key(model, pk, versions[pk]): obj for pk, obj in loaded.items()},
+            OBJECT_TIMEOUT,
+        )
+        objects.update(loaded)
+    return objects
+
+
+def get_product(pk):
+    """A Product from the cache, or None if it does not exist."""
+    return get_products([pk]).get(pk)
+
+
+def get_product_or_404(pk):
+    product = get_product(pk)
+    if product is None:
+        raise Http404('No product matches the given query.')
+    return product
+
+
+def get_products(pks):
+    products = get_many(Product, pks)
+    # Categories come from their own entries, so renaming one needs no product invalidation
+    categories = get_categories_by_id({product.category_id for product in products.values()})
+    for product in products.values():
+        product.category = categories[product.category_id]
+    return products
+
+
+def get_category(pk):
+    return get_many(Category, [pk]).get(pk)
+
+
+def get_categories_by_id(pks):
+    return get_many(Category, pks)
+
+
+def _bump_versions(model, pks):
+    for pk in pks:
+        try:
+            cache.incr(_version_key(model, pk))
+        except ValueError:
+            # No version yet: the next read starts one from the clock
+            pass
+
+
+def invalidate_objects(model, pks):
+    """Bump the version of each object, after the current transaction commits,
+    so its cached copy is no longer read."""
+    pks = set(pks)
+    if pks:
+        transaction.on_commit(lambda: _bump_versions(model, pks))
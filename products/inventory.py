@@ -0,0 +1,110 @@
+"""
+Append-only stock ledger.
+
+Checkout, restocks and cancellations insert StockMovement rows rather than
+updating the Product row, so concurrent buyers of a popular product never
+queue behind one another's row write. ``compact`` periodically folds the
+movements back into ``Product.stock`` to keep the per-product sums short::
+
+    python manage.py compact_stock                   # once
+    python manage.py compact_stock --every 300       # as a recurring job
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, Sum
+
+from events import outbox
+from .cache import invalidate_objects
+from .models import Product, StockMovement
+
+
+def _append(movements):
+    with transaction.atomic():
+        movements = StockMovement.objects.bulk_create(movements)
+        outbox.record_many('stock_changed', [
+            (movement.product_id, {'kind': movement.kind, 'quantity': movement.quantity, 'order': movement.order_id})
+            for movement in movements
+        ])
+    # Cached products show available stock, so their copies are now stale
+    invalidate_objects(Product, [movement.product_id for movement in movements])
+    return movements
+
+
+def record(product, kind, quantity, order=None):
+    """Append one movement; ``quantity`` is signed (negative takes stock away)."""
+    return _append([StockMovement(product=product, kind=kind, quantity=quantity, order=order)])[0]
+
+
+def record_sales(order, items):
+    """One 'sale' movement per ordered item, in a single INSERT."""
+    return _append([
+        StockMovement(product_id=item.product_id, kind='sale', quantity=-item.quantity, order=order)
+        for item in items
+        if item.product_id
+    ])
+
+
+def record_cancellation(order):
+    """Put a cancelled order's items back on sale; only the first call per order does anything."""
+    from orders.models import Order
+
+    with transaction.atomic():
+        # Conditional update: a second cancellation (or a concurrent one) finds the flag set
+        if not Order.objects.filter(pk=order.pk, stock_returned=False).update(stock_returned=True):
+            return []
+        order.stock_returned = True
+        return _append([
+            StockMovement(product_id=item.product_id, kind='cancellation', quantity=item.quantity, order=order)
+            for item in order.items.all()
+            if item.product_id
+        ])
+
+
+def record_reinstatement(order):
+    """Take a reopened order's items off sale again, undoing ``record_cancellation``; at most once per cancellation."""
+    from orders.models import Order
+
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order.pk, stock_returned=True).update(stock_returned=False):
+            return []
+        order.stock_returned = False
+        return _append([
+            StockMovement(product_id=item.product_id, kind='sale', quantity=-item.quantity, order=order)
+            for item in order.items.all()
+            if item.product_id
+        ])
+
+
+def record_stock_change(product, new_stock):
+    """Turn a seller setting stock to ``new_stock`` into a restock or adjustment entry."""
+    delta = new_stock - product.available_stock
+    if not delta:
+        return None
+    product.available = new_stock
+    return record(product, 'restock' if delta > 0 else 'adjustment', delta)
+
+
+def compact(every=None):
+    """
+    Fold movements into Product.stock and delete them; returns the number of
+    products updated. With ``every`` (seconds), schedules the next run as a job.
+    """
+    with transaction.atomic():
+        # Movements appended after this point have higher ids and wait for the next run
+        upto = StockMovement.objects.aggregate(upto=Max('pk'))['upto']
+        totals = []
+        if upto is not None:
+            totals = list(
+                StockMovement.objects.filter(pk__lte=upto)
+                .order_by().values('product').annotate(total=Sum('quantity'))
+            )
+            for row in totals:
+                if row['total']:
+                    Product.objects.filter(pk=row['product']).update(stock=F('stock') + row['total'])
+            StockMovement.objects.filter(pk__lte=upto).delete()
+        invalidate_objects(Product, [row['product'] for row in totals])
+    if every:
+        from jobs.queue import enqueue
+        enqueue(compact, every=every, delay=timedelta(seconds=every))
+    return len(totals)
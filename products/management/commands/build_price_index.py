@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products.price_index import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute weekly sold-price statistics for every category'
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Price index rebuilt for {count} categories with sales.'))
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from jobs.models import Job
+from jobs.queue import enqueue
+from products.inventory import compact
+
+
+class Command(BaseCommand):
+    help = 'Fold stock ledger movements into Product.stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int, metavar='SECONDS',
+                            help='Also schedule compaction as a job that re-queues itself every SECONDS')
+
+    def handle(self, *args, **options):
+        count = compact()
+        self.stdout.write(self.style.SUCCESS(f'Compacted stock movements for {count} products.'))
+        every = options['every']
+        if not every:
+            return
+        task = f'{compact.__module__}.{compact.__qualname__}'
+        if Job.objects.filter(task=task, status__in=['queued', 'running']).exists():
+            self.stdout.write('A recurring compaction job is already scheduled.')
+            return
+        enqueue(compact, every=every, delay=timedelta(seconds=every))
+        self.stdout.write(f'Scheduled compaction every {every} seconds.')
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:20
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_stock_movement'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.comparison.Collate('name', 'nocase'), name='products_name_nocase_idx'),
+        ),
+    ]
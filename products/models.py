@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Collate
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -16,7 +18,19 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class ProductQuerySet(models.QuerySet):
+    def with_available_stock(self):
+        """Annotate ``available``: base stock plus movements not yet compacted"""
+        pending = (
+            StockMovement.objects.filter(product=OuterRef('pk'))
+            .order_by().values('product')
+            .annotate(total=Sum('quantity')).values('total')
+        )
+        return self.annotate(available=F('stock') + Coalesce(Subquery(pending), 0))
+
 # Product Model
+# ``stock`` is the base level as of the last ledger compaction; sales, restocks
+# and adjustments are appended to StockMovement instead of rewriting this row.
 class Product(models.Model):
     seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='products')
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
@@ -29,8 +43,23 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Serves case-insensitive prefix search on name (admin, LIKE 'abc%')
+            models.Index(Collate('name', 'nocase'), name='products_name_nocase_idx'),
+            # product_list filters and sorts, read in index order (no sort step). Partial
+            # indexes because Django writes is_active=True as a bare WHERE "is_active".
+            models.Index(fields=['-created_at'], condition=Q(is_active=True), name='products_active_created_idx'),
+            models.Index(fields=['price'], condition=Q(is_active=True), name='products_active_price_idx'),
+            models.Index(fields=['category', '-created_at'], condition=Q(is_active=True),
+                         name='products_cat_created_idx'),
+            models.Index(fields=['category', 'price'], condition=Q(is_active=True), name='products_cat_price_idx'),
+            # Seller dashboard listing
+            models.Index(fields=['seller', '-created_at'], name='products_seller_created_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -42,9 +71,40 @@ class Product(models.Model):
             return sum([r.rating for r in reviews]) / len(reviews)
         return 0
     
+    @property
+    def available_stock(self):
+        """Base stock plus ledger movements (annotated by with_available_stock when listed)"""
+        if 'available' not in self.__dict__:
+            pending = self.stock_movements.aggregate(total=Sum('quantity'))['total'] or 0
+            self.available = self.stock + pending
+        return self.available
+    
     @property
     def in_stock(self):
-        return self.stock > 0
+        return self.available_stock > 0
+
+# Stock Ledger
+# Append-only: available stock is Product.stock plus the sum of these rows, and
+# products.inventory.compact periodically folds them back into Product.stock.
+class StockMovement(models.Model):
+    KIND_CHOICES = (
+        ('sale', 'Sale'),
+        ('restock', 'Restock'),
+        ('adjustment', 'Adjustment'),
+        ('cancellation', 'Cancellation'),
+    )
+    
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField(help_text='Signed change in units: negative for sales')
+    order = models.ForeignKey('orders.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.product.name} {self.quantity:+d} ({self.kind})"
 
 # Wishlist Model
 class Wishlist(models.Model):
@@ -57,3 +117,38 @@ class Wishlist(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.product.name}"
+
+# Weekly market price series per category, rebuilt by products.price_index
+class CategoryPriceIndex(models.Model):
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, related_name='price_index')
+    # Column arrays, oldest week first: weeks, count, p10, p25, median, p75, p90, moving_avg
+    series = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = 'Category price indexes'
+    
+    def __str__(self):
+        return f"Price index - {self.category.name}"
+    
+    @property
+    def latest(self):
+        """Most recent week with sales as a dict, or None when nothing sold in the window"""
+        sold = [week for week, count in enumerate(self.series.get('count') or []) if count]
+        if not sold:
+            return None
+        latest = {column: values[sold[-1]] for column, values in self.series.items()}
+        latest['week'] = latest.pop('weeks')
+        return latest
+    
+    def assess(self, price):
+        """Compare a price with the latest week: 'low', 'fair' or 'high'"""
+        latest = self.latest
+        if latest is None:
+            return None
+        price = float(price)
+        if price < latest['p25']:
+            return 'low'
+        if price > latest['p75']:
+            return 'high'
+        return 'fair'
@@ -0,0 +1,152 @@
+"""
+Weekly sold-price statistics per category.
+
+All sold order lines are loaded into NumPy arrays once and grouped by
+(category, week) with a single sort; quantity-weighted percentiles for every
+group are then found with one ``searchsorted`` call instead of a Python loop
+per group. The result is stored as one CategoryPriceIndex row per category.
+
+Each series covers the last PRICE_INDEX_WEEKS calendar weeks, oldest first,
+one entry per week. Weeks without sales have a count of 0 and null prices.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import OrderItem
+from .models import Category, CategoryPriceIndex
+
+PERCENTILES = {'p10': 0.10, 'p25': 0.25, 'median': 0.50, 'p75': 0.75, 'p90': 0.90}
+
+SECONDS_PER_DAY = 86400
+# 1970-01-05 was a Monday, so weeks run Monday to Sunday
+MONDAY_OFFSET = 4
+
+
+def week_number(moment):
+    days = moment.timestamp() // SECONDS_PER_DAY
+    return int((days - MONDAY_OFFSET) // 7)
+
+
+def load_sales(first_week):
+    """Return (category_ids, week_numbers, prices, quantities) arrays for lines sold from ``first_week`` on"""
+    since = datetime.fromtimestamp((first_week * 7 + MONDAY_OFFSET) * SECONDS_PER_DAY, tz=dt_timezone.utc)
+    rows = (
+        OrderItem.objects.filter(product__isnull=False, ordered_at__gte=since)
+        .exclude(order__status='cancelled')
+        .values_list('product__category_id', 'ordered_at', 'price', 'quantity')
+    )
+    categories, timestamps, prices, quantities = [], [], [], []
+    for category_id, ordered_at, price, quantity in rows.iterator(chunk_size=5000):
+        categories.append(category_id)
+        timestamps.append(ordered_at.timestamp())
+        prices.append(price)
+        quantities.append(quantity)
+    days = np.asarray(timestamps, dtype=np.float64) // SECONDS_PER_DAY
+    weeks = ((days - MONDAY_OFFSET) // 7).astype(np.int64)
+    return (
+        np.asarray(categories, dtype=np.int64),
+        weeks,
+        np.asarray(prices, dtype=np.float64),
+        np.asarray(quantities, dtype=np.float64),
+    )
+
+
+def weekly_percentiles(categories, weeks, prices, quantities):
+    """
+    Group sales by (category, week) and compute quantity-weighted percentiles.
+
+    Returns (group_categories, group_weeks, counts, {name: values}) with one
+    entry per group, sorted by category then week.
+    """
+    order = np.lexsort((prices, weeks, categories))
+    categories, weeks = categories[order], weeks[order]
+    prices, quantities = prices[order], quantities[order]
+
+    boundary = np.empty(len(order), dtype=bool)
+    boundary[:1] = True
+    boundary[1:] = (categories[1:] != categories[:-1]) | (weeks[1:] != weeks[:-1])
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], len(order))
+
+    cumulative = np.cumsum(quantities)
+    before = np.where(starts > 0, cumulative[starts - 1], 0.0)
+    totals = cumulative[ends - 1] - before
+
+    stats = {}
+    for name, q in PERCENTILES.items():
+        # First line in each group whose cumulative quantity reaches q of the group total
+        idx = np.searchsorted(cumulative, before + q * totals, side='left')
+        stats[name] = prices[np.minimum(idx, ends - 1)]
+    return categories[starts], weeks[starts], ends - starts, stats
+
+
+def moving_average(values, window):
+    """
+    Trailing mean of the weeks with sales among the last ``window`` weeks;
+    ``values`` has one entry per week, NaN for weeks without sales
+    """
+    present = ~np.isnan(values)
+    sums = np.cumsum(np.insert(np.where(present, values, 0.0), 0, 0.0))
+    counts = np.cumsum(np.insert(present, 0, False))
+    upper = np.arange(1, len(values) + 1)
+    lower = np.maximum(upper - window, 0)
+    counted = counts[upper] - counts[lower]
+    return np.where(counted > 0, (sums[upper] - sums[lower]) / np.maximum(counted, 1), np.nan)
+
+
+def rounded(values):
+    """JSON column: prices to 2 places, None for weeks without sales"""
+    return [None if np.isnan(value) else round(float(value), 2) for value in values]
+
+
+def week_start(week):
+    return np.datetime64('1970-01-01') + np.timedelta64(int(week) * 7 + MONDAY_OFFSET, 'D')
+
+
+def rebuild():
+    """Recompute every category's series; returns the number of categories with sales."""
+    size = settings.PRICE_INDEX_WEEKS
+    first_week = week_number(timezone.now()) - size + 1
+    categories, weeks, prices, quantities = load_sales(first_week)
+    # Clock skew between writers could put a sale past the current week
+    current = weeks < first_week + size
+    categories, weeks, prices, quantities = categories[current], weeks[current], prices[current], quantities[current]
+    series_by_category = {}
+    if len(prices):
+        group_categories, group_weeks, counts, stats = weekly_percentiles(categories, weeks, prices, quantities)
+        cut = np.flatnonzero(np.diff(group_categories)) + 1
+        for rows in np.split(np.arange(len(group_categories)), cut):
+            # Spread the weeks that had sales over the whole window
+            slots = group_weeks[rows] - first_week
+            weekly_counts = np.zeros(size, dtype=np.int64)
+            weekly_counts[slots] = counts[rows]
+            series = {
+                'weeks': [str(week_start(week)) for week in range(first_week, first_week + size)],
+                'count': weekly_counts.tolist(),
+            }
+            columns = {}
+            for name, values in stats.items():
+                columns[name] = np.full(size, np.nan)
+                columns[name][slots] = values[rows]
+            columns['moving_avg'] = moving_average(columns['median'], settings.PRICE_INDEX_MOVING_WINDOW)
+            series.update({name: rounded(values) for name, values in columns.items()})
+            series_by_category[int(group_categories[rows[0]])] = series
+
+    with transaction.atomic():
+        now = timezone.now()
+        existing = {row.category_id: row for row in CategoryPriceIndex.objects.all()}
+        created = []
+        for category_id in Category.objects.values_list('pk', flat=True):
+            series = series_by_category.get(category_id, {})
+            if category_id in existing:
+                existing[category_id].series = series
+                existing[category_id].updated_at = now
+            else:
+                created.append(CategoryPriceIndex(category_id=category_id, series=series))
+        CategoryPriceIndex.objects.bulk_update(existing.values(), ['series', 'updated_at'])
+        CategoryPriceIndex.objects.bulk_create(created)
+    return len(series_by_category)
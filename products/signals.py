@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.pagecache import invalidate_pages
+from reviews.models import Review
+from . import typeahead
+from .cache import invalidate_catalog, invalidate_objects
+from .models import Product, Category
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Review)
+def catalog_changed(sender, **kwargs):
+    # Featured products carry prefetched reviews for their star ratings. After
+    # commit, so a request in between cannot cache the old data afresh
+    transaction.on_commit(invalidate_catalog)
+    transaction.on_commit(invalidate_pages)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def object_changed(sender, instance, **kwargs):
+    invalidate_objects(sender, [instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def typeahead_changed(sender, instance, **kwargs):
+    kind = 'product' if sender is Product else 'category'
+    # After commit, so other workers re-reading the row see the new name
+    transaction.on_commit(lambda: typeahead.record_change(kind, instance.pk))
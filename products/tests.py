@@ -1,3 +1,318 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from orders.models import Order, OrderItem
+from . import cache as object_cache, inventory, price_index, typeahead
+from .models import Category, CategoryPriceIndex, Product, StockMovement
+
+
+class PriceIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = User.objects.create_user('farmer', password='pass', role='farmer')
+        cls.seller = User.objects.create_user('seller', password='pass', role='seller', is_approved=True)
+        cls.category = Category.objects.create(name='Seeds')
+        cls.product = Product.objects.create(
+            seller=cls.seller, category=cls.category, name='Seed', description='Seed',
+            price=Decimal('10.00'), stock=100, image='products/seed.jpg',
+        )
+
+    def sell(self, price, weeks_ago):
+        ordered_at = timezone.now() - timedelta(weeks=weeks_ago)
+        order = Order.objects.create(
+            user=self.buyer, order_number=f'ORD{Order.objects.count():010d}',
+            shipping_address='Village road', shipping_phone='9999999999', total_amount=price,
+        )
+        OrderItem.objects.create(
+            order=order, product=self.product, seller=self.seller, product_name='Seed',
+            quantity=1, price=price, ordered_at=ordered_at,
+        )
+
+    def test_moving_average_skips_weeks_without_sales(self):
+        values = np.array([10.0, np.nan, np.nan, 20.0, np.nan])
+        averages = price_index.moving_average(values, 3)
+        np.testing.assert_allclose(averages, [10.0, 10.0, 10.0, 20.0, 20.0])
+        self.assertTrue(np.isnan(price_index.moving_average(np.array([np.nan]), 3)[0]))
+
+    @override_settings(PRICE_INDEX_WEEKS=4, PRICE_INDEX_MOVING_WINDOW=2)
+    def test_series_covers_calendar_window(self):
+        self.sell(Decimal('99.00'), weeks_ago=10)  # outside the window
+        self.sell(Decimal('12.00'), weeks_ago=2)
+        self.assertEqual(price_index.rebuild(), 1)
+        series = CategoryPriceIndex.objects.get(category=self.category).series
+        self.assertEqual(len(series['weeks']), 4)
+        self.assertEqual(series['count'], [0, 1, 0, 0])
+        self.assertEqual(series['median'], [None, 12.0, None, None])
+        self.assertEqual(series['moving_avg'], [None, 12.0, 12.0, None])
+        latest = CategoryPriceIndex.objects.get(category=self.category).latest
+        self.assertEqual((latest['week'], latest['median']), (series['weeks'][1], 12.0))
+
+    @override_settings(PRICE_INDEX_WEEKS=4)
+    def test_old_sales_only(self):
+        self.sell(Decimal('99.00'), weeks_ago=10)
+        self.assertEqual(price_index.rebuild(), 0)
+        self.assertIsNone(CategoryPriceIndex.objects.get(category=self.category).latest)
+
+
+class InventoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        cls.buyer = User.objects.create_user('farmer', password='pass', role='farmer')
+        cls.seller = User.objects.create_user('seller', password='pass', role='seller', is_approved=True)
+        cls.category = Category.objects.create(name='Seeds')
+        cls.product = Product.objects.create(
+            seller=cls.seller, category=cls.category, name='Seed', description='Seed',
+            price=Decimal('10.00'), stock=100, image='products/seed.jpg',
+        )
+
+    def available(self):
+        return Product.objects.get(pk=self.product.pk).available_stock
+
+    def test_cancellation_returns_stock_once(self):
+        order = Order.objects.create(
+            user=self.buyer, order_number='ORD0000000001', shipping_address='Village road',
+            shipping_phone='9999999999', total_amount=Decimal('30.00'),
+        )
+        items = OrderItem.objects.bulk_create([OrderItem(
+            order=order, product=self.product, seller=self.seller, product_name='Seed', quantity=3,
+            price=Decimal('10.00'), ordered_at=order.created_at,
+        )])
+        inventory.record_sales(order, items)
+        self.assertEqual(self.available(), 97)
+        # Cancel, un-cancel, cancel again
+        for _ in range(3):
+            inventory.record_cancellation(Order.objects.get(pk=order.pk))
+        self.assertEqual(self.available(), 100)
+        self.assertEqual(StockMovement.objects.filter(kind='cancellation').count(), 1)
+
+        # Reopening takes the stock again, once; a later cancellation returns it again
+        for _ in range(2):
+            inventory.record_reinstatement(Order.objects.get(pk=order.pk))
+        self.assertEqual(self.available(), 97)
+        inventory.record_cancellation(Order.objects.get(pk=order.pk))
+        self.assertEqual(self.available(), 100)
+
+    def test_admin_stock_changes_go_through_the_ledger(self):
+        self.client.force_login(self.admin)
+        inventory.record(self.product, 'sale', -10)
+        response = self.client.get(reverse('admin:products_product_changelist'))
+        self.assertContains(response, '<td class="field-available">90</td>', html=True)
+
+        url = reverse('admin:products_product_change', args=[self.product.pk])
+        response = self.client.post(url, {
+            'seller': self.seller.pk, 'category': self.category.pk, 'name': 'Seed', 'description': 'Seed',
+            'price': '10.00', 'is_active': 'on', 'stock': '500', 'available_stock': '120',
+        })
+        self.assertEqual(response.status_code, 302)
+        product = Product.objects.get(pk=self.product.pk)
+        # Base stock is read-only; the change is a ledger entry
+        self.assertEqual(product.stock, 100)
+        self.assertEqual(product.available_stock, 120)
+        self.assertTrue(StockMovement.objects.filter(product=product, kind='restock', quantity=30).exists())
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class ProductListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user('seller', password='pass', role='seller', is_approved=True)
+        category = Category.objects.create(name='Seeds')
+        for i in range(12):
+            Product.objects.create(
+                seller=seller, category=category, name=f'Seed {i}', description='Seed',
+                price=Decimal(10 + i), stock=100, image='products/seed.jpg',
+            )
+
+    def page(self, **params):
+        response = self.client.get(reverse('products:product_list'), params)
+        b''.join(response.streaming_content)
+        return response.context
+
+    @patch('products.views.PRODUCTS_PER_PAGE', 5)
+    def test_listing_is_paginated(self):
+        first = self.page(sort='price_low')
+        self.assertEqual([p.price for p in first['products']], [10, 11, 12, 13, 14])
+        self.assertIsNone(first['previous_page_url'])
+        self.assertEqual(first['next_page_url'], '?sort=price_low&page=2')
+        last = self.page(sort='price_low', page=3)
+        self.assertEqual([p.price for p in last['products']], [20, 21])
+        self.assertEqual(last['previous_page_url'], '?sort=price_low&page=2')
+        self.assertIsNone(last['next_page_url'])
+        self.assertEqual(len(self.page(page='x')['products']), 5)
+
+
+class ObjectCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', password='pass', role='seller', is_approved=True)
+        cls.category = Category.objects.create(name='Seeds')
+        cls.products = [
+            Product.objects.create(
+                seller=cls.seller, category=cls.category, name=f'Seed {i}', description='Seed',
+                price=Decimal('10.00'), stock=100, image='products/seed.jpg',
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_misses_load_in_one_query(self):
+        pks = [product.pk for product in self.products]
+        with self.assertNumQueries(2):  # products, then their category
+            products = object_cache.get_products(pks + [0])
+        self.assertEqual(sorted(products), pks)
+        with self.assertNumQueries(0):
+            self.assertEqual(object_cache.get_products(pks)[pks[0]].category.name, 'Seeds')
+        self.assertIsNone(object_cache.get_product(0))
+
+    def test_versions_are_bumped_after_commit(self):
+        product = self.products[0]
+        object_cache.get_product(product.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Renamed'
+            product.save()
+            # Not committed yet, so the old copy is still the one to read
+            self.assertEqual(object_cache.get_product(product.pk).name, 'Seed 0')
+        self.assertEqual(object_cache.get_product(product.pk).name, 'Renamed')
+
+    def test_stock_movements_invalidate(self):
+        product = self.products[1]
+        self.assertEqual(object_cache.get_product(product.pk).available_stock, 100)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.record(product, 'sale', -4)
+        self.assertEqual(object_cache.get_product(product.pk).available_stock, 96)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.compact()
+        self.assertEqual(object_cache.get_product(product.pk).available_stock, 96)
+
+
+class TypeaheadIndexTests(SimpleTestCase):
+
+    def index(self):
+        return typeahead.TypeaheadIndex.from_rows([
+            ('category', 1, 'Seeds', '/c/1'),
+            ('product', 1, 'Hybrid Tomato Seeds', '/p/1'),
+            ('product', 2, 'Tomato Stakes', '/p/2'),
+            ('product', 3, 'Drip Kit', '/p/3'),
+        ])
+
+    def names(self, index, prefix):
+        return sorted(result['name'] for result in index.search(prefix))
+
+    def test_prefix_matches_word_starts(self):
+        index = self.index()
+        self.assertEqual(self.names(index, 'tom'), ['Hybrid Tomato Seeds', 'Tomato Stakes'])
+        self.assertEqual(self.names(index, '  SEE'), ['Hybrid Tomato Seeds', 'Seeds'])
+        self.assertEqual(self.names(index, 'tomato s'), ['Hybrid Tomato Seeds', 'Tomato Stakes'])
+        self.assertEqual(self.names(index, 'ato'), [])
+        # Matches come in key order, each object once
+        self.assertEqual([result['name'] for result in index.search('t')], ['Hybrid Tomato Seeds', 'Tomato Stakes'])
+        self.assertEqual(len(index.search('t', limit=1)), 1)
+
+    def test_changes_are_applied_without_touching_the_base(self):
+        index = self.index()
+        changed = index.with_changes(5, {
+            ('product', 2): ('Garden Stakes', '/p/2'),  # renamed
+            ('product', 3): None,  # deleted or hidden
+            ('product', 4): ('Tomato Cages', '/p/4'),  # new
+        })
+        self.assertEqual(changed.seq, 5)
+        self.assertIs(changed.keys, index.keys)
+        self.assertEqual(self.names(changed, 'tom'), ['Hybrid Tomato Seeds', 'Tomato Cages'])
+        self.assertEqual(self.names(changed, 'stak'), ['Garden Stakes'])
+        self.assertEqual(self.names(changed, 'drip'), [])
+        # The old index still answers as before
+        self.assertEqual(self.names(index, 'tom'), ['Hybrid Tomato Seeds', 'Tomato Stakes'])
+
+        compacted = changed.compacted()
+        self.assertEqual(compacted.overlay_keys, ())
+        for prefix in ('tom', 'stak', 'drip', 'see', 'g'):
+            self.assertEqual(compacted.search(prefix), changed.search(prefix), prefix)
+
+    def test_overlay_compacts_past_the_threshold(self):
+        rows = {('product', pk): (f'Bean {pk}', f'/p/{pk}') for pk in range(10, 20)}
+        with self.settings(TYPEAHEAD_MAX_ENTRIES=1000):
+            with patch.object(typeahead, 'COMPACT_AT', 5):
+                index = self.index().with_changes(1, rows)
+        self.assertEqual(index.overlay_keys, ())
+        self.assertEqual(len(index.search('bean', limit=20)), 10)
+
+
+class TypeaheadRefreshTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', password='pass', role='seller', is_approved=True)
+        cls.category = Category.objects.create(name='Seeds')
+
+    def setUp(self):
+        cache.clear()
+        typeahead._index = None
+
+    def create(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                seller=self.seller, category=self.category, name=name, description='Seed',
+                price=Decimal('10.00'), stock=100, image='products/seed.jpg',
+            )
+
+    def test_logged_changes_reach_the_index(self):
+        tomato = self.create('Tomato Seeds')
+        self.assertEqual([r['id'] for r in typeahead.search('tom')], [tomato.pk])
+        base = typeahead.get_index().keys
+
+        okra = self.create('Okra Seeds')
+        with self.captureOnCommitCallbacks(execute=True):
+            tomato.is_active = False
+            tomato.save()
+        with self.assertNumQueries(1):  # the changed products, read in one query
+            results = typeahead.search('se')
+        self.assertEqual({(r['type'], r['id']) for r in results}, {('product', okra.pk), ('category', self.category.pk)})
+        self.assertEqual(typeahead.search('tom'), [])
+        self.assertIs(typeahead.get_index().keys, base)
+
+    def test_gap_in_the_log_rebuilds(self):
+        self.create('Tomato Seeds')
+        typeahead.get_index()
+        okra = self.create('Okra Seeds')
+        cache.delete(typeahead.CHANGE_KEY.format(cache.get(typeahead.SEQUENCE_KEY)))
+        self.assertEqual([r['id'] for r in typeahead.search('okra')], [okra.pk])
+
+    def test_lost_sequence_jumps_ahead_and_rebuilds(self):
+        tomato = self.create('Tomato Seeds')
+        typeahead.get_index()
+        cache.delete(typeahead.SEQUENCE_KEY)  # expired or evicted
+        with self.captureOnCommitCallbacks(execute=True):
+            tomato.name = 'Okra Seeds'
+            tomato.save()
+        self.assertEqual(typeahead.search('tom'), [])
+        self.assertEqual([r['id'] for r in typeahead.search('okra')], [tomato.pk])
+
+    def test_concurrent_changes_get_their_own_numbers(self):
+        with patch.object(typeahead.cache, 'set', wraps=cache.set) as cache_set:
+            typeahead.record_change('product', 0)
+        first = cache.get(typeahead.SEQUENCE_KEY)
+        cache_set.assert_any_call(typeahead.SEQUENCE_KEY, first, timeout=None)
+        threads = [threading.Thread(target=typeahead.record_change, args=('product', pk)) for pk in range(1, 21)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.get(typeahead.SEQUENCE_KEY), first + 20)
+        changes = cache.get_many([typeahead.CHANGE_KEY.format(first + n) for n in range(1, 21)])
+        self.assertEqual(sorted(pk for _, pk in changes.values()), list(range(1, 21)))
@@ -0,0 +1,229 @@
+"""
+In-process typeahead index over product and category names.
+
+Every word start of a name becomes a sorted key ("Hybrid Tomato Seeds" is
+found by "hyb", "tom" and "see"), so a lookup is a bisect plus a short scan
+and never touches the database.
+
+Each worker holds its own copy, capped at TYPEAHEAD_MAX_ENTRIES keys. Product
+and Category signals record changes under an increasing sequence number in the
+shared cache; before answering, a worker re-reads just the objects changed
+since its own sequence and applies them as one batch, or rebuilds from
+scratch if that log is incomplete. The sequence is bumped under
+core.locks.host_lock, so two workers never log under the same number, and
+starts from the clock, so a lost counter jumps ahead and forces a rebuild
+rather than reusing numbers.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from itertools import chain
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from core.locks import host_lock
+from .models import Category, Product
+
+SEQUENCE_KEY = 'typeahead:seq'
+CHANGE_KEY = 'typeahead:change:{}'
+CHANGE_TIMEOUT = 60 * 60 * 24
+MAX_CHANGES = 200  # beyond this many pending changes a full rebuild is cheaper
+COMPACT_AT = 2000  # overlay keys plus changed objects merged into the base list past this size
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def word_keys(name):
+    """The name from each word start onwards: 'a b c' -> ['a b c', 'b c', 'c']"""
+    name = normalize(name)
+    keys, start = [], 0
+    while start != -1:
+        keys.append(name[start:])
+        start = name.find(' ', start)
+        if start != -1:
+            start += 1
+    return keys
+
+
+class TypeaheadIndex:
+    """
+    Sorted (key, kind, pk) tuples plus a label and URL per object.
+
+    An index is never modified once built; ``with_changes`` returns a new one.
+    The large base list is shared between them and changes go into a small
+    sorted overlay, so a refresh costs the size of the overlay rather than a
+    copy of every key. Base entries of changed objects are skipped on search.
+    Once the overlay passes COMPACT_AT entries it is merged into a new base in one
+    linear pass.
+    """
+
+    def __init__(self, seq=0, keys=(), objects=None, overlay_keys=(), overlay_objects=None, changed=frozenset()):
+        self.seq = seq
+        self.keys = keys
+        self.objects = objects or {}
+        self.overlay_keys = overlay_keys
+        self.overlay_objects = overlay_objects or {}
+        self.changed = changed
+
+    def __len__(self):
+        return len(self.keys) + len(self.overlay_keys)
+
+    @classmethod
+    def from_rows(cls, rows, seq=0):
+        """Index ``(kind, pk, name, url)`` rows, stopping at TYPEAHEAD_MAX_ENTRIES keys; sorted once."""
+        keys, objects = [], {}
+        for kind, pk, name, url in rows:
+            words = word_keys(name)
+            if len(keys) + len(words) > settings.TYPEAHEAD_MAX_ENTRIES:
+                break
+            objects[kind, pk] = (name, url)
+            keys.extend((key, kind, pk) for key in words)
+        keys.sort()
+        return cls(seq, keys, objects)
+
+    def get(self, kind, pk):
+        if (kind, pk) in self.changed:
+            return self.overlay_objects.get((kind, pk))
+        return self.objects.get((kind, pk))
+
+    def with_changes(self, seq, rows):
+        """
+        A new index at ``seq`` where each ``(kind, pk)`` in ``rows`` is
+        replaced by its ``(name, url)``, or dropped when that is None.
+        """
+        overlay_objects = dict(self.overlay_objects)
+        overlay_keys = [entry for entry in self.overlay_keys if entry[1:] not in rows]
+        room = settings.TYPEAHEAD_MAX_ENTRIES - len(self.keys) - len(overlay_keys)
+        for (kind, pk), entry in rows.items():
+            overlay_objects.pop((kind, pk), None)
+            if entry is None:
+                continue
+            words = word_keys(entry[0])
+            if len(words) > room:
+                continue
+            room -= len(words)
+            overlay_objects[kind, pk] = entry
+            overlay_keys.extend((key, kind, pk) for key in words)
+        overlay_keys.sort()
+        index = TypeaheadIndex(
+            seq, self.keys, self.objects, overlay_keys, overlay_objects, self.changed | frozenset(rows),
+        )
+        return index.compacted() if len(overlay_keys) + len(index.changed) > COMPACT_AT else index
+
+    def compacted(self):
+        """The same entries with the overlay merged into the base."""
+        keys = list(heapq.merge(
+            (entry for entry in self.keys if entry[1:] not in self.changed), self.overlay_keys,
+        ))
+        objects = {key: value for key, value in self.objects.items() if key not in self.changed}
+        objects.update(self.overlay_objects)
+        return TypeaheadIndex(self.seq, keys, objects)
+
+    def _scan(self, keys, prefix, skip_changed):
+        for i in range(bisect_left(keys, (prefix,)), len(keys)):
+            if not (skip_changed and keys[i][1:] in self.changed):
+                yield keys[i]
+
+    def search(self, prefix, limit=8):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results, seen = [], set()
+        entries = heapq.merge(self._scan(self.keys, prefix, True), self._scan(self.overlay_keys, prefix, False))
+        for key, kind, pk in entries:
+            if not key.startswith(prefix):
+                break
+            if (kind, pk) in seen:
+                continue
+            seen.add((kind, pk))
+            name, url = self.get(kind, pk)
+            results.append({'type': kind, 'id': pk, 'name': name, 'url': url})
+            if len(results) == limit:
+                break
+        return results
+
+
+def _category_url(pk):
+    return f"{reverse('products:product_list')}?category={pk}"
+
+
+def _rows(kind, pks=None):
+    """(kind, pk, name, url) for current rows of one kind, optionally only ``pks``."""
+    if kind == 'category':
+        rows = Category.objects.values_list('pk', 'name')
+        url = _category_url
+    else:
+        # Newest first, so the cap drops the oldest listings
+        rows = Product.objects.filter(is_active=True).order_by('-created_at').values_list('pk', 'name')
+        url = lambda pk: reverse('products:product_detail', args=[pk])
+    if pks is not None:
+        rows = rows.filter(pk__in=pks)
+    for pk, name in rows.iterator():
+        yield kind, pk, name, url(pk)
+
+
+def build():
+    """A complete index from the database."""
+    seq = cache.get(SEQUENCE_KEY, 0)
+    # Categories first: there are few of them and they must never be capped out
+    return TypeaheadIndex.from_rows(chain(_rows('category'), _rows('product')), seq)
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def _refresh(index, seq):
+    """Apply logged changes after ``index.seq`` as one batch, or rebuild if the log has gaps."""
+    if seq - index.seq > MAX_CHANGES:
+        return build()
+    wanted = [CHANGE_KEY.format(n) for n in range(index.seq + 1, seq + 1)]
+    changes = cache.get_many(wanted)
+    if len(changes) != len(wanted):
+        return build()
+    changed = {}
+    for kind, pk in changes.values():
+        changed.setdefault(kind, set()).add(pk)
+    # Deleted or hidden objects stay None
+    rows = {(kind, pk): None for kind, pks in changed.items() for pk in pks}
+    for kind, pks in changed.items():
+        for _, pk, name, url in _rows(kind, pks):
+            rows[kind, pk] = (name, url)
+    return index.with_changes(seq, rows)
+
+
+def get_index():
+    """This worker's index, brought up to date with changes made by any worker."""
+    global _index
+    index = _index
+    seq = cache.get(SEQUENCE_KEY, 0)
+    if index is not None and index.seq == seq:
+        return index
+    with _lock:
+        if _index is None or _index.seq > seq:
+            # First use, or the sequence was evicted from the cache and restarted
+            _index = build()
+        elif _index.seq < seq:
+            # Swapped in whole, so concurrent searches never see a half-applied change
+            _index = _refresh(_index, seq)
+        return _index
+
+
+def search(prefix, limit=8):
+    return get_index().search(prefix, limit)
+
+
+def record_change(kind, pk):
+    """Log that an object's name or visibility may have changed."""
+    with host_lock(settings.TYPEAHEAD_LOCK_FILE):
+        # Not cache.incr: on the file and shm backends it re-stores the key with
+        # the default timeout, and the counter would expire and restart
+        seq = cache.get(SEQUENCE_KEY)
+        seq = time.time_ns() // 1000 if seq is None else seq + 1
+        cache.set(CHANGE_KEY.format(seq), (kind, pk), CHANGE_TIMEOUT)
+        cache.set(SEQUENCE_KEY, seq, timeout=None)
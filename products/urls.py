@@ -11,4 +11,6 @@ urlpatterns = [
     path('<int:pk>/delete/', views.product_delete, name='product_delete'),
     path('<int:pk>/wishlist/', views.wishlist_toggle, name='wishlist_toggle'),
     path('wishlist/', views.wishlist_view, name='wishlist'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('categories/<int:pk>/price-index/', views.category_price_index, name='category_price_index'),
 ]
@@ -1,14 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from .models import Product, Category, Wishlist
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from .models import Product, Category, Wishlist, CategoryPriceIndex
 from .forms import ProductForm
+from .cache import get_categories, get_product_or_404, get_products
+from . import inventory, typeahead
+from accounts import geo
+from accounts.models import User
+from events import outbox
+from core.streaming import chunked, render_streaming
 from reviews.models import Review
 
+NEAR_DEFAULT_RADIUS_KM = 25
+NEAR_MAX_RADIUS_KM = 200
+PRODUCTS_PER_PAGE = 24
+
 def product_list(request):
-    products = Product.objects.filter(is_active=True)
-    categories = Category.objects.all()
+    products = (
+        Product.objects.filter(is_active=True).with_available_stock()
+        # average_rating reads the reviews; their order doesn't matter, so skip the sort
+        .select_related('category').prefetch_related(Prefetch('reviews', queryset=Review.objects.order_by()))
+    )
+    categories = get_categories()
     
     # Search
     query = request.GET.get('q')
@@ -32,34 +50,117 @@ def product_list(request):
     elif sort == 'newest':
         products = products.order_by('-created_at')
     
+    # Near me
+    near = _parse_near(request)
+    if near:
+        products = _filter_nearby(products, *near, sort_by_distance=not sort)
+    
+    number, products, has_next = _page(request, products)
     context = {
         'products': products,
         'categories': categories,
         'query': query,
+        'near': near,
+        'page_number': number,
+        'previous_page_url': _page_url(request, number - 1) if number > 1 else None,
+        'next_page_url': _page_url(request, number + 1) if has_next else None,
     }
-    return render(request, 'products/product_list.html', context)
+    return render_streaming(request, 'products/product_list.html', context)
+
+def _page(request, products):
+    """(page number, its products, whether another page follows). Reads one row past
+    the page instead of a COUNT, which would walk every active product."""
+    try:
+        number = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        number = 1
+    start = (number - 1) * PRODUCTS_PER_PAGE
+    rows = list(products[start:start + PRODUCTS_PER_PAGE + 1])
+    return number, rows[:PRODUCTS_PER_PAGE], len(rows) > PRODUCTS_PER_PAGE
+
+def _page_url(request, number):
+    params = request.GET.copy()
+    params['page'] = number
+    return f'?{params.urlencode()}'
+
+def _parse_near(request):
+    """(lat, lng, radius_km) from ?lat=&lng=&radius=, or None"""
+    try:
+        lat, lng = float(request.GET['lat']), float(request.GET['lng'])
+        radius = float(request.GET.get('radius', NEAR_DEFAULT_RADIUS_KM))
+    except (KeyError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng, min(max(radius, 1), NEAR_MAX_RADIUS_KM)
+
+def _filter_nearby(products, lat, lng, radius, sort_by_distance=True):
+    """Products whose seller is within radius km, each with a distance_km attribute"""
+    # Narrow to sellers in the covering geohash cells with indexed range scans, as a
+    # subquery so their products are then looked up by seller rather than scanned...
+    cells = Q()
+    for cell in geo.covering_cells(lat, lng, radius):
+        cells |= Q(geohash__gte=cell, geohash__lt=cell + '~')
+    sellers = User.objects.filter(cells, latitude__isnull=False).values('pk')
+    candidates = products.filter(seller__in=sellers).select_related('seller')
+    if sort_by_distance:
+        # Sorted by distance below; skip the database sort
+        candidates = candidates.order_by()
+    candidates = list(candidates)
+    if not candidates:
+        return []
+    # ...then compute exact distances for all candidates at once
+    distances = geo.haversine_km(
+        lat, lng,
+        [p.seller.latitude for p in candidates],
+        [p.seller.longitude for p in candidates],
+    )
+    nearby = []
+    for product, distance in zip(candidates, distances):
+        if distance <= radius:
+            product.distance_km = round(float(distance), 1)
+            nearby.append(product)
+    if sort_by_distance:
+        nearby.sort(key=lambda p: p.distance_km)
+    return nearby
 
 def product_detail(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+    product = get_product_or_404(pk)
     reviews = Review.objects.filter(product=product)
     
     # Check if user has purchased this product
     can_review = False
     if request.user.is_authenticated:
-        from orders.models import OrderItem
-        can_review = OrderItem.objects.filter(
-            order__user=request.user,
-            product=product,
-            order__status='delivered'
-        ).exists()
+        from orders.retention import has_delivered
+        can_review = has_delivered(request.user, product)
+    
+    price_index = CategoryPriceIndex.objects.filter(category_id=product.category_id).first()
     
     context = {
         'product': product,
         'reviews': reviews,
         'can_review': can_review,
+        'market_price': price_index.latest if price_index else None,
+        'price_assessment': price_index.assess(product.price) if price_index else None,
     }
     return render(request, 'products/product_detail.html', context)
 
+def autocomplete(request):
+    """Search box suggestions from the in-process typeahead index (no database query)"""
+    query = request.GET.get('q', '')[:100]
+    response = JsonResponse({'query': query, 'results': typeahead.search(query)})
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+def category_price_index(request, pk):
+    """Precomputed weekly price series for a category (see products.price_index)"""
+    price_index = get_object_or_404(CategoryPriceIndex.objects.select_related('category'), category_id=pk)
+    return JsonResponse({
+        'category': {'id': price_index.category_id, 'name': price_index.category.name},
+        'updated_at': price_index.updated_at,
+        'series': price_index.series,
+    })
+
 @login_required
 def product_create(request):
     if request.user.role != 'seller':
@@ -71,7 +172,9 @@ def product_create(request):
         if form.is_valid():
             product = form.save(commit=False)
             product.seller = request.user
-            product.save()
+            with transaction.atomic():
+                product.save()
+                outbox.record('product_changed', product.pk, created=True)
             messages.success(request, 'Product added successfully!')
             return redirect('accounts:dashboard')
     else:
@@ -81,16 +184,25 @@ def product_create(request):
 
 @login_required
 def product_update(request, pk):
-    product = get_object_or_404(Product, pk=pk, seller=request.user)
+    product = get_object_or_404(Product.objects.with_available_stock(), pk=pk, seller=request.user)
+    # The form edits available stock; the change is recorded in the ledger
+    # rather than written over Product.stock, which compaction owns.
+    base_stock = product.stock
     
     if request.method == 'POST':
-        form = ProductForm(request.POST, request.FILES, instance=product)
+        form = ProductForm(request.POST, request.FILES, instance=product, initial={'stock': product.available_stock})
         if form.is_valid():
-            form.save()
+            product = form.save(commit=False)
+            new_stock = product.stock
+            product.stock = base_stock
+            with transaction.atomic():
+                product.save(update_fields=[name for name in form.Meta.fields if name != 'stock'] + ['updated_at'])
+                outbox.record('product_changed', product.pk, fields=[name for name in form.changed_data if name != 'stock'])
+                inventory.record_stock_change(product, new_stock)
             messages.success(request, 'Product updated successfully!')
             return redirect('accounts:dashboard')
     else:
-        form = ProductForm(instance=product)
+        form = ProductForm(instance=product, initial={'stock': product.available_stock})
     
     return render(request, 'products/product_form.html', {'form': form, 'action': 'Update'})
 
@@ -99,7 +211,9 @@ def product_delete(request, pk):
     product = get_object_or_404(Product, pk=pk, seller=request.user)
     
     if request.method == 'POST':
-        product.delete()
+        with transaction.atomic():
+            outbox.record('product_changed', product.pk, deleted=True)
+            product.delete()
         messages.success(request, 'Product deleted successfully!')
         return redirect('accounts:dashboard')
     
@@ -107,7 +221,7 @@ def product_delete(request, pk):
 
 @login_required
 def wishlist_toggle(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+    product = get_product_or_404(pk)
     wishlist_item, created = Wishlist.objects.get_or_create(user=request.user, product=product)
     
     if not created:
@@ -120,5 +234,13 @@ def wishlist_toggle(request, pk):
 
 @login_required
 def wishlist_view(request):
-    wishlist_items = Wishlist.objects.filter(user=request.user)
-    return render(request, 'products/wishlist.html', {'wishlist_items': wishlist_items})
+    items = Wishlist.objects.filter(user=request.user).iterator(chunk_size=settings.STREAM_CHUNK_SIZE)
+    return render_streaming(request, 'products/wishlist.html', {'wishlist_items': _with_cached_products(items)})
+
+def _with_cached_products(wishlist_items):
+    # Products come from the object cache a chunk at a time, as the page streams
+    for chunk in chunked(wishlist_items, settings.STREAM_CHUNK_SIZE):
+        products = get_products([item.product_id for item in chunk])
+        for item in chunk:
+            item.product = products[item.product_id]
+            yield item
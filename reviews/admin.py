@@ -1,8 +1,11 @@
 from django.contrib import admin
+from core.admin import ScalableAdminMixin
 from .models import Review
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ['user', 'product', 'rating', 'created_at']
     list_filter = ['rating', 'created_at']
-    search_fields = ['user__username', 'product__name']
+    list_select_related = ['user', 'product']
+    search_fields = ['^user__username', '^product__name']
+    autocomplete_fields = ['user', 'product']
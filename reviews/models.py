@@ -15,6 +15,10 @@ class Review(models.Model):
     class Meta:
         unique_together = ('user', 'product')
         ordering = ['-created_at']
+        indexes = [
+            # A product's reviews, newest first
+            models.Index(fields=['product', '-created_at'], name='reviews_product_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.product.name} ({self.rating}★)"
@@ -1,23 +1,19 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
+from events import outbox
 from .models import Review
 from .forms import ReviewForm
-from products.models import Product
-from orders.models import OrderItem
+from products.cache import get_product_or_404
+from orders.retention import has_delivered
 
 @login_required
 def add_review(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+    product = get_product_or_404(pk)
     
     # Check if user has purchased this product
-    has_purchased = OrderItem.objects.filter(
-        order__user=request.user,
-        product=product,
-        order__status='delivered'
-    ).exists()
-    
-    if not has_purchased:
+    if not has_delivered(request.user, product):
         messages.error(request, 'You can only review products you have purchased.')
         return redirect('products:product_detail', pk=pk)
     
@@ -32,7 +28,9 @@ def add_review(request, pk):
             review = form.save(commit=False)
             review.user = request.user
             review.product = product
-            review.save()
+            with transaction.atomic():
+                review.save()
+                outbox.record('review_added', review.pk, product=product.pk, rating=review.rating)
             messages.success(request, 'Review added successfully!')
             return redirect('products:product_detail', pk=pk)
     else:
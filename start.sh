@@ -0,0 +1,11 @@
+#!/usr/bin/env bash
+# Start the web server together with the background processes. They run in
+# the same container because they share the SQLite database file and the
+# /dev/shm cache; a separate Render service would get its own copy of both.
+set -o errexit
+
+# Restarted if they exit; they stop with the container
+(while true; do python manage.py runworker; sleep 5; done) &
+(while true; do python manage.py consume_events; sleep 5; done) &
+
+exec gunicorn -c gunicorn.conf.py
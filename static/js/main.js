@@ -1,14 +1,32 @@
 // Main JavaScript for AgriMarket
 
 // Auto-hide alerts after 5 seconds
-document.addEventListener('DOMContentLoaded', function() {
-    const alerts = document.querySelectorAll('.alert');
+function autoHideAlerts(root) {
+    const alerts = root.querySelectorAll('.alert');
     alerts.forEach(function(alert) {
         setTimeout(function() {
             const bsAlert = new bootstrap.Alert(alert);
             bsAlert.close();
         }, 5000);
     });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    autoHideAlerts(document);
+});
+
+// Pages from the shared page cache leave the user menu and messages to this request
+document.addEventListener('DOMContentLoaded', function() {
+    const nav = document.querySelector('#user-nav[data-fragment]');
+    if (!nav) return;
+    fetch(nav.dataset.fragment, {credentials: 'same-origin'})
+        .then(function(response) { return response.json(); })
+        .then(function(data) {
+            nav.innerHTML = data.nav;
+            const messages = document.getElementById('messages');
+            messages.innerHTML = data.messages;
+            autoHideAlerts(messages);
+        });
 });
 
 // Confirm delete actions
@@ -60,6 +78,81 @@ function handleSearch(event) {
     });
 }
 
+// Search box suggestions from /products/autocomplete/
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('input[data-autocomplete]').forEach(function(input) {
+        const menu = document.createElement('div');
+        menu.className = 'list-group position-absolute w-100 shadow-sm';
+        menu.style.top = '100%';
+        menu.style.zIndex = 1000;
+        input.parentNode.appendChild(menu);
+        let timer = null;
+        let latest = '';
+
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const query = input.value.trim();
+            if (!query) {
+                menu.innerHTML = '';
+                return;
+            }
+            timer = setTimeout(function() {
+                latest = query;
+                fetch(input.dataset.autocomplete + '?q=' + encodeURIComponent(query))
+                    .then(function(response) { return response.json(); })
+                    .then(function(data) {
+                        // Ignore answers for keystrokes that have since been superseded
+                        if (data.query !== latest) return;
+                        menu.innerHTML = '';
+                        data.results.forEach(function(result) {
+                            const link = document.createElement('a');
+                            link.className = 'list-group-item list-group-item-action';
+                            link.href = result.url;
+                            link.textContent = result.name;
+                            if (result.type === 'category') {
+                                link.textContent += ' (category)';
+                            }
+                            menu.appendChild(link);
+                        });
+                    });
+            }, 80);
+        });
+
+        input.addEventListener('blur', function() {
+            setTimeout(function() { menu.innerHTML = ''; }, 200);
+        });
+    });
+});
+
+// Near me search: fill the hidden location fields from the browser and submit
+function searchNearMe(form) {
+    if (!navigator.geolocation) {
+        alert('Location is not available in this browser.');
+        return;
+    }
+    navigator.geolocation.getCurrentPosition(function(position) {
+        form.elements.lat.value = position.coords.latitude.toFixed(5);
+        form.elements.lng.value = position.coords.longitude.toFixed(5);
+        form.submit();
+    }, function() {
+        alert('Could not get your location.');
+    });
+}
+
+// Fill the latitude/longitude profile fields from the browser
+function fillMyLocation() {
+    if (!navigator.geolocation) {
+        alert('Location is not available in this browser.');
+        return;
+    }
+    navigator.geolocation.getCurrentPosition(function(position) {
+        document.getElementById('id_latitude').value = position.coords.latitude.toFixed(5);
+        document.getElementById('id_longitude').value = position.coords.longitude.toFixed(5);
+    }, function() {
+        alert('Could not get your location.');
+    });
+}
+
 // Quantity validation
 function validateQuantity(input, max) {
     const value = parseInt(input.value);